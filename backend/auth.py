@@ -1,3 +1,4 @@
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -8,102 +9,164 @@ from sqlalchemy.orm import Session
 
 from config import settings
 from database import get_db, User
+from services.login_keys import LoginKeys
+from services.password_hasher import PasswordHasher
+from services.refresh_tokens import refresh_tokens
+from services.token_cache import token_cache
+from services.user_cache import AuthenticatedUser, user_cache
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
+# bcrypt blocks for hundreds of milliseconds; request handlers go through this pool
+password_hasher = PasswordHasher(
+    pwd_context,
+    max_workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_max_queue
+)
 
 # Token security
 security = HTTPBearer()
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash"""
+    """Verify a password against its hash (blocking; use password_hasher in request handlers)"""
     return pwd_context.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    """Hash a password"""
+    """Hash a password (blocking; use password_hasher in request handlers)"""
     return pwd_context.hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
     to_encode = data.copy()
+    issued_at = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = issued_at + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
+        expire = issued_at + timedelta(minutes=settings.access_token_expire_minutes)
     
-    to_encode.update({"exp": expire})
+    # iat tells tokens of the same user apart in the authenticated-user cache
+    to_encode.update({"exp": expire, "iat": issued_at})
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
 
 def create_refresh_token(data: dict):
-    """Create a JWT refresh token"""
+    """Create a JWT refresh token (``data`` carries its family and token id, see services/refresh_tokens.py)"""
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": "refresh"})
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
 
-def verify_token(token: str, credentials_exception):
-    """Verify and decode a JWT token"""
+def decode_token(token: str, credentials_exception) -> dict:
+    """Verify a JWT token and return its claims (shared with the token cache; don't modify them)"""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        return username
     except JWTError:
         raise credentials_exception
+    # jose still accepts a token during the second of its exp; the cache doesn't, so neither do we
+    if payload.get("sub") is None or time.time() >= payload.get("exp", float("inf")):
+        raise credentials_exception
+    token_cache.put(token, payload)
+    return payload
+
+
+def verify_token(token: str, credentials_exception):
+    """Verify and decode a JWT token"""
+    return decode_token(token, credentials_exception)["sub"]
+
 
+async def authenticate_user(db: Session, username: str, password: str):
+    """
+    Authenticate a user with username/email and password.
 
-def authenticate_user(db: Session, username: str, password: str):
-    """Authenticate a user with username/email and password"""
-    # Try to find user by username or email
-    user = db.query(User).filter(
-        (User.username == username) | (User.email == username)
-    ).first()
+    Hashes made with an outdated cost factor are replaced on success.
+    """
+    # Username or email, in any case, through the login key index
+    user = LoginKeys.find_user(db, username)
     
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    verified, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not verified:
         return False
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
     return user
 
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
-):
-    """Get current authenticated user from JWT token"""
+) -> AuthenticatedUser:
+    """
+    Get current authenticated user from JWT token.
+
+    Returns the id, username, role and active flag only, reused from a
+    short-lived cache keyed by the token's subject and issue time, so most
+    requests identify their caller without a database round trip.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    token = credentials.credentials
-    username = verify_token(token, credentials_exception)
+    payload = decode_token(credentials.credentials, credentials_exception)
+    if payload.get("type") == "refresh":
+        raise credentials_exception
+    # Tokens of a logged-out or revoked session stop working at once (an in-memory check)
+    family_id = payload.get("fam")
+    if family_id and not refresh_tokens.is_active(db, family_id):
+        raise credentials_exception
+    username = payload["sub"]
+    issued_at = payload.get("iat")
     
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
+    user = user_cache.get(username, issued_at)
+    if user is not None:
+        return user
+    
+    row = db.query(User.id, User.username, User.role, User.is_active).filter(User.username == username).first()
+    if row is None:
         raise credentials_exception
+    user = AuthenticatedUser(id=row.id, username=row.username, role=row.role, is_active=row.is_active)
+    user_cache.put(issued_at, user)
     return user
 
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)):
+async def get_current_active_user(current_user: AuthenticatedUser = Depends(get_current_user)):
     """Get current active user"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
 
+async def get_current_user_record(
+    current_user: AuthenticatedUser = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> User:
+    """The full ``User`` row of the current active user, for endpoints that read or change the profile"""
+    user = db.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+
 def require_role(required_role: str):
     """Dependency to require specific user role"""
-    def role_checker(current_user: User = Depends(get_current_active_user)):
+    def role_checker(current_user: AuthenticatedUser = Depends(get_current_active_user)):
         if current_user.role != required_role and current_user.role != "admin":
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -113,7 +176,7 @@ def require_role(required_role: str):
     return role_checker
 
 
-def require_admin(current_user: User = Depends(get_current_active_user)):
+def require_admin(current_user: AuthenticatedUser = Depends(get_current_active_user)):
     """Require admin role"""
     if current_user.role != "admin":
         raise HTTPException(
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Backfill image metadata (dimensions, byte size, format, dominant color and
+LQIP placeholder) for uploaded images that predate the metadata index.
+
+Images are probed in a process pool; existing files and variants are left
+untouched. Run from the backend directory:
+
+    python backfill_image_metadata.py [--force] [--workers N]
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+from sqlalchemy import select, union
+
+from config import settings
+from database import SessionLocal, ImageAsset, IMAGE_URL_FIELDS, create_tables
+from services.image_processing import limit_decoding, probe_metadata
+from services.image_service import ImageService
+from services.storage import upload_storage
+
+BATCH_SIZE = 100
+
+
+def referenced_image_urls(db) -> set:
+    """Every distinct local upload URL stored in an image column"""
+    statement = union(*[
+        select(getattr(model, field).label("url")).where(getattr(model, field).like("/uploads/%"))
+        for model, field in IMAGE_URL_FIELDS
+    ])
+    return {row.url for row in db.execute(statement)}
+
+
+def probe(path: str):
+    """Worker entry point: never raise, so one bad file doesn't stop the batch"""
+    try:
+        return probe_metadata(path), None
+    except Exception as e:
+        return None, str(e)
+
+
+def backfill(force: bool = False, workers: int = None):
+    create_tables()
+    db = SessionLocal()
+    try:
+        urls = referenced_image_urls(db)
+        if not force:
+            indexed = {
+                url for (url,) in db.query(ImageAsset.url).filter(ImageAsset.placeholder.isnot(None))
+            }
+            urls -= indexed
+
+        pending = []
+        missing = 0
+        for url in sorted(urls):
+            key = upload_storage.key_for_url(url)
+            if key and upload_storage.exists(key):
+                pending.append((url, key))
+            else:
+                missing += 1
+
+        print(f"🔄 Probing {len(pending)} images ({missing} referenced files missing from storage)...")
+
+        updated = failed = 0
+        with ProcessPoolExecutor(
+            max_workers=workers or settings.image_workers,
+            initializer=limit_decoding,
+            initargs=(settings.image_max_pixels,)
+        ) as executor:
+            for start in range(0, len(pending), BATCH_SIZE):
+                batch = pending[start:start + BATCH_SIZE]
+                # Local copies (downloads, for remote storage) live until the batch is probed
+                with ExitStack() as stack:
+                    paths = [stack.enter_context(upload_storage.local_copy(key)) for _, key in batch]
+                    results = list(executor.map(probe, paths, chunksize=8))
+
+                for (url, _), (info, error) in zip(batch, results):
+                    if error:
+                        failed += 1
+                        print(f"❌ {url}: {error}")
+                        continue
+                    ImageService.record_metadata(db, url, info)
+                    updated += 1
+                db.commit()
+
+        print(f"✅ Indexed {updated} images, {failed} failed")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--force", action="store_true", help="Re-probe images that already have metadata")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: image_workers)")
+    args = parser.parse_args()
+    backfill(force=args.force, workers=args.workers)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of the per-request cost of authenticating a bearer token,
+with and without the verified-token cache.
+
+Times ``decode_token`` alone and the whole ``get_current_user`` dependency
+(with the authenticated-user cache warm, so no database work is measured).
+Run from the backend directory:
+
+    python benchmarks/auth_overhead.py [--iterations 20000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException  # noqa: E402
+from fastapi.security import HTTPAuthorizationCredentials  # noqa: E402
+
+from auth import create_access_token, decode_token, get_current_user  # noqa: E402
+from services.token_cache import token_cache  # noqa: E402
+from services.user_cache import AuthenticatedUser, user_cache  # noqa: E402
+
+
+def per_call_us(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+
+def main(iterations: int):
+    token = create_access_token(data={"sub": "benchmark"})
+    error = HTTPException(status_code=401)
+    payload = decode_token(token, error)
+    user_cache.put(payload.get("iat"), AuthenticatedUser(id=1, username="benchmark", role="admin", is_active=True))
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    loop = asyncio.new_event_loop()
+
+    def dependency():
+        loop.run_until_complete(get_current_user(credentials=credentials, db=None))
+
+    results = {}
+    for label, max_entries in (("without cache", 0), ("with cache", token_cache.max_entries or 10000)):
+        token_cache.clear()
+        token_cache.max_entries = max_entries
+        decode_token(token, error)  # Warm up
+        results[label] = (
+            per_call_us(lambda: decode_token(token, error), iterations),
+            per_call_us(dependency, iterations // 4),
+        )
+    loop.close()
+
+    print(f"{'':<16}{'decode_token':>16}{'get_current_user':>20}")
+    for label, (decode_us, dependency_us) in results.items():
+        print(f"{label:<16}{decode_us:>14.2f}us{dependency_us:>18.2f}us")
+    without, with_cache = results["without cache"][0], results["with cache"][0]
+    print(f"decode_token is {without / with_cache:.1f}x faster with the cache")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.iterations)
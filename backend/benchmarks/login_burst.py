@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Measure login latency and public GET latency while a burst of logins hits
+a running server.
+
+Logins cost a bcrypt verification each. If hashing blocks the event loop,
+the public requests stall behind it; with hashing in the worker pool they
+stay fast while logins queue. Start the server first, then run from the
+backend directory:
+
+    python benchmarks/login_burst.py --username admin --password secret \\
+        [--base-url http://localhost:8000] [--logins 50] [--concurrency 20]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+PUBLIC_PATH = "/api/health"
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(label: str, samples, failures: int):
+    if not samples:
+        print(f"{label}: no successful requests ({failures} failed)")
+        return
+    print(
+        f"{label}: n={len(samples)} failed={failures} "
+        f"p50={percentile(samples, 0.5):.1f}ms p99={percentile(samples, 0.99):.1f}ms "
+        f"max={max(samples):.1f}ms mean={statistics.mean(samples):.1f}ms"
+    )
+
+
+async def timed(client: httpx.AsyncClient, method: str, path: str, **kwargs):
+    started = time.perf_counter()
+    response = await client.request(method, path, **kwargs)
+    return (time.perf_counter() - started) * 1000, response.status_code
+
+
+async def run(base_url: str, username: str, password: str, logins: int, concurrency: int):
+    limits = httpx.Limits(max_connections=concurrency + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        # Baseline for the public endpoint with the server idle
+        idle = [(await timed(client, "GET", PUBLIC_PATH))[0] for _ in range(20)]
+
+        semaphore = asyncio.Semaphore(concurrency)
+        login_samples, login_failures = [], 0
+        public_samples, public_failures = [], 0
+        burst_running = True
+
+        async def login():
+            nonlocal login_failures
+            async with semaphore:
+                elapsed, status = await timed(
+                    client, "POST", "/api/auth/login-json", json={"username": username, "password": password}
+                )
+            if status == 200:
+                login_samples.append(elapsed)
+            else:
+                login_failures += 1
+
+        async def poll_public():
+            nonlocal public_failures
+            while burst_running:
+                elapsed, status = await timed(client, "GET", PUBLIC_PATH)
+                if status == 200:
+                    public_samples.append(elapsed)
+                else:
+                    public_failures += 1
+                await asyncio.sleep(0.01)
+
+        pollers = [asyncio.create_task(poll_public()) for _ in range(4)]
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        duration = time.perf_counter() - started
+        burst_running = False
+        await asyncio.gather(*pollers)
+
+        print(f"{logins} logins at concurrency {concurrency} took {duration:.2f}s "
+              f"({logins / duration:.1f} logins/s)")
+        summarize("login", login_samples, login_failures)
+        summarize(f"GET {PUBLIC_PATH} idle", idle, 0)
+        summarize(f"GET {PUBLIC_PATH} during burst", public_samples, public_failures)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.base_url, args.username, args.password, args.logins, args.concurrency))
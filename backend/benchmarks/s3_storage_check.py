@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Check the S3 storage backend against a local S3 stand-in.
+
+Runs every ``StorageBackend`` operation of ``S3Storage`` (reads, writes,
+single-request and multipart streams, publish/fetch of local working
+files, moves, listings, presigned download and upload URLs) against a
+throwaway prefix of a bucket and reports which behave as the local backend
+does. Without ``--endpoint`` it starts an in-process moto S3 server (``pip
+install "moto[server]"``); pass the endpoint of a MinIO or LocalStack
+container to check against that instead. Exits non-zero if any check fails.
+Run from the backend directory:
+
+    python benchmarks/s3_storage_check.py [--endpoint http://localhost:9000 --access-key minioadmin --secret-key minioadmin]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import boto3  # noqa: E402
+from botocore.config import Config  # noqa: E402
+
+from services.storage import S3Storage  # noqa: E402
+
+
+def http(method: str, url: str, data: bytes = None, headers: dict = None):
+    """``(status, body)`` of a plain HTTP request, as a browser would send it"""
+    try:
+        with urlopen(Request(url, data=data, headers=headers or {}, method=method)) as response:
+            return response.status, response.read()
+    except HTTPError as e:
+        return e.code, e.read()
+
+
+async def chunked(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def checks(storage: S3Storage, verifies_checksums: bool):
+    """``(name, passed)`` for each operation, in the order they run; ``passed`` is None if skipped"""
+    data = os.urandom(4096)
+
+    storage.write_bytes("images/ab/photo.jpg", data)
+    yield "write_bytes / read_bytes", storage.read_bytes("images/ab/photo.jpg") == data
+    yield "exists / stat", storage.exists("images/ab/photo.jpg") and storage.stat("images/ab/photo.jpg")[0] == len(data)
+    yield "missing object", (
+        storage.read_bytes("images/ab/missing.jpg") is None
+        and storage.stat("images/ab/missing.jpg") is None
+        and not storage.exists("images/ab/missing.jpg")
+    )
+    head = storage.client.head_object(Bucket=storage.bucket, Key=storage.object_key("images/ab/photo.jpg"))
+    yield "content type / cache control", (
+        head["ContentType"] == "image/jpeg" and head.get("CacheControl") == storage.cache_control
+    )
+    yield "iter_bytes", b"".join(storage.iter_bytes("images/ab/photo.jpg", chunk_size=1000)) == data
+
+    small = os.urandom(10000)
+    written = asyncio.run(storage.write_stream("files/sm/small.pdf", chunked(small, 4096)))
+    yield "write_stream (one request)", written == len(small) and storage.read_bytes("files/sm/small.pdf") == small
+    large = os.urandom(storage.PART_SIZE * 2 + 1234)
+    written = asyncio.run(storage.write_stream("files/la/large.pdf", chunked(large, 1024 * 1024)))
+    yield "write_stream (multipart)", written == len(large) and storage.read_bytes("files/la/large.pdf") == large
+
+    path = storage.local_path("images/cd/built.png")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as built:
+        built.write(data)
+    storage.publish("images/cd/built.png")
+    yield "publish", not os.path.exists(path) and storage.read_bytes("images/cd/built.png") == data
+    fetched = storage.fetch("images/cd/built.png")
+    with open(fetched, "rb") as local:
+        yield "fetch", fetched == path and local.read() == data
+    os.remove(fetched)
+    with storage.local_copy("images/cd/built.png") as copy:
+        with open(copy, "rb") as local:
+            same = local.read() == data
+    yield "local_copy", same and not os.path.exists(copy)
+
+    storage.move("images/cd/built.png", ".quarantine/images/cd/built.png")
+    yield "move", (
+        not storage.exists("images/cd/built.png")
+        and storage.read_bytes(".quarantine/images/cd/built.png") == data
+    )
+
+    listed = [key for key, _, _ in storage.iter_objects()]
+    yield "iter_objects (sorted)", listed == sorted(listed) and "images/ab/photo.jpg" in listed
+    yield "iter_objects (prefix)", [key for key, _, _ in storage.iter_objects("images/")] == ["images/ab/photo.jpg"]
+    after = [key for key, _, _ in storage.iter_objects(start_after="files/la/large.pdf")]
+    yield "iter_objects (start_after)", after == [key for key in listed if key > "files/la/large.pdf"]
+
+    status, body = http("GET", storage.download_url("images/ab/photo.jpg"))
+    yield "download_url", status == 200 and body == data
+
+    upload = os.urandom(2048)
+    target = storage.upload_target("files/up/direct.pdf", len(upload), hashlib.sha256(upload).hexdigest())
+    if verifies_checksums:
+        status, _ = http(target["method"], target["url"], upload[:-1] + b"x", target["headers"])
+        yield "upload_target (wrong content rejected)", status >= 400 and not storage.exists("files/up/direct.pdf")
+    else:
+        yield "upload_target (wrong content rejected)", None
+    status, _ = http(target["method"], target["url"], upload, target["headers"])
+    yield "upload_target", status == 200 and storage.read_bytes("files/up/direct.pdf") == upload
+
+    for key, _, _ in list(storage.iter_objects()):
+        storage.delete(key)
+    yield "delete", not list(storage.iter_objects())
+
+
+def main(endpoint: str, bucket: str, region: str, access_key: str, secret_key: str, port: int) -> int:
+    server = None
+    if not endpoint:
+        from moto.server import ThreadedMotoServer
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)  # One log line per request otherwise
+        server = ThreadedMotoServer(port=port)
+        server.start()
+        endpoint = f"http://127.0.0.1:{port}"
+
+    client = boto3.client(
+        "s3", endpoint_url=endpoint, region_name=region,
+        aws_access_key_id=access_key, aws_secret_access_key=secret_key,
+        config=Config(signature_version="s3v4"),
+    )
+    if bucket not in [item["Name"] for item in client.list_buckets().get("Buckets", [])]:
+        client.create_bucket(Bucket=bucket)
+
+    scratch_dir = tempfile.mkdtemp(prefix="s3-storage-check-")
+    storage = S3Storage(
+        bucket, prefix=f"storage-check-{uuid.uuid4().hex[:8]}/", client=client, public_prefix="/uploads",
+        cache_control="public, max-age=60", scratch_dir=scratch_dir
+    )
+    storage.PART_SIZE = 5 * 1024 * 1024  # The smallest part S3 allows, to keep the multipart check quick
+
+    failed = 0
+    print(f"S3Storage against {endpoint}, bucket {bucket}, prefix {storage.prefix}")
+    try:
+        # moto accepts uploads whose x-amz-checksum-sha256 doesn't match; S3 and MinIO reject them
+        for name, passed in checks(storage, verifies_checksums=server is None):
+            failed += passed is False
+            print(f"{name:<42}{'skipped' if passed is None else 'ok' if passed else 'FAIL'}")
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        if server is not None:
+            server.stop()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--endpoint", help="S3 stand-in to use (default: start moto)")
+    parser.add_argument("--bucket", default="storage-check")
+    parser.add_argument("--region", default="us-east-1")
+    parser.add_argument("--access-key", default="testing")
+    parser.add_argument("--secret-key", default="testing")
+    parser.add_argument("--port", type=int, default=5055, help="Port of the moto server")
+    args = parser.parse_args()
+    sys.exit(main(args.endpoint, args.bucket, args.region, args.access_key, args.secret_key, args.port))
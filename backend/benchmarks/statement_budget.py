@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Check that list and export endpoints stay within their SQL statement budget.
+
+Seeds a throwaway SQLite database with more than a page of rows for every
+endpoint in ``services/loading_policies.py``, requests a 100-item page of
+each (after one warm-up request, so authentication caches are filled) and
+counts the statements it issues. Exits non-zero if any endpoint issues more
+than its policy's ``max_statements``, e.g. because a relationship is lazily
+loaded per row again. Run from the backend directory:
+
+    python benchmarks/statement_budget.py [--rows 120]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+DATABASE_FILE = os.path.join(tempfile.mkdtemp(prefix="statement-budget-"), "budget.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DATABASE_FILE}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from auth import get_password_hash  # noqa: E402
+from database import (  # noqa: E402
+    SessionLocal, engine, BlogPost, Community, Event, EventRegistration, GalleryItem, Order, Product, Project, User
+)
+from main import app  # noqa: E402
+from routers.auth import issue_tokens  # noqa: E402
+from services.loading_policies import LOADING_POLICIES  # noqa: E402
+
+
+def seed(db, rows: int) -> User:
+    admin = User(
+        email="budget@example.com", username="budget", full_name="Budget Admin",
+        hashed_password=get_password_hash("budget"), role="admin"
+    )
+    db.add(admin)
+    db.flush()
+    start = datetime.utcnow() + timedelta(days=1)
+    events = [
+        Event(title=f"Event {i}", description="-", start_date=start + timedelta(hours=i),
+              end_date=start + timedelta(hours=i + 1), location="Hall")
+        for i in range(rows)
+    ]
+    db.add_all(events)
+    db.flush()
+    for i in range(rows):
+        db.add_all([
+            EventRegistration(event_id=events[i].id, name=f"Attendee {i}", email=f"attendee{i}@example.com"),
+            User(email=f"user{i}@example.com", username=f"user{i}", full_name=f"User {i}", hashed_password="-"),
+            Community(name=f"Community {i}", description="-", category="tech"),
+            Project(title=f"Project {i}", description="-", creator_id=admin.id),
+            BlogPost(title=f"Post {i}", slug=f"post-{i}", content="-", status="published", author_id=admin.id),
+            Product(name=f"Product {i}", description="-", price=1.0, category="kits"),
+            GalleryItem(title=f"Photo {i}", image_url=f"/uploads/images/photo-{i}.jpg"),
+            Order(order_number=f"ORD-{i}", total_amount=1.0, shipping_address="-", contact_info="-", user_id=admin.id),
+        ])
+    db.commit()
+    return admin
+
+
+def main(rows: int) -> int:
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    over_budget = 0
+    with TestClient(app) as client:
+        db = SessionLocal()
+        try:
+            token = issue_tokens(db, seed(db, rows)).access_token
+        finally:
+            db.close()
+        headers = {"Authorization": f"Bearer {token}"}
+
+        print(f"{'endpoint':<28}{'status':>8}{'statements':>12}{'budget':>8}")
+        for name, policy in LOADING_POLICIES.items():
+            client.get(policy.path, headers=headers)  # Warm up
+            statements.clear()
+            response = client.get(policy.path, headers=headers)
+            count = len(statements)
+            failed = response.status_code != 200 or count > policy.max_statements
+            over_budget += failed
+            print(f"{name:<28}{response.status_code:>8}{count:>12}{policy.max_statements:>8}{'  FAIL' if failed else ''}")
+
+    os.remove(DATABASE_FILE)
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=120)
+    args = parser.parse_args()
+    sys.exit(main(args.rows))
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -11,6 +11,38 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     refresh_token_expire_days: int = 7
+    refresh_token_reuse_grace_seconds: int = 30  # The replaced token still works this long (parallel refreshes)
+    refresh_token_recheck_seconds: int = 30  # Sessions revoked by another worker process end within this
+    auth_user_cache_ttl_seconds: int = 30  # How long a token's user lookup is reused; 0 disables
+    auth_user_cache_max_entries: int = 10000
+    jwt_cache_max_entries: int = 10000  # Recently verified tokens; 0 disables
+    bcrypt_rounds: int = 12  # Changing it rehashes each password at its next successful login
+    password_hash_workers: int = 2  # bcrypt jobs running at once, off the event loop
+    password_hash_max_queue: int = 64  # Waiting jobs beyond this are refused with a 503
+    
+    # Login throttling (checked before any user lookup or bcrypt work)
+    login_throttle_window_seconds: int = 300
+    login_throttle_max_per_username: int = 10  # Attempts per window
+    login_throttle_max_per_ip: int = 30
+    login_throttle_free_failures: int = 3  # Failures in a row before backoff starts
+    login_throttle_base_backoff_seconds: float = 1.0  # Doubles with every further failure
+    login_throttle_max_backoff_seconds: float = 900.0
+    login_throttle_max_keys: int = 100000
+    login_throttle_trust_forwarded_for: bool = False  # Enable behind a reverse proxy that sets X-Forwarded-For
+    
+    # SQL instrumentation (Server-Timing header, per-route stats, N+1 warnings, slow query log)
+    sql_instrumentation_enabled: bool = True  # When off, no hooks or middleware are installed
+    sql_n_plus_one_threshold: int = 10  # The same statement this often in one request is flagged
+    slow_query_log_enabled: bool = True
+    slow_query_log_path: str = "logs/slow_queries.log"
+    slow_query_threshold_ms: float = 100.0
+    slow_query_sample_rate: float = 1.0  # Fraction of slow statements logged (and explained)
+    slow_query_log_max_bytes: int = 5242880  # 5MB, then rotated
+    slow_query_log_backups: int = 3
+    
+    # Prometheus metrics on /metrics
+    metrics_enabled: bool = True
+    metrics_token: Optional[str] = None  # When set, scrapers must send it as a bearer token
     
     # CORS
     allowed_origins: List[str] = [
@@ -29,6 +61,45 @@ class Settings(BaseSettings):
     # File uploads
     max_file_size: int = 10485760  # 10MB
     upload_dir: str = "uploads"
+    upload_session_dir: str = "upload_sessions"
+    upload_session_ttl_seconds: int = 86400  # 24 hours
+    
+    # File storage backend: "local" (upload_dir on disk) or "s3" (any S3-compatible service)
+    storage_backend: str = "local"
+    storage_scratch_dir: str = "storage_scratch"  # Local working files when using S3
+    presigned_url_ttl_seconds: int = 3600
+    s3_bucket: str = ""
+    s3_endpoint_url: Optional[str] = None  # e.g. http://localhost:9000 for MinIO
+    s3_region: Optional[str] = None
+    s3_access_key_id: Optional[str] = None
+    s3_secret_access_key: Optional[str] = None
+    s3_public_base_url: Optional[str] = None  # Public bucket/CDN URL; presigned URLs otherwise
+    
+    # Orphaned upload/QR file cleanup
+    storage_gc_mode: str = "quarantine"  # "quarantine" (move to .quarantine/) or "delete"
+    storage_gc_interval_seconds: int = 86400  # 24 hours
+    storage_gc_grace_seconds: int = 86400  # Unreferenced files younger than this are kept
+    storage_gc_quarantine_seconds: int = 604800  # 7 days before quarantined files are deleted
+    storage_gc_batch_size: int = 500
+    
+    # Multi-file gallery uploads
+    gallery_batch_max_files: int = 250
+    gallery_batch_max_bytes: int = 1073741824  # 1GB per request
+    
+    # Image processing
+    image_workers: int = 2
+    image_max_dimension: int = 1200
+    image_max_pixels: int = 40000000  # Larger uploads are rejected from the header, before decoding
+    image_variant_widths: List[int] = [320, 640, 960]
+    image_cache_dir: str = "image_cache"
+    image_cache_max_bytes: int = 536870912  # 512MB
+    image_resize_max_dimension: int = 2400
+    
+    # Background export jobs
+    export_dir: str = "exports"
+    export_job_workers: int = 2
+    export_job_max_pending: int = 20
+    export_job_ttl_seconds: int = 3600
     
     # Email (Gmail SMTP)
     smtp_host: str = "smtp.gmail.com"
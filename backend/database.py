@@ -321,6 +321,69 @@ class TeamMember(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
+class ImageAsset(Base):
+    __tablename__ = "image_assets"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(String, unique=True, index=True, nullable=False)  # Public URL of the original
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    format = Column(String, nullable=True)
+    file_size = Column(Integer, nullable=True)  # Bytes on disk
+    dominant_color = Column(String, nullable=True)  # "#rrggbb"
+    placeholder = Column(Text, nullable=True)  # Tiny LQIP as a data URI
+    variants = Column(Text, nullable=True)  # JSON array of {width, height, format, url}
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+
+class StoredObject(Base):
+    __tablename__ = "stored_objects"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(String, unique=True, index=True, nullable=False)  # Public URL of the stored file
+    digest = Column(String, index=True, nullable=False)  # SHA-256 of the uploaded bytes
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, default=0, nullable=False)  # Rows in IMAGE_URL_FIELDS pointing here
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+
+class RefreshTokenFamily(Base):
+    """One login session: the chain of refresh tokens rotated from a single login"""
+    __tablename__ = "refresh_token_families"
+    
+    id = Column(String(32), primary_key=True)  # Family id, the "fam" claim
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
+    current_jti = Column(String(32), nullable=False)  # The only refresh token of the family still valid
+    previous_jti = Column(String(32), nullable=True)  # Accepted briefly after rotation (concurrent refreshes)
+    rotated_at = Column(Integer, nullable=True)  # Unix time
+    expires_at = Column(Integer, index=True, nullable=False)  # Unix time; rows are purged after this
+    revoked_at = Column(Integer, nullable=True)  # Unix time; set on logout or token reuse
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class UserLoginKey(Base):
+    """Lower-cased username and email of every user, so a login is one primary-key seek"""
+    __tablename__ = "user_login_keys"
+    
+    key = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
+
+# Columns that hold public upload URLs (image metadata and reference counting)
+IMAGE_URL_FIELDS = [
+    (GalleryItem, "image_url"),
+    (Project, "image_url"),
+    (Event, "image_url"),
+    (BlogPost, "image_url"),
+    (Product, "image_url"),
+    (Community, "image_url"),
+    (Partner, "logo_url"),
+    (TeamMember, "image_url"),
+    (User, "avatar_url"),
+]
+
 def create_tables():
     Base.metadata.create_all(bind=engine)
 
@@ -1,13 +1,30 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse
 from contextlib import asynccontextmanager
+import asyncio
 import os
+import secrets
 
 from config import settings
-from database import engine, create_tables
-from routers import auth, users, communities, projects, events, blog, store, gallery, contact, upload, event_registrations, partners, team_members
+from database import engine, create_tables, SessionLocal
+from auth import password_hasher
+from services.export_jobs import export_jobs
+from services.upload_service import UploadSizeLimitMiddleware, ResumableUploadService
+from services.image_service import ImageService
+from services.storage import upload_storage, LocalStorage
+from services.storage_gc import storage_sweeper
+from services.refresh_tokens import refresh_tokens
+from services.login_keys import LoginKeys
+from services.frontend_bundle import FrontendBundle
+from services.sql_instrumentation import sql_instrumentation, SQLInstrumentationMiddleware
+from services.slow_query_log import slow_query_log
+from services.metrics import metrics, MetricsMiddleware
+from services.user_cache import user_cache
+from services.token_cache import token_cache
+from routers import auth, users, communities, projects, events, blog, store, gallery, contact, upload, event_registrations, partners, team_members, exports, images, admin_dashboard
+from routers.images import image_cache
 
 # Create upload directory if it doesn't exist (must happen before app initialization)
 if not os.path.exists(settings.upload_dir):
@@ -19,9 +36,27 @@ if not os.path.exists(settings.upload_dir):
 async def lifespan(app: FastAPI):
     # Startup
     create_tables()
+    db = SessionLocal()
+    try:
+        added = LoginKeys.backfill(db)
+        if added:
+            print(f"[STARTUP] Indexed {added} login identifiers of existing users")
+    finally:
+        db.close()
+    export_cleanup_task = asyncio.create_task(export_jobs.run_cleanup_loop())
+    upload_cleanup_task = asyncio.create_task(ResumableUploadService.run_cleanup_loop())
+    storage_gc_task = asyncio.create_task(storage_sweeper.run_loop(settings.storage_gc_interval_seconds))
+    refresh_token_cleanup_task = asyncio.create_task(refresh_tokens.run_cleanup_loop())
     
     yield
     # Shutdown - cleanup if needed
+    export_cleanup_task.cancel()
+    upload_cleanup_task.cancel()
+    storage_gc_task.cancel()
+    refresh_token_cleanup_task.cancel()
+    export_jobs.shutdown()
+    ImageService.shutdown()
+    password_hasher.shutdown()
 
 
 app = FastAPI(
@@ -39,8 +74,46 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-# Mount static files for uploads
-app.mount("/uploads", StaticFiles(directory=settings.upload_dir), name="uploads")
+# Refuse oversized uploads while the body is still arriving
+app.add_middleware(UploadSizeLimitMiddleware, path_prefixes=["/api/upload", "/api/gallery/upload"])
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    path_prefixes=["/api/gallery/batch"],
+    max_body_size=settings.gallery_batch_max_bytes
+)
+# Count and time the SQL statements of each request (Server-Timing header, /api/admin/sql/routes)
+if sql_instrumentation.enabled:
+    sql_instrumentation.install(engine)
+    app.add_middleware(SQLInstrumentationMiddleware, instrumentation=sql_instrumentation)
+# Log statements over the threshold with their query plan (/api/admin/sql/slow-queries)
+slow_query_log.install(engine)
+# Request counts, latency histograms and queue/cache gauges on /metrics (outermost, so it times everything)
+if settings.metrics_enabled:
+    metrics.watch_pool(engine)
+    metrics.add_gauge("export_jobs_pending", "Export jobs queued or running", export_jobs.pending_count)
+    metrics.add_gauge("password_hash_queued", "bcrypt jobs waiting for a worker", lambda: password_hasher.queued)
+    metrics.add_gauge("password_hash_running", "bcrypt jobs running", lambda: password_hasher.running)
+    metrics.add_cache("authenticated_user", user_cache)
+    metrics.add_cache("verified_token", token_cache)
+    metrics.add_cache("image", image_cache)
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+# Serve uploads straight from disk, or send clients to the storage backend
+# so file bytes never pass through the app
+if isinstance(upload_storage, LocalStorage):
+    app.mount("/uploads", StaticFiles(directory=settings.upload_dir), name="uploads")
+else:
+    @app.get("/uploads/{key:path}", include_in_schema=False)
+    async def redirect_upload(key: str):
+        try:
+            url = upload_storage.download_url(key)
+        except ValueError:
+            raise HTTPException(status_code=404, detail="Not Found")
+        # Presigned URLs expire, so only let clients reuse the redirect for a while
+        return RedirectResponse(
+            url,
+            status_code=307,
+            headers={"Cache-Control": f"public, max-age={settings.presigned_url_ttl_seconds // 2}"}
+        )
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
@@ -56,6 +129,9 @@ app.include_router(upload.router, prefix="/api/upload", tags=["Upload"])
 app.include_router(contact.router, prefix="/api/contact", tags=["Contact"])
 app.include_router(partners.router, prefix="/api/partners", tags=["Partners"])
 app.include_router(team_members.router, prefix="/api/team-members", tags=["Team Members"])
+app.include_router(exports.router, prefix="/api/exports", tags=["Exports"])
+app.include_router(images.router, prefix="/img", tags=["Images"])
+app.include_router(admin_dashboard.router, prefix="/api/admin", tags=["Admin"])
 
 
 # Health check endpoint
@@ -69,6 +145,18 @@ async def health_check():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """Prometheus scrape endpoint"""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if settings.metrics_token:
+        expected = f"Bearer {settings.metrics_token}".encode()
+        if not secrets.compare_digest(request.headers.get("authorization", "").encode(), expected):
+            raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # Serve frontend application static files
 # Determine the correct path to frontend dist
 backend_dir = os.path.dirname(__file__)
@@ -80,14 +168,12 @@ print(f"[STARTUP] Project root: {project_root}")
 print(f"[STARTUP] Looking for frontend at: {frontend_dist}")
 print(f"[STARTUP] Frontend exists: {os.path.exists(frontend_dist)}")
 
+# The whole bundle is indexed (and compressed) once; see services/frontend_bundle.py
+frontend_bundle = FrontendBundle(frontend_dist)
+
 if os.path.exists(frontend_dist):
     print(f"[STARTUP] Frontend contents: {os.listdir(frontend_dist)}")
-    # Mount assets directory
-    assets_dir = os.path.join(frontend_dist, "assets")
-    if os.path.exists(assets_dir):
-        app.mount("/assets", StaticFiles(directory=assets_dir), name="assets")
-        print(f"[STARTUP] Mounted /assets from: {assets_dir}")
-        print(f"[STARTUP] Assets contents: {os.listdir(assets_dir)}")
+    frontend_bundle.load()
 else:
     print(f"[WARNING] Frontend dist not found")
     print(f"[WARNING] Parent directory contents: {os.listdir(project_root)}")
@@ -96,29 +182,29 @@ else:
 
 
 # SPA catchall - must be LAST, serves index.html for non-API routes
-@app.api_route("/{full_path:path}", methods=["GET"], include_in_schema=False)
-async def serve_spa(full_path: str):
+@app.api_route("/{full_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_spa(full_path: str, request: Request):
     """Catchall route - serves React SPA for all non-API/docs paths"""
-    # Don't handle API routes, docs, or uploads here`n    # Assets are served by the file serving logic below (file_path check) (they have their own handlers)
+    # Don't handle API routes or docs here (they have their own handlers)
     if full_path.startswith(("api/", "docs", "redoc", "openapi.json")):
         # Let FastAPI's normal 404 handling work
         raise HTTPException(status_code=404, detail="Not Found")
     
     # Check if frontend exists
-    if not os.path.exists(frontend_dist):
+    if not frontend_bundle.loaded:
         return {"error": "Frontend not deployed", "path": full_path}
     
-    # Try to serve a specific file if it exists
-    file_path = os.path.join(frontend_dist, full_path)
-    if os.path.isfile(file_path):
-        return FileResponse(file_path)
+    # Serve a specific file of the bundle if it exists
+    bundle_file = frontend_bundle.get(full_path)
+    if bundle_file:
+        return frontend_bundle.response(bundle_file, request.headers)
     
-    # Otherwise serve index.html for SPA routing
-    index_path = os.path.join(frontend_dist, "index.html")
-    if os.path.exists(index_path):
-        return FileResponse(index_path)
+    # A missing asset is a stale or broken link, not a client-side route
+    if full_path.startswith("assets/"):
+        raise HTTPException(status_code=404, detail="Not Found")
     
-    return {"error": "Frontend index.html not found", "checked": index_path}
+    # Otherwise serve index.html for SPA routing
+    return frontend_bundle.response(frontend_bundle.index, request.headers)
 
 
 if __name__ == "__main__":
@@ -70,6 +70,20 @@ def migrate_database():
             else:
                 print(f"❌ Error adding is_read column: {e}")
         
+        # Add image metadata columns to image_assets (new installs get them from create_all)
+        for column, column_type in [("file_size", "INTEGER"), ("dominant_color", "TEXT"), ("placeholder", "TEXT")]:
+            try:
+                cursor.execute(f"ALTER TABLE image_assets ADD COLUMN {column} {column_type}")
+                print(f"✅ Added {column} column to image_assets")
+            except sqlite3.OperationalError as e:
+                if "duplicate column name" in str(e):
+                    print(f"⚠️ {column} column already exists")
+                elif "no such table" in str(e):
+                    print("⚠️ image_assets table does not exist yet; it will be created on startup")
+                    break
+                else:
+                    print(f"❌ Error adding {column} column: {e}")
+        
         # Update existing data with default values
         print("\n🔄 Updating existing data with default values...")
         
@@ -0,0 +1,109 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from database import User
+from schemas import APIResponse
+from auth import require_admin, password_hasher
+from services.login_throttle import login_throttle
+from services.refresh_tokens import refresh_tokens
+from services.sql_instrumentation import sql_instrumentation
+from services.slow_query_log import slow_query_log
+from services.storage_gc import storage_sweeper
+
+router = APIRouter()
+
+
+@router.get("/storage/gc", response_model=APIResponse)
+async def get_storage_gc_status(current_user: User = Depends(require_admin)):
+    """Report of the last orphaned file sweep (admin only)"""
+    return APIResponse(
+        success=True,
+        message="Storage sweep is running" if storage_sweeper.running else "Storage sweep status retrieved",
+        data={
+            "running": storage_sweeper.running,
+            "mode": storage_sweeper.mode,
+            "grace_seconds": storage_sweeper.grace_seconds,
+            "quarantine_seconds": storage_sweeper.quarantine_seconds,
+            "last_report": storage_sweeper.last_report
+        }
+    )
+
+
+@router.post("/storage/gc", response_model=APIResponse)
+async def run_storage_gc(dry_run: bool = True, current_user: User = Depends(require_admin)):
+    """
+    Sweep orphaned upload and QR code files now (admin only).
+
+    Defaults to a dry run that only reports what would be removed.
+    """
+    if storage_sweeper.running:
+        raise HTTPException(status_code=409, detail="A storage sweep is already running")
+
+    report = await storage_sweeper.sweep(dry_run=dry_run)
+    return APIResponse(
+        success=True,
+        message=f"Storage sweep finished, {report['reclaimed_bytes']} bytes reclaimed",
+        data=report
+    )
+
+
+@router.get("/auth/password-hashing", response_model=APIResponse)
+async def get_password_hashing_stats(current_user: User = Depends(require_admin)):
+    """Queueing and timing of the bcrypt worker pool (admin only)"""
+    return APIResponse(
+        success=True,
+        message="Password hashing stats retrieved",
+        data=password_hasher.stats()
+    )
+
+
+@router.get("/auth/login-throttle", response_model=APIResponse)
+async def get_login_throttle_stats(current_user: User = Depends(require_admin)):
+    """Counters of the login attempt limiter (admin only)"""
+    return APIResponse(
+        success=True,
+        message="Login throttle stats retrieved",
+        data=login_throttle.stats()
+    )
+
+
+@router.get("/auth/sessions", response_model=APIResponse)
+async def get_session_stats(current_user: User = Depends(require_admin)):
+    """Active refresh-token families, rotations and detected reuse (admin only)"""
+    return APIResponse(
+        success=True,
+        message="Session stats retrieved",
+        data=refresh_tokens.stats()
+    )
+
+
+@router.get("/sql/routes", response_model=APIResponse)
+async def get_sql_route_stats(current_user: User = Depends(require_admin)):
+    """SQL statement counts, database time and likely N+1 queries per route (admin only)"""
+    return APIResponse(
+        success=True,
+        message="SQL stats retrieved",
+        data=sql_instrumentation.stats()
+    )
+
+
+@router.delete("/sql/routes", response_model=APIResponse)
+async def reset_sql_route_stats(current_user: User = Depends(require_admin)):
+    """Start the per-route SQL stats over (admin only)"""
+    sql_instrumentation.reset()
+    return APIResponse(success=True, message="SQL stats reset")
+
+
+@router.get("/sql/slow-queries", response_model=APIResponse)
+async def get_slow_queries(limit: int = Query(100, ge=1, le=1000), current_user: User = Depends(require_admin)):
+    """
+    Newest slow-query log entries and a summary per statement, with query
+    plans and the tables they scan in full (admin only)
+    """
+    return APIResponse(
+        success=True,
+        message="Slow queries retrieved",
+        data=await asyncio.to_thread(slow_query_log.stats, limit)
+    )
+
@@ -1,38 +1,71 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from datetime import timedelta
+from typing import Optional
 
 from database import get_db, User
-from schemas import UserCreate, User as UserSchema, Token, LoginRequest, APIResponse
+from schemas import UserCreate, User as UserSchema, Token, LoginRequest, RefreshRequest, APIResponse
 from auth import (
     authenticate_user, 
     create_access_token, 
     create_refresh_token,
-    get_password_hash,
-    verify_token,
+    password_hasher,
+    decode_token,
+    get_current_active_user,
     require_admin
 )
 from config import settings
+from services.login_keys import LoginKeys
+from services.login_throttle import login_throttle
+from services.refresh_tokens import refresh_tokens
+from services.user_cache import user_cache
 
 router = APIRouter()
 
 
+def issue_tokens(db: Session, user: User, family_id: Optional[str] = None, jti: Optional[str] = None) -> Token:
+    """Access and refresh tokens for ``user``; a login (no ``family_id``) starts a new session family"""
+    if family_id is None:
+        family_id, jti, _ = refresh_tokens.issue(db, user.id)
+    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
+    access_token = create_access_token(
+        data={"sub": user.username, "fam": family_id}, expires_delta=access_token_expires
+    )
+    refresh_token = create_refresh_token(data={"sub": user.username, "fam": family_id, "jti": jti})
+    
+    return Token(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        token_type="bearer"
+    )
+
+
+async def authenticate_throttled(request: Request, db: Session, username: str, password: str):
+    """authenticate_user behind the login throttle, which answers 429 before any lookup or bcrypt work"""
+    client_ip = login_throttle.client_ip(request)
+    login_throttle.check(username, client_ip)
+    user = await authenticate_user(db, username, password)
+    if user:
+        login_throttle.record_success(username, client_ip)
+    else:
+        login_throttle.record_failure(username, client_ip)
+    return user
+
+
 @router.post("/register", response_model=APIResponse)
 async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
     """Public user registration"""
     # Check if user already exists
-    db_user = db.query(User).filter(
-        (User.email == user_data.email) | (User.username == user_data.username)
-    ).first()
-    if db_user:
+    if LoginKeys.taken(db, user_data.username, user_data.email):
         raise HTTPException(
             status_code=400,
             detail="User with this email or username already exists"
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     db_user = User(
         email=user_data.email,
         username=user_data.username,
@@ -42,7 +75,15 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
         is_active=True
     )
     db.add(db_user)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Registered concurrently under the same username or email
+        db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail="User with this email or username already exists"
+        )
     db.refresh(db_user)
     
     return APIResponse(
@@ -55,15 +96,12 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
 @router.post("/admin-create-user", response_model=APIResponse)
 async def admin_create_user(user_data: UserCreate, db: Session = Depends(get_db), current_user: User = Depends(require_admin)):
     """Admin-only: Create a new user"""
-    db_user = db.query(User).filter(
-        (User.email == user_data.email) | (User.username == user_data.username)
-    ).first()
-    if db_user:
+    if LoginKeys.taken(db, user_data.username, user_data.email):
         raise HTTPException(
             status_code=400,
             detail="User with this email or username already exists"
         )
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     db_user = User(
         email=user_data.email,
         username=user_data.username,
@@ -71,7 +109,15 @@ async def admin_create_user(user_data: UserCreate, db: Session = Depends(get_db)
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Registered concurrently under the same username or email
+        db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail="User with this email or username already exists"
+        )
     db.refresh(db_user)
     return APIResponse(
         success=True,
@@ -81,9 +127,9 @@ async def admin_create_user(user_data: UserCreate, db: Session = Depends(get_db)
 
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """Login user and return JWT tokens"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_throttled(request, db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -91,72 +137,73 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Create tokens
-    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
-    refresh_token = create_refresh_token(data={"sub": user.username})
-    
-    return Token(
-        access_token=access_token,
-        refresh_token=refresh_token,
-        token_type="bearer"
-    )
+    return issue_tokens(db, user)
 
 
 @router.post("/login-json", response_model=Token)
-async def login_json(login_data: LoginRequest, db: Session = Depends(get_db)):
+async def login_json(request: Request, login_data: LoginRequest, db: Session = Depends(get_db)):
     """Login user with JSON data and return JWT tokens"""
-    user = authenticate_user(db, login_data.username, login_data.password)
+    user = await authenticate_throttled(request, db, login_data.username, login_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
         )
     
-    # Create tokens
-    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
-    refresh_token = create_refresh_token(data={"sub": user.username})
-    
-    return Token(
-        access_token=access_token,
-        refresh_token=refresh_token,
-        token_type="bearer"
-    )
+    return issue_tokens(db, user)
 
 
 @router.post("/refresh", response_model=Token)
-async def refresh_token(refresh_token: str, db: Session = Depends(get_db)):
-    """Refresh access token using refresh token"""
+async def refresh_token(
+    refresh_token: Optional[str] = None,
+    body: Optional[RefreshRequest] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Exchange a refresh token (query parameter or JSON body) for new tokens.
+
+    Each refresh token works once; presenting one that was already exchanged
+    revokes the whole session.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        username = verify_token(refresh_token, credentials_exception)
-        user = db.query(User).filter(User.username == username).first()
-        if user is None:
-            raise credentials_exception
-    except:
+    token = refresh_token or (body.refresh_token if body else None)
+    if not token:
+        raise credentials_exception
+    payload = decode_token(token, credentials_exception)
+    # Only refresh tokens from a session family (not access tokens, nor pre-rotation tokens)
+    if payload.get("type") != "refresh" or not payload.get("fam"):
         raise credentials_exception
     
-    # Create new tokens
-    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
-    new_refresh_token = create_refresh_token(data={"sub": user.username})
+    user = db.query(User).filter(User.username == payload["sub"]).first()
+    if user is None or not user.is_active:
+        raise credentials_exception
     
-    return Token(
-        access_token=access_token,
-        refresh_token=new_refresh_token,
-        token_type="bearer"
+    jti, _ = refresh_tokens.rotate(db, payload["fam"], payload.get("jti"))
+    return issue_tokens(db, user, family_id=payload["fam"], jti=jti)
+
+
+@router.post("/logout", response_model=APIResponse)
+async def logout(body: RefreshRequest, db: Session = Depends(get_db)):
+    """End the session of a refresh token; its access tokens stop working too"""
+    payload = decode_token(body.refresh_token, HTTPException(status_code=401, detail="Invalid refresh token"))
+    if payload.get("type") == "refresh" and payload.get("fam"):
+        refresh_tokens.revoke_family(db, payload["fam"])
+    return APIResponse(success=True, message="Logged out successfully")
+
+
+@router.post("/logout-all", response_model=APIResponse)
+async def logout_all(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+    """End every session of the current user"""
+    revoked = refresh_tokens.revoke_user(db, current_user.id)
+    return APIResponse(
+        success=True,
+        message=f"Logged out of {revoked} sessions",
+        data={"revoked_sessions": revoked}
     )
 
 
@@ -179,6 +226,7 @@ async def bootstrap_admin(db: Session = Depends(get_db)):
     # Upgrade to admin
     first_user.role = "admin"
     db.commit()
+    user_cache.invalidate(first_user.username)
     db.refresh(first_user)
     
     return APIResponse(
@@ -194,12 +242,11 @@ async def reset_admin_password(db: Session = Depends(get_db)):
     admin_user = db.query(User).filter(User.username == "admin").first()
     if not admin_user:
         # Create admin user if doesn't exist
-        from auth import get_password_hash
         admin_user = User(
             username="admin",
             email="admin@izonedevs.co.zw",
             full_name="Administrator",
-            hashed_password=get_password_hash("Admin@iZone2025!"),
+            hashed_password=await password_hasher.hash("Admin@iZone2025!"),
             role="admin",
             is_active=True
         )
@@ -213,11 +260,12 @@ async def reset_admin_password(db: Session = Depends(get_db)):
         )
     
     # Reset password
-    from auth import get_password_hash
-    admin_user.hashed_password = get_password_hash("Admin@iZone2025!")
+    admin_user.hashed_password = await password_hasher.hash("Admin@iZone2025!")
     admin_user.role = "admin"
     admin_user.is_active = True
     db.commit()
+    user_cache.invalidate(admin_user.username)
+    refresh_tokens.revoke_user(db, admin_user.id)
     
     return APIResponse(
         success=True,
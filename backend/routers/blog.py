@@ -13,6 +13,8 @@ from schemas import (
     PaginatedResponse
 )
 from auth import get_current_active_user, require_admin
+from services.image_service import ImageService
+from services.loading_policies import apply_policy
 
 router = APIRouter()
 
@@ -49,10 +51,10 @@ async def get_blog_posts(
         )
     
     total = query.count()
-    posts = query.order_by(BlogPost.created_at.desc()).offset((page - 1) * size).limit(size).all()
+    posts = apply_policy(query, "blog.list").order_by(BlogPost.created_at.desc()).offset((page - 1) * size).limit(size).all()
     
     return PaginatedResponse(
-        items=[BlogPostSchema.from_orm(post).dict() for post in posts],
+        items=ImageService.attach(db, [BlogPostSchema.from_orm(post).dict() for post in posts]),
         total=total,
         page=page,
         size=size,
@@ -11,6 +11,8 @@ from schemas import (
     PaginatedResponse
 )
 from auth import get_current_active_user, require_admin
+from services.image_service import ImageService
+from services.loading_policies import apply_policy
 
 router = APIRouter()
 
@@ -36,10 +38,10 @@ async def get_communities(
         )
     
     total = query.count()
-    communities = query.offset((page - 1) * size).limit(size).all()
+    communities = apply_policy(query, "communities.list").offset((page - 1) * size).limit(size).all()
     
     return PaginatedResponse(
-        items=[CommunitySchema.from_orm(community).dict() for community in communities],
+        items=ImageService.attach(db, [CommunitySchema.from_orm(community).dict() for community in communities]),
         total=total,
         page=page,
         size=size,
@@ -13,6 +13,7 @@ from schemas import (
 )
 from auth import get_current_active_user, require_admin
 from services.email_service import EmailService
+from services.query_filters import filter_contact_messages
 
 router = APIRouter()
 
@@ -57,17 +58,7 @@ async def get_contact_messages(
     current_user: User = Depends(require_admin)
 ):
     """Get paginated list of contact messages (admin only)"""
-    query = db.query(ContactMessage)
-    
-    if status:
-        query = query.filter(ContactMessage.status == status)
-    
-    if search:
-        query = query.filter(
-            (ContactMessage.name.contains(search)) |
-            (ContactMessage.email.contains(search)) |
-            (ContactMessage.subject.contains(search))
-        )
+    query = filter_contact_messages(db.query(ContactMessage), status=status, search=search)
     
     total = query.count()
     messages = query.order_by(ContactMessage.created_at.desc()).offset((page - 1) * size).limit(size).all()
@@ -2,7 +2,6 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
-import os
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Border, Side
 from io import BytesIO
@@ -18,7 +17,11 @@ from schemas import (
 )
 from auth import get_current_active_user, require_admin
 from services.qr_service import QRCodeService
+from services.archive_service import ArchiveService
+from services.loading_policies import apply_policy
+from services.storage import qr_storage
 from services.email_service import EmailService
+from services.query_filters import filter_registrations
 
 router = APIRouter()
 
@@ -110,25 +113,19 @@ async def get_event_registrations(
     current_user: User = Depends(require_admin)
 ):
     """Get event registrations (admin only)"""
-    query = db.query(EventRegistration)
-    
-    if event_id:
-        query = query.filter(EventRegistration.event_id == event_id)
-    
-    if status:
-        query = query.filter(EventRegistration.registration_status == status)
-    
-    if search:
-        query = query.filter(
-            (EventRegistration.name.contains(search)) |
-            (EventRegistration.email.contains(search)) |
-            (EventRegistration.organization.contains(search))
-        )
+    query = filter_registrations(
+        db.query(EventRegistration),
+        event_id=event_id,
+        status=status,
+        search=search
+    )
     
     total = query.count()
-    registrations = query.order_by(EventRegistration.created_at.desc()).offset((page - 1) * size).limit(size).all()
+    registrations = apply_policy(query, "event_registrations.list").order_by(
+        EventRegistration.created_at.desc()
+    ).offset((page - 1) * size).limit(size).all()
     
-    # Include event details
+    # Include event details (loaded with the registrations, see loading_policies)
     results = []
     for registration in registrations:
         reg_dict = EventRegistrationSchema.from_orm(registration).dict()
@@ -157,7 +154,7 @@ async def export_registrations_excel(
     current_user: User = Depends(require_admin)
 ):
     """Export event registrations to Excel (admin only)"""
-    query = db.query(EventRegistration).join(Event)
+    query = apply_policy(db.query(EventRegistration).join(Event), "event_registrations.export")
     
     if event_id:
         query = query.filter(EventRegistration.event_id == event_id)
@@ -247,6 +244,41 @@ async def export_registrations_excel(
     )
 
 
+@router.get("/{event_id}/qr-codes")
+async def download_event_qr_codes(
+    event_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Download the QR codes of all registrations for an event as one ZIP (admin only)"""
+    event = db.query(Event).filter(Event.id == event_id).first()
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    registrations = db.query(
+        EventRegistration.id, EventRegistration.name, EventRegistration.qr_code_path
+    ).filter(
+        EventRegistration.event_id == event_id,
+        EventRegistration.qr_code_path.isnot(None)
+    ).order_by(EventRegistration.id).all()
+    
+    used_names = set()
+    entries = [
+        (
+            ArchiveService.entry_name(f"{registration.id} {registration.name}", ".png", used_names),
+            QRCodeService.storage_key(registration.qr_code_path)
+        )
+        for registration in registrations
+    ]
+    
+    filename = f"event_{event_id}_qr_codes.zip"
+    return StreamingResponse(
+        ArchiveService.stream_zip(qr_storage, entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
 @router.put("/registrations/{registration_id}/status", response_model=APIResponse)
 async def update_registration_status(
     registration_id: int,
@@ -284,8 +316,8 @@ async def delete_registration(
         raise HTTPException(status_code=404, detail="Registration not found")
     
     # Remove QR code file if it exists
-    if registration.qr_code_path and os.path.exists(registration.qr_code_path):
-        os.remove(registration.qr_code_path)
+    if registration.qr_code_path:
+        QRCodeService.delete_qr_code(registration.qr_code_path)
     
     db.delete(registration)
     db.commit()
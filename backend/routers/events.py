@@ -12,6 +12,9 @@ from schemas import (
     PaginatedResponse
 )
 from auth import get_current_active_user, require_admin
+from services.image_service import ImageService
+from services.qr_service import QRCodeService
+from services.loading_policies import apply_policy
 
 router = APIRouter()
 
@@ -38,10 +41,10 @@ async def get_events(
         query = query.filter(Event.start_date > datetime.utcnow())
     
     total = query.count()
-    events = query.order_by(Event.start_date.asc()).offset((page - 1) * size).limit(size).all()
+    events = apply_policy(query, "events.list").order_by(Event.start_date.asc()).offset((page - 1) * size).limit(size).all()
     
     return PaginatedResponse(
-        items=[EventSchema.from_orm(event).dict() for event in events],
+        items=ImageService.attach(db, [EventSchema.from_orm(event).dict() for event in events]),
         total=total,
         page=page,
         size=size,
@@ -83,7 +86,9 @@ async def get_event_registrations_compat(
 
     total = query.count()
     # Sort by creation date, newest first
-    registrations = query.order_by(EventRegistration.created_at.desc()).offset((page - 1) * size).limit(size).all()
+    registrations = apply_policy(query, "events.registrations").order_by(
+        EventRegistration.created_at.desc()
+    ).offset((page - 1) * size).limit(size).all()
 
     return {
         "items": registrations,
@@ -150,6 +155,14 @@ async def delete_event(
     
     from database import EventRegistration
     
+    # The bulk delete skips per-registration cleanup, so remember their QR codes
+    qr_code_paths = [
+        path for (path,) in db.query(EventRegistration.qr_code_path).filter(
+            EventRegistration.event_id == event_id,
+            EventRegistration.qr_code_path.isnot(None)
+        )
+    ]
+    
     # Delete all registrations for this event first
     db.query(EventRegistration).filter(EventRegistration.event_id == event_id).delete()
     
@@ -157,6 +170,13 @@ async def delete_event(
     db.delete(event)
     db.commit()
     
+    for path in qr_code_paths:
+        try:
+            QRCodeService.delete_qr_code(path)
+        except Exception as e:
+            # Left for the storage sweeper
+            print(f"Failed to delete QR code {path}: {e}")
+    
     return APIResponse(
         success=True,
         message="Event deleted successfully"
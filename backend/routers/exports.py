@@ -0,0 +1,200 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse, FileResponse
+from typing import Optional
+from datetime import datetime
+import json
+import os
+
+from database import User
+from schemas import ExportJobCreate, APIResponse
+from auth import require_admin
+from services.export_service import ExportService, EXPORT_SPECS
+from services.export_jobs import export_jobs
+
+router = APIRouter()
+
+
+def get_job_or_404(job_id: str):
+    job = export_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job
+
+
+@router.post("/jobs", response_model=APIResponse)
+async def create_export_job(
+    job_data: ExportJobCreate,
+    current_user: User = Depends(require_admin)
+):
+    """Start a background export job (admin only)"""
+    spec = ExportService.get_spec(job_data.dataset)
+    if not spec:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown dataset. Available: {', '.join(EXPORT_SPECS)}"
+        )
+
+    if job_data.format not in ExportService.FILE_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format. Must be one of: {list(ExportService.FILE_FORMATS)}"
+        )
+
+    if job_data.format in ExportService.COLUMNAR_FORMATS and not ExportService.columnar_available():
+        raise HTTPException(status_code=501, detail="Columnar exports require pyarrow to be installed")
+
+    filters = job_data.filters.dict(exclude_none=True)
+    unsupported = [key for key in filters if key not in spec.filter_params]
+    if unsupported:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported filters for {job_data.dataset}: {', '.join(unsupported)}. "
+                   f"Available: {', '.join(spec.filter_params)}"
+        )
+
+    try:
+        job = export_jobs.submit(spec, job_data.dataset, job_data.format, filters, current_user.id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    return APIResponse(
+        success=True,
+        message="Export job queued",
+        data=job.to_dict()
+    )
+
+
+@router.get("/jobs", response_model=APIResponse)
+async def list_export_jobs(current_user: User = Depends(require_admin)):
+    """List the current admin's export jobs (admin only)"""
+    export_jobs.cleanup_expired()
+    return APIResponse(
+        success=True,
+        message="Export jobs retrieved",
+        data={"jobs": [job.to_dict() for job in export_jobs.list_jobs(created_by=current_user.id)]}
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=APIResponse)
+async def get_export_job(job_id: str, current_user: User = Depends(require_admin)):
+    """Get the status of an export job (admin only)"""
+    job = get_job_or_404(job_id)
+    return APIResponse(
+        success=True,
+        message=f"Export job is {job.status}",
+        data=job.to_dict()
+    )
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_export_job_events(
+    job_id: str,
+    request: Request,
+    current_user: User = Depends(require_admin)
+):
+    """Subscribe to export job progress as Server-Sent Events (admin only)"""
+    job = get_job_or_404(job_id)
+
+    async def event_stream():
+        version = -1
+        while True:
+            if job.version != version:
+                version = job.version
+                yield f"event: {job.status}\ndata: {json.dumps(job.to_dict())}\n\n"
+                if job.is_finished:
+                    return
+            else:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+
+            if await request.is_disconnected():
+                return
+            await export_jobs.wait_for_change(job, version)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/jobs/{job_id}/download")
+async def download_export_job(job_id: str, current_user: User = Depends(require_admin)):
+    """Download the file produced by a completed export job (admin only)"""
+    job = get_job_or_404(job_id)
+    if job.status != "completed" or not job.file_path or not os.path.exists(job.file_path):
+        raise HTTPException(status_code=409, detail=f"Export job is {job.status}")
+
+    return FileResponse(
+        job.file_path,
+        media_type=ExportService.FILE_FORMATS[job.format],
+        filename=job.filename
+    )
+
+
+@router.get("/{dataset}")
+async def export_dataset(
+    dataset: str,
+    request: Request,
+    format: str = "csv",
+    compress: Optional[bool] = None,
+    event_id: Optional[int] = None,
+    status: Optional[str] = None,
+    search: Optional[str] = None,
+    role: Optional[str] = None,
+    category: Optional[str] = None,
+    featured: Optional[bool] = None,
+    available: Optional[bool] = None,
+    user_id: Optional[int] = None,
+    current_user: User = Depends(require_admin)
+):
+    """
+    Stream an admin table as CSV, NDJSON, Arrow or Parquet (admin only).
+
+    Accepts the same filters as the matching list endpoint. CSV and NDJSON
+    are gzip compressed on the fly when ``compress`` is set or, if it is
+    omitted, when the client advertises gzip support. Arrow and Parquet are
+    typed and already compressed internally (zstd).
+    """
+    spec = ExportService.get_spec(dataset)
+    if not spec:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown dataset. Available: {', '.join(EXPORT_SPECS)}"
+        )
+
+    if format not in ExportService.STREAM_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format. Must be one of: {list(ExportService.STREAM_FORMATS)}"
+        )
+
+    if format in ExportService.COLUMNAR_FORMATS and not ExportService.columnar_available():
+        raise HTTPException(status_code=501, detail="Columnar exports require pyarrow to be installed")
+
+    filters = {
+        "event_id": event_id,
+        "status": status,
+        "search": search,
+        "role": role,
+        "category": category,
+        "featured": featured,
+        "available": available,
+        "user_id": user_id,
+    }
+
+    if format in ExportService.COLUMNAR_FORMATS:
+        compress = False
+    elif compress is None:
+        compress = "gzip" in request.headers.get("accept-encoding", "")
+
+    body = ExportService.iter_export(spec, format, filters)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    headers = {"Content-Disposition": f"attachment; filename={spec.name}_{timestamp}.{format}"}
+
+    if compress:
+        body = ExportService.gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+
+    return StreamingResponse(body, media_type=ExportService.STREAM_FORMATS[format], headers=headers)
@@ -1,9 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
-import uuid
-from PIL import Image
 
 from database import get_db, GalleryItem, User
 from schemas import (
@@ -14,6 +13,10 @@ from schemas import (
 )
 from auth import get_current_active_user, require_admin
 from config import settings
+from services.image_service import ImageService
+from services.archive_service import ArchiveService
+from services.storage import upload_storage
+from services.loading_policies import apply_policy
 
 router = APIRouter()
 
@@ -36,10 +39,10 @@ async def get_gallery_items(
         query = query.filter(GalleryItem.featured == featured)
     
     total = query.count()
-    items = query.order_by(GalleryItem.created_at.desc()).offset((page - 1) * size).limit(size).all()
+    items = apply_policy(query, "gallery.list").order_by(GalleryItem.created_at.desc()).offset((page - 1) * size).limit(size).all()
     
     return PaginatedResponse(
-        items=[GalleryItemSchema.from_orm(item).dict() for item in items],
+        items=ImageService.attach(db, [GalleryItemSchema.from_orm(item).dict() for item in items]),
         total=total,
         page=page,
         size=size,
@@ -53,7 +56,7 @@ async def get_gallery_item(item_id: int, db: Session = Depends(get_db)):
     item = db.query(GalleryItem).filter(GalleryItem.id == item_id).first()
     if not item:
         raise HTTPException(status_code=404, detail="Gallery item not found")
-    return item
+    return ImageService.attach(db, [GalleryItemSchema.from_orm(item).dict()])[0]
 
 
 @router.post("", response_model=GalleryItemSchema)
@@ -73,9 +76,9 @@ async def create_gallery_item(
 @router.post("/upload", response_model=APIResponse)
 async def upload_gallery_image(
     file: UploadFile = File(...),
-    title: str = "",
-    description: str = "",
-    category: str = "",
+    title: str = Form(""),
+    description: str = Form(""),
+    category: str = Form(""),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin)
 ):
@@ -84,21 +87,13 @@ async def upload_gallery_image(
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
     
-    # Generate unique filename
+    # Store by content hash; new images get orientation fixed, metadata
+    # stripped and responsive variants built, duplicates reuse the stored file
     file_extension = os.path.splitext(file.filename)[1]
-    filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(settings.upload_dir, "gallery", filename)
-    
-    # Create directory if it doesn't exist
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    
-    # Save file
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    stored, asset = await ImageService.store_image(db, file, "gallery", file_extension)
+    image_url = stored["url"]
     
     # Create gallery item
-    image_url = f"/uploads/gallery/{filename}"
     db_item = GalleryItem(
         title=title or file.filename,
         description=description,
@@ -115,11 +110,76 @@ async def upload_gallery_image(
         message="Image uploaded successfully",
         data={
             "id": db_item.id,
-            "image_url": image_url
+            "image_url": image_url,
+            "image": ImageService.describe(asset)
         }
     )
 
 
+@router.post("/batch", response_model=APIResponse)
+async def upload_gallery_batch(
+    files: List[UploadFile] = File(...),
+    description: str = Form(""),
+    category: str = Form(""),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Upload many gallery images in one request (admin only).
+
+    Images are processed in parallel and every accepted file becomes a
+    gallery item titled after its file name, all created in one
+    transaction. ``results`` has an entry per file, in upload order, with
+    either the new item or the reason the file was rejected.
+    """
+    if len(files) > settings.gallery_batch_max_files:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files. Maximum is {settings.gallery_batch_max_files} per batch"
+        )
+    
+    stored_images = await ImageService.store_images(db, files, "gallery")
+    
+    results = []
+    items = []
+    seen_urls = set()
+    for file, result in zip(files, stored_images):
+        if isinstance(result, HTTPException):
+            results.append({"filename": file.filename, "success": False, "error": result.detail})
+            continue
+        stored, asset = result
+        db_item = GalleryItem(
+            title=os.path.splitext(file.filename)[0] or file.filename,
+            description=description,
+            image_url=stored["url"],
+            category=category or "general"
+        )
+        items.append(db_item)
+        results.append({
+            "filename": file.filename,
+            "success": True,
+            "image_url": stored["url"],
+            # Identical files in one batch are stored once
+            "duplicate": not stored["created"] or stored["url"] in seen_urls,
+            "image": ImageService.describe(asset)
+        })
+        seen_urls.add(stored["url"])
+    
+    db.add_all(items)
+    db.flush()
+    item_ids = iter([item.id for item in items])
+    for result in results:
+        if result["success"]:
+            result["id"] = next(item_ids)
+    db.commit()
+    
+    return APIResponse(
+        success=bool(items),
+        message=f"Uploaded {len(items)} of {len(files)} images",
+        data={"uploaded": len(items), "failed": len(files) - len(items), "results": results}
+    )
+
+
 @router.delete("/{item_id}", response_model=APIResponse)
 async def delete_gallery_item(
     item_id: int,
@@ -131,13 +191,12 @@ async def delete_gallery_item(
     if not item:
         raise HTTPException(status_code=404, detail="Gallery item not found")
     
-    # Delete file if exists
-    if item.image_url.startswith('/uploads/'):
-        file_path = os.path.join(settings.upload_dir, item.image_url[9:])  # Remove '/uploads/'
-        if os.path.exists(file_path):
-            os.remove(file_path)
-    
     db.delete(item)
+    db.flush()
+    
+    # Delete file and its variants if it was uploaded here and is no longer used
+    if item.image_url.startswith('/uploads/'):
+        await ImageService.delete_image(db, item.image_url)
     db.commit()
     
     return APIResponse(
@@ -150,4 +209,33 @@ async def delete_gallery_item(
 async def get_gallery_categories(db: Session = Depends(get_db)):
     """Get list of available gallery categories"""
     categories = db.query(GalleryItem.category).distinct().all()
-    return [category[0] for category in categories if category[0]]
\ No newline at end of file
+    return [category[0] for category in categories if category[0]]
+
+
+@router.get("/categories/{category}/download")
+async def download_gallery_category(
+    category: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Download every uploaded photo in a category as one ZIP, streamed from storage (admin only)"""
+    items = db.query(GalleryItem.title, GalleryItem.image_url).filter(
+        GalleryItem.category == category
+    ).order_by(GalleryItem.created_at).all()
+    if not items:
+        raise HTTPException(status_code=404, detail="No gallery items in this category")
+    
+    used_names = set()
+    entries = []
+    for title, image_url in items:
+        key = upload_storage.key_for_url(image_url)
+        if key:
+            name = ArchiveService.entry_name(title, os.path.splitext(key)[1], used_names)
+            entries.append((name, key))
+    
+    filename = ArchiveService.entry_name(f"gallery_{category}", ".zip", set())
+    return StreamingResponse(
+        ArchiveService.stream_zip(upload_storage, entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
\ No newline at end of file
@@ -0,0 +1,106 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from PIL import Image, UnidentifiedImageError
+from typing import Optional
+import asyncio
+import hashlib
+
+from config import settings
+from services.image_cache import DiskLRUCache
+from services.image_processing import resize_to_fit, avif_supported
+from services.image_service import ImageService
+from services.storage import upload_storage
+
+router = APIRouter()
+
+# Upload folders that may be resized on the fly (documents under files/ are excluded)
+RESIZABLE_ROOTS = ("images", "gallery", "avatars")
+
+OUTPUT_FORMATS = {
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "webp": "image/webp",
+    "avif": "image/avif",
+}
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+image_cache = DiskLRUCache(settings.image_cache_dir, settings.image_cache_max_bytes)
+
+
+def stat_source(path: str):
+    """Size and mtime of an upload that may be resized, or 404"""
+    stat = None
+    if path.startswith(tuple(f"{root}/" for root in RESIZABLE_ROOTS)):
+        try:
+            stat = upload_storage.stat(path)
+        except ValueError:
+            pass
+    if not stat:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return stat
+
+
+def resize_from_storage(path: str, dest_path: str, width: int, height: int, image_format: Optional[str]):
+    """Runs in a worker thread: get a local copy of the source, resize it in the process pool"""
+    with upload_storage.local_copy(path) as source:
+        future = ImageService.executor().submit(resize_to_fit, source, dest_path, width, height, image_format)
+        return future.result()
+
+
+@router.get("/{width:int}x{height:int}/{path:path}")
+async def resize_image(
+    width: int,
+    height: int,
+    path: str,
+    request: Request,
+    format: Optional[str] = None
+):
+    """
+    Serve an uploaded image resized to fit within ``width`` x ``height``.
+
+    Either dimension may be 0 to leave it unconstrained; images are never
+    upscaled. The first request for a size does the resize, later ones are
+    served from the on-disk cache. Cached files are keyed by the source's
+    modification time, so a replaced source is resized again and cached
+    responses never go stale.
+    """
+    limit = settings.image_resize_max_dimension
+    if not (width or height) or width > limit or height > limit:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Width and height must be between 0 and {limit}, and not both 0"
+        )
+
+    if format is not None:
+        format = format.lower()
+        if format not in OUTPUT_FORMATS or (format == "avif" and not avif_supported()):
+            raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+
+    size, modified = await asyncio.to_thread(stat_source, path)
+    key = hashlib.sha256(
+        f"{path}|{modified}|{size}|{width}x{height}|{format or ''}".encode()
+    ).hexdigest()
+    etag = f'"{key[:32]}"'
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+    async def build(temp_path: str):
+        await asyncio.to_thread(resize_from_storage, path, temp_path, width, height, format)
+
+    try:
+        cached_path = await image_cache.get_or_create(key, build)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise HTTPException(status_code=400, detail="File is not a valid image")
+
+    if format is None:
+        # Only the header is read here, not the pixel data
+        with Image.open(cached_path) as cached:
+            format = cached.format.lower()
+
+    return FileResponse(
+        cached_path,
+        media_type=OUTPUT_FORMATS.get(format, "application/octet-stream"),
+        headers={"Cache-Control": CACHE_CONTROL, "ETag": etag}
+    )
@@ -5,6 +5,7 @@ from typing import List, Optional
 from database import get_db, Partner
 from schemas import PartnerCreate, Partner as PartnerSchema, APIResponse, PaginatedResponse
 from auth import require_admin, get_current_active_user
+from services.image_service import ImageService
 
 router = APIRouter()
 
@@ -34,7 +35,9 @@ async def get_partners(
     partners = query.offset((page - 1) * size).limit(size).all()
     
     return PaginatedResponse(
-        items=partners,
+        items=ImageService.attach(
+            db, [PartnerSchema.from_orm(partner).dict() for partner in partners], url_field="logo_url", target_field="logo"
+        ),
         total=total,
         page=page,
         size=size,
@@ -13,6 +13,8 @@ from schemas import (
     PaginatedResponse
 )
 from auth import get_current_active_user, require_admin
+from services.image_service import ImageService
+from services.loading_policies import apply_policy
 
 router = APIRouter()
 
@@ -50,10 +52,10 @@ async def get_projects(
         )
     
     total = query.count()
-    projects = query.order_by(Project.created_at.desc()).offset((page - 1) * size).limit(size).all()
+    projects = apply_policy(query, "projects.list").order_by(Project.created_at.desc()).offset((page - 1) * size).limit(size).all()
     
     return PaginatedResponse(
-        items=[ProjectSchema.from_orm(project).dict() for project in projects],
+        items=ImageService.attach(db, [ProjectSchema.from_orm(project).dict() for project in projects]),
         total=total,
         page=page,
         size=size,
@@ -13,6 +13,9 @@ from schemas import (
     PaginatedResponse
 )
 from auth import get_current_active_user, require_admin
+from services.query_filters import filter_products
+from services.image_service import ImageService
+from services.loading_policies import apply_policy
 
 router = APIRouter()
 
@@ -28,28 +31,19 @@ async def get_products(
     db: Session = Depends(get_db)
 ):
     """Get paginated list of products"""
-    query = db.query(Product)
-    
-    if category:
-        query = query.filter(Product.category == category)
-        
-    if featured is not None:
-        query = query.filter(Product.featured == featured)
-        
-    if available is not None:
-        query = query.filter(Product.is_available == available)
-    
-    if search:
-        query = query.filter(
-            (Product.name.contains(search)) |
-            (Product.description.contains(search))
-        )
+    query = filter_products(
+        db.query(Product),
+        category=category,
+        featured=featured,
+        available=available,
+        search=search
+    )
     
     total = query.count()
-    products = query.order_by(Product.created_at.desc()).offset((page - 1) * size).limit(size).all()
+    products = apply_policy(query, "store.products").order_by(Product.created_at.desc()).offset((page - 1) * size).limit(size).all()
     
     return PaginatedResponse(
-        items=[ProductSchema.from_orm(product).dict() for product in products],
+        items=ImageService.attach(db, [ProductSchema.from_orm(product).dict() for product in products]),
         total=total,
         page=page,
         size=size,
@@ -140,7 +134,7 @@ async def get_my_orders(
     query = db.query(Order).filter(Order.user_id == current_user.id)
     
     total = query.count()
-    orders = query.order_by(Order.created_at.desc()).offset((page - 1) * size).limit(size).all()
+    orders = apply_policy(query, "store.my_orders").order_by(Order.created_at.desc()).offset((page - 1) * size).limit(size).all()
     
     return PaginatedResponse(
         items=[{
@@ -5,6 +5,7 @@ from typing import List, Optional
 from database import get_db, TeamMember
 from schemas import TeamMemberCreate, TeamMember as TeamMemberSchema, APIResponse, PaginatedResponse
 from auth import require_admin, get_current_active_user
+from services.image_service import ImageService
 
 router = APIRouter()
 
@@ -28,7 +29,7 @@ async def get_team_members(
     members = query.offset((page - 1) * size).limit(size).all()
     
     return PaginatedResponse(
-        items=members,
+        items=ImageService.attach(db, [TeamMemberSchema.from_orm(member).dict() for member in members]),
         total=total,
         page=page,
         size=size,
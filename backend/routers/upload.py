@@ -1,14 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Request, Response
 from sqlalchemy.orm import Session
+import aiofiles
+import asyncio
+import hashlib
 import os
-import uuid
-from PIL import Image
+import re
 from typing import Optional
 
 from database import get_db, User
-from schemas import APIResponse
-from auth import get_current_active_user
+from schemas import APIResponse, UploadSessionCreate, DirectUploadCreate
+from auth import get_current_active_user, get_current_user_record
 from config import settings
+from services.upload_service import ResumableUploadService, FileTooLarge
+from services.image_service import ImageService
+from services.content_store import ContentStore
+from services.storage import upload_storage, LocalStorage
 
 router = APIRouter()
 
@@ -17,12 +23,9 @@ ALLOWED_FILE_EXTENSIONS = {".pdf", ".doc", ".docx", ".txt", ".zip"}
 
 
 def validate_file_size(file: UploadFile):
-    """Validate file size"""
-    if hasattr(file, 'size') and file.size > settings.max_file_size:
-        raise HTTPException(
-            status_code=413,
-            detail=f"File too large. Maximum size is {settings.max_file_size} bytes"
-        )
+    """Reject files whose declared size is already over the limit"""
+    if getattr(file, 'size', None) and file.size > settings.max_file_size:
+        raise FileTooLarge()
 
 
 def validate_file_type(filename: str, allowed_extensions: set):
@@ -36,15 +39,11 @@ def validate_file_type(filename: str, allowed_extensions: set):
     return file_extension
 
 
-def resize_image(image_path: str, max_size: tuple = (1200, 1200)):
-    """Resize image if it's too large"""
-    try:
-        with Image.open(image_path) as img:
-            if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
-                img.thumbnail(max_size, Image.Resampling.LANCZOS)
-                img.save(image_path, optimize=True, quality=85)
-    except Exception as e:
-        print(f"Error resizing image {image_path}: {e}")
+def validate_category(category: str) -> str:
+    """Only allow simple directory names for upload categories"""
+    if not re.fullmatch(r"[A-Za-z0-9_-]+", category or ""):
+        raise HTTPException(status_code=400, detail="Invalid category")
+    return category
 
 
 @router.post("/image", response_model=APIResponse)
@@ -52,47 +51,38 @@ async def upload_image(
     file: UploadFile = File(...),
     category: str = Form("general"),
     resize: bool = Form(True),
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Upload an image file"""
+    """Upload an image file (identical uploads are stored once)"""
     validate_file_size(file)
     file_extension = validate_file_type(file.filename, ALLOWED_IMAGE_EXTENSIONS)
     
-    # Generate unique filename
-    filename = f"{uuid.uuid4()}{file_extension}"
-    
-    # Create category directory
-    upload_path = os.path.join(settings.upload_dir, "images", category)
-    os.makedirs(upload_path, exist_ok=True)
-    
-    file_path = os.path.join(upload_path, filename)
-    
-    # Save file
     try:
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        # Resize image if requested
-        if resize:
-            resize_image(file_path)
-        
-        image_url = f"/uploads/images/{category}/{filename}"
+        # Fix orientation, strip metadata, cap size if requested and build variants
+        max_dimension = settings.image_max_dimension
+        stored, asset = await ImageService.store_image(
+            db, file, "images", file_extension,
+            max_size=(max_dimension, max_dimension) if resize else None,
+            suffix="" if resize else "_full"
+        )
+        db.commit()
         
         return APIResponse(
             success=True,
             message="Image uploaded successfully",
             data={
-                "filename": filename,
-                "url": image_url,
-                "category": category
+                "filename": os.path.basename(stored["key"]),
+                "url": stored["url"],
+                "category": category,
+                "duplicate": not stored["created"],
+                "image": ImageService.describe(asset)
             }
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
-        # Clean up file if something went wrong
-        if os.path.exists(file_path):
-            os.remove(file_path)
         raise HTTPException(status_code=500, detail=f"Failed to upload image: {str(e)}")
 
 
@@ -100,52 +90,300 @@ async def upload_image(
 async def upload_avatar(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_user_record)
 ):
     """Upload user avatar"""
     validate_file_size(file)
     file_extension = validate_file_type(file.filename, ALLOWED_IMAGE_EXTENSIONS)
     
-    # Generate unique filename with user ID
-    filename = f"avatar_{current_user.id}_{uuid.uuid4()}{file_extension}"
-    
-    # Create avatars directory
-    upload_path = os.path.join(settings.upload_dir, "avatars")
-    os.makedirs(upload_path, exist_ok=True)
-    
-    file_path = os.path.join(upload_path, filename)
-    
     try:
-        # Remove old avatar if exists
-        if current_user.avatar_url and current_user.avatar_url.startswith('/uploads/'):
-            old_file_path = os.path.join(settings.upload_dir, current_user.avatar_url[9:])
-            if os.path.exists(old_file_path):
-                os.remove(old_file_path)
-        
-        # Save new avatar
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Store the new avatar before touching the old one, so a rejected upload keeps it.
+        # Resized to avatar size (square) with variants.
+        stored, asset = await ImageService.store_image(db, file, "avatars", file_extension, max_size=(400, 400))
         
-        # Resize to avatar size (square)
-        resize_image(file_path, max_size=(400, 400))
-        
-        avatar_url = f"/uploads/avatars/{filename}"
-        
-        # Update user avatar URL
-        current_user.avatar_url = avatar_url
+        # Update user avatar URL, then remove the old avatar if nothing else uses it
+        old_avatar_url = current_user.avatar_url
+        current_user.avatar_url = stored["url"]
+        db.flush()
+        if old_avatar_url and old_avatar_url != stored["url"] and old_avatar_url.startswith('/uploads/'):
+            await ImageService.delete_image(db, old_avatar_url)
         db.commit()
         
         return APIResponse(
             success=True,
             message="Avatar uploaded successfully",
             data={
-                "avatar_url": avatar_url
+                "avatar_url": stored["url"],
+                "image": ImageService.describe(asset)
             }
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
-        # Clean up file if something went wrong
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        raise HTTPException(status_code=500, detail=f"Failed to upload avatar: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to upload avatar: {str(e)}")
+
+
+@router.post("/file", response_model=APIResponse)
+async def upload_file(
+    file: UploadFile = File(...),
+    category: str = Form("documents"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Upload a general file (identical uploads are stored once)"""
+    validate_file_size(file)
+    file_extension = validate_file_type(file.filename, ALLOWED_FILE_EXTENSIONS)
+    validate_category(category)
+    
+    stored = await ContentStore.save(db, file, "files", file_extension)
+    db.commit()
+    
+    return APIResponse(
+        success=True,
+        message="File uploaded successfully",
+        data={
+            "filename": os.path.basename(stored["key"]),
+            "url": stored["url"],
+            "category": category,
+            "original_name": file.filename,
+            "duplicate": not stored["created"]
+        }
+    )
+
+
+def validate_direct_upload(upload_data: DirectUploadCreate) -> str:
+    """Check a direct upload request and return the storage key for its content"""
+    file_extension = validate_file_type(upload_data.filename, ALLOWED_FILE_EXTENSIONS)
+    validate_category(upload_data.category)
+    if upload_data.size > settings.max_file_size:
+        raise FileTooLarge()
+    return ContentStore.object_name("files", upload_data.sha256, file_extension)
+
+
+@router.post("/direct", response_model=APIResponse)
+async def create_direct_upload(
+    upload_data: DirectUploadCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get a presigned target to upload a document straight to storage.
+
+    Send the file with the returned method, URL and headers, then call
+    ``/direct/complete``. Content that was uploaded before needs no upload
+    at all. Images go through ``/image``, since they are processed here.
+    """
+    key = validate_direct_upload(upload_data)
+    url = upload_storage.url_for(key)
+    
+    if await ContentStore.claim(db, key, upload_data.sha256, upload_data.size):
+        db.commit()
+        return APIResponse(
+            success=True,
+            message="File already uploaded",
+            data={"url": url, "duplicate": True}
+        )
+    
+    return APIResponse(
+        success=True,
+        message="Upload target created",
+        data={
+            "url": url,
+            "duplicate": False,
+            "upload": upload_storage.upload_target(key, upload_data.size, upload_data.sha256)
+        }
+    )
+
+
+@router.put("/direct/{key:path}", response_model=APIResponse)
+async def receive_direct_upload(
+    key: str,
+    request: Request,
+    size: int,
+    sha256: str,
+    expires: int,
+    signature: str
+):
+    """
+    Receive a signed direct upload (local storage only; S3-compatible
+    storage receives these itself). The signature stands in for auth.
+    """
+    if not isinstance(upload_storage, LocalStorage) or not LocalStorage.verify_upload_signature(
+        key, size, sha256, expires, signature
+    ):
+        raise HTTPException(status_code=403, detail="Invalid or expired upload signature")
+    
+    hasher = hashlib.sha256()
+    received = 0
+    staged = ContentStore.staging_path(os.path.splitext(key)[1])
+    os.makedirs(os.path.dirname(staged), exist_ok=True)
+    try:
+        async with aiofiles.open(staged, "wb") as target:
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > size:
+                    raise FileTooLarge(size)
+                hasher.update(chunk)
+                await target.write(chunk)
+        if received != size or hasher.hexdigest() != sha256:
+            raise HTTPException(status_code=400, detail="Uploaded content does not match the declared size and checksum")
+    except BaseException:
+        if os.path.exists(staged):
+            os.remove(staged)
+        raise
+    
+    path = upload_storage.local_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(staged, path)
+    return APIResponse(success=True, message="File received")
+
+
+@router.post("/direct/complete", response_model=APIResponse)
+async def complete_direct_upload(
+    upload_data: DirectUploadCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Record a document uploaded with ``/direct`` once storage has it"""
+    key = validate_direct_upload(upload_data)
+    stat = await asyncio.to_thread(upload_storage.stat, key)
+    if not stat or stat[0] != upload_data.size:
+        raise HTTPException(status_code=409, detail="File has not been uploaded yet")
+    
+    url = upload_storage.url_for(key)
+    ContentStore.record(db, url, upload_data.sha256, upload_data.size)
+    db.commit()
+    
+    return APIResponse(
+        success=True,
+        message="File uploaded successfully",
+        data={
+            "filename": os.path.basename(key),
+            "url": url,
+            "category": upload_data.category,
+            "original_name": upload_data.filename
+        }
+    )
+
+
+def get_upload_session_or_404(session_id: str, current_user: User) -> dict:
+    session = ResumableUploadService.get_session(session_id)
+    if not session or session["user_id"] != current_user.id:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+
+@router.post("/sessions", response_model=APIResponse)
+async def create_upload_session(
+    session_data: UploadSessionCreate,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Start a resumable upload.
+
+    Send the file with PATCH requests carrying an ``Upload-Offset`` header,
+    then call ``/complete``. After a dropped connection, ask for the current
+    offset with GET and continue from there.
+    """
+    validate_file_type(session_data.filename, ALLOWED_FILE_EXTENSIONS | ALLOWED_IMAGE_EXTENSIONS)
+    validate_category(session_data.category)
+    if session_data.size > settings.max_file_size:
+        raise FileTooLarge()
+    
+    session = ResumableUploadService.create_session(
+        current_user.id, session_data.filename, session_data.size, session_data.category
+    )
+    return APIResponse(
+        success=True,
+        message="Upload session created",
+        data=session
+    )
+
+
+@router.get("/sessions/{session_id}", response_model=APIResponse)
+async def get_upload_session(
+    session_id: str,
+    response: Response,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the current offset of a resumable upload"""
+    session = get_upload_session_or_404(session_id, current_user)
+    response.headers["Upload-Offset"] = str(session["offset"])
+    return APIResponse(
+        success=True,
+        message="Upload session retrieved",
+        data=session
+    )
+
+
+@router.patch("/sessions/{session_id}", response_model=APIResponse)
+async def upload_session_chunk(
+    session_id: str,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Append the request body to a resumable upload at ``Upload-Offset``"""
+    session = get_upload_session_or_404(session_id, current_user)
+    offset = await ResumableUploadService.append_chunk(session, upload_offset, request.stream())
+    response.headers["Upload-Offset"] = str(offset)
+    return APIResponse(
+        success=True,
+        message="Chunk received",
+        data={"id": session_id, "offset": offset, "size": session["size"]}
+    )
+
+
+@router.post("/sessions/{session_id}/complete", response_model=APIResponse)
+async def complete_upload_session(
+    session_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Finalize a fully received resumable upload"""
+    session = get_upload_session_or_404(session_id, current_user)
+    file_extension = validate_file_type(session["filename"], ALLOWED_FILE_EXTENSIONS | ALLOWED_IMAGE_EXTENSIONS)
+    
+    staged_path = ContentStore.staging_path(file_extension)
+    await ResumableUploadService.finalize(session, staged_path)
+    
+    if file_extension in ALLOWED_IMAGE_EXTENSIONS:
+        max_dimension = settings.image_max_dimension
+        stored, asset = await ImageService.store_image(
+            db, staged_path, "images", file_extension, max_size=(max_dimension, max_dimension)
+        )
+    else:
+        stored, asset = await ContentStore.save(db, staged_path, "files", file_extension), None
+    db.commit()
+    
+    data = {
+        "filename": os.path.basename(stored["key"]),
+        "url": stored["url"],
+        "category": session["category"],
+        "original_name": session["filename"],
+        "duplicate": not stored["created"]
+    }
+    if asset:
+        data["image"] = ImageService.describe(asset)
+    
+    return APIResponse(
+        success=True,
+        message="File uploaded successfully",
+        data=data
+    )
+
+
+@router.delete("/sessions/{session_id}", response_model=APIResponse)
+async def cancel_upload_session(
+    session_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Abort a resumable upload and discard its partial data"""
+    get_upload_session_or_404(session_id, current_user)
+    ResumableUploadService.delete_session(session_id)
+    return APIResponse(
+        success=True,
+        message="Upload session cancelled"
+    )
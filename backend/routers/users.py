@@ -4,13 +4,17 @@ from typing import List, Optional
 
 from database import get_db, User
 from schemas import User as UserSchema, UserUpdate, APIResponse, PaginatedResponse
-from auth import get_current_user, get_current_active_user, require_admin
+from auth import get_current_user, get_current_active_user, get_current_user_record, require_admin
+from services.refresh_tokens import refresh_tokens
+from services.user_cache import user_cache
+from services.query_filters import filter_users
+from services.loading_policies import apply_policy
 
 router = APIRouter()
 
 
 @router.get("/me", response_model=UserSchema)
-async def get_current_user_profile(current_user: User = Depends(get_current_active_user)):
+async def get_current_user_profile(current_user: User = Depends(get_current_user_record)):
     """Get current user's profile"""
     return current_user
 
@@ -18,7 +22,7 @@ async def get_current_user_profile(current_user: User = Depends(get_current_acti
 @router.put("/me", response_model=UserSchema)
 async def update_current_user_profile(
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_active_user),
+    current_user: User = Depends(get_current_user_record),
     db: Session = Depends(get_db)
 ):
     """Update current user's profile"""
@@ -40,20 +44,10 @@ async def get_users(
     current_user: User = Depends(require_admin)
 ):
     """Get paginated list of users (admin only)"""
-    query = db.query(User)
-    
-    if search:
-        query = query.filter(
-            (User.full_name.contains(search)) |
-            (User.username.contains(search)) |
-            (User.email.contains(search))
-        )
-    
-    if role:
-        query = query.filter(User.role == role)
+    query = filter_users(db.query(User), search=search, role=role)
     
     total = query.count()
-    users = query.offset((page - 1) * size).limit(size).all()
+    users = apply_policy(query, "users.list").offset((page - 1) * size).limit(size).all()
     
     return PaginatedResponse(
         items=[UserSchema.from_orm(user).dict() for user in users],
@@ -112,8 +106,10 @@ async def delete_user(
     if user.id == current_user.id:
         raise HTTPException(status_code=400, detail="Cannot delete your own account")
     
+    refresh_tokens.revoke_user(db, user.id)
     db.delete(user)
     db.commit()
+    user_cache.invalidate(user.username)
     
     return APIResponse(
         success=True,
@@ -139,6 +135,7 @@ async def update_user_role(
     
     user.role = role
     db.commit()
+    user_cache.invalidate(user.username)
     
     return APIResponse(
         success=True,
@@ -161,10 +158,32 @@ async def update_user_status(
     
     user.is_active = is_active
     db.commit()
+    user_cache.invalidate(user.username)
+    if not is_active:
+        refresh_tokens.revoke_user(db, user.id)
     
     status_text = "activated" if is_active else "deactivated"
     return APIResponse(
         success=True,
         message=f"User {status_text} successfully",
         data={"user_id": user_id, "is_active": is_active}
-    )
\ No newline at end of file
+    )
+
+
+@router.delete("/{user_id}/sessions", response_model=APIResponse)
+async def revoke_user_sessions(
+    user_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """Log a user out everywhere (admin only)"""
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    revoked = refresh_tokens.revoke_user(db, user.id)
+    return APIResponse(
+        success=True,
+        message=f"Revoked {revoked} sessions",
+        data={"user_id": user_id, "revoked_sessions": revoked}
+    )
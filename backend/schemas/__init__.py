@@ -74,6 +74,7 @@ class Community(CommunityBase):
     member_count: int
     is_active: bool
     created_at: datetime
+    image: Optional[dict] = None  # Dimensions, placeholder and srcset of image_url
     
     class Config:
         from_attributes = True
@@ -120,6 +121,7 @@ class Project(ProjectBase):
     updated_at: Optional[datetime] = None
     creator_id: int
     community_id: Optional[int] = None
+    image: Optional[dict] = None  # Dimensions, placeholder and srcset of image_url
     
     @field_validator('technologies', mode='before')
     @classmethod
@@ -175,6 +177,7 @@ class Event(EventBase):
     featured: bool
     created_at: datetime
     community_id: Optional[int] = None
+    image: Optional[dict] = None  # Dimensions, placeholder and srcset of image_url
     
     class Config:
         from_attributes = True
@@ -244,6 +247,7 @@ class BlogPost(BlogPostBase):
     updated_at: Optional[datetime] = None
     published_at: Optional[datetime] = None
     author_id: int
+    image: Optional[dict] = None  # Dimensions, placeholder and srcset of image_url
     
     class Config:
         from_attributes = True
@@ -278,6 +282,7 @@ class Product(ProductBase):
     is_available: bool
     featured: bool
     created_at: datetime
+    image: Optional[dict] = None  # Dimensions, placeholder and srcset of image_url
     
     class Config:
         from_attributes = True
@@ -299,6 +304,7 @@ class GalleryItem(GalleryItemBase):
     id: int
     featured: bool
     created_at: datetime
+    image: Optional[dict] = None  # Dimensions, placeholder and srcset of image_url
     
     class Config:
         from_attributes = True
@@ -362,6 +368,7 @@ class Partner(PartnerBase):
     is_active: bool
     featured: bool
     created_at: datetime
+    logo: Optional[dict] = None  # Dimensions, placeholder and srcset of logo_url
     
     class Config:
         from_attributes = True
@@ -401,6 +408,7 @@ class TeamMember(TeamMemberBase):
     is_active: bool
     order_priority: int
     created_at: datetime
+    image: Optional[dict] = None  # Dimensions, placeholder and srcset of image_url
     
     class Config:
         from_attributes = True
@@ -413,6 +421,10 @@ class Token(BaseModel):
     token_type: str = "bearer"
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
 class TokenData(BaseModel):
     username: Optional[str] = None
 
@@ -422,6 +434,42 @@ class LoginRequest(BaseModel):
     password: str
 
 
+# Upload schemas
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int = Field(..., gt=0)
+    category: str = "documents"
+
+
+class DirectUploadCreate(BaseModel):
+    filename: str
+    size: int = Field(..., gt=0)
+    sha256: str = Field(..., pattern=r"^[0-9a-f]{64}$")  # Hex digest of the file content
+    category: str = "documents"
+
+
+# Export schemas
+class ExportFilters(BaseModel):
+    """Filters of an export job, typed like the query parameters of the streaming export"""
+    event_id: Optional[int] = None
+    status: Optional[str] = None
+    search: Optional[str] = None
+    role: Optional[str] = None
+    category: Optional[str] = None
+    featured: Optional[bool] = None
+    available: Optional[bool] = None
+    user_id: Optional[int] = None
+    
+    class Config:
+        extra = "forbid"
+
+
+class ExportJobCreate(BaseModel):
+    dataset: str
+    format: str = "xlsx"
+    filters: ExportFilters = ExportFilters()
+
+
 # API Response schemas
 class APIResponse(BaseModel):
     success: bool
@@ -0,0 +1,294 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Union
+
+from fastapi import UploadFile
+from sqlalchemy import event, insert, inspect, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import StoredObject, IMAGE_URL_FIELDS
+from services.storage import upload_storage
+from services.upload_service import UploadService
+
+
+class ContentStore:
+    """
+    Content-addressed storage for uploads.
+
+    Uploads are hashed (SHA-256) while they stream to a local staging file
+    and are then stored in ``upload_storage`` under the key
+    ``<kind>/<aa>/<digest><suffix><ext>``.
+    Identical uploads map to the same file, so a duplicate costs no extra
+    disk and skips processing. ``suffix`` separates outputs of the same bytes
+    that are processed differently (e.g. resized vs. full size).
+
+    Each stored file has a StoredObject row whose ``ref_count`` is the number
+    of rows in ``IMAGE_URL_FIELDS`` pointing at it. The count is maintained by
+    a session flush listener, so routers only have to set or clear URLs.
+
+    Reusing an existing object is noted in ``_claims`` (key -> time), so the
+    orphan sweeper leaves it alone until the new reference is saved.
+    """
+
+    _locks: Dict[str, list] = {}
+    _claims: Dict[str, float] = {}
+
+    @staticmethod
+    def staging_path(extension: str) -> str:
+        return upload_storage.staging_path(extension)
+
+    @staticmethod
+    def object_name(kind: str, digest: str, extension: str, suffix: str = "") -> str:
+        return f"{kind}/{digest[:2]}/{digest}{suffix}{extension}"
+
+    @staticmethod
+    def file_digest(path: str) -> str:
+        hasher = hashlib.sha256()
+        with open(path, "rb") as source:
+            for chunk in iter(lambda: source.read(UploadService.CHUNK_SIZE), b""):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    @staticmethod
+    @asynccontextmanager
+    async def locked(name: str):
+        """Serialize work on one object; the entry is dropped once nobody is waiting"""
+        entry = ContentStore._locks.setdefault(name, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del ContentStore._locks[name]
+
+    @staticmethod
+    async def save(
+        db: Session,
+        source: Union[UploadFile, str],
+        kind: str,
+        extension: str,
+        suffix: str = "",
+        max_size: Optional[int] = None,
+        on_create: Optional[Callable[[str, str], Awaitable[None]]] = None,
+        is_processed: Optional[Callable[[str], bool]] = None,
+        digest: Optional[str] = None,
+        validate: Optional[Callable[[str], Awaitable[object]]] = None
+    ) -> dict:
+        """
+        Store an upload (streamed from an UploadFile, or moved from a local path).
+
+        ``on_create(path, url)`` runs on a local copy while no identical
+        upload can observe the half-processed file, before it is published to
+        storage. It runs when the content is new, or when ``is_processed(url)``
+        says an existing object was never processed; if it fails, a new file
+        is discarded. ``digest`` skips re-hashing a local path that was
+        hashed while it was staged. ``validate(path)`` checks the staged file
+        before it is moved to its (possibly public) storage path; if it
+        raises, the staged file is discarded. Returns ``url``, ``key``,
+        ``digest``, ``size`` and whether the object was ``created``.
+        """
+        extension = extension.lower()
+        if isinstance(source, str):
+            staged = source
+            digest = digest or await asyncio.to_thread(ContentStore.file_digest, staged)
+            size = os.path.getsize(staged)
+        else:
+            staged = ContentStore.staging_path(extension)
+            hasher = hashlib.sha256()
+            size = await UploadService.save_upload(source, staged, max_size, hasher=hasher)
+            digest = hasher.hexdigest()
+
+        if validate:
+            try:
+                await validate(staged)
+            except BaseException:
+                if os.path.exists(staged):
+                    os.remove(staged)
+                raise
+
+        key = ContentStore.object_name(kind, digest, extension, suffix)
+        url = upload_storage.url_for(key)
+
+        async with ContentStore.locked(key):
+            created = not await asyncio.to_thread(upload_storage.exists, key)
+            if created:
+                path = upload_storage.local_path(key)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(staged, path)
+                try:
+                    if on_create:
+                        await on_create(path, url)
+                    await asyncio.to_thread(upload_storage.publish, key)
+                except BaseException:
+                    if os.path.exists(path):
+                        os.remove(path)
+                    raise
+            else:
+                os.remove(staged)
+                ContentStore._claims[key] = time.time()
+                if on_create and is_processed and not is_processed(url):
+                    path = await asyncio.to_thread(upload_storage.fetch, key)
+                    await on_create(path, url)
+                    await asyncio.to_thread(upload_storage.publish, key)
+
+            ContentStore.record(db, url, digest, size)
+
+        return {"url": url, "key": key, "digest": digest, "size": size, "created": created}
+
+    @staticmethod
+    async def claim(db: Session, key: str, digest: str, size: int) -> bool:
+        """Record an object that is already stored; False if storage doesn't have it"""
+        async with ContentStore.locked(key):
+            if not await asyncio.to_thread(upload_storage.exists, key):
+                return False
+            ContentStore._claims[key] = time.time()
+            ContentStore.record(db, upload_storage.url_for(key), digest, size)
+        return True
+
+    @staticmethod
+    def claimed_since(key: str, since: float) -> bool:
+        return ContentStore._claims.get(key, 0) >= since
+
+    @staticmethod
+    def forget_claims(before: float):
+        for key in [key for key, claimed in ContentStore._claims.items() if claimed < before]:
+            del ContentStore._claims[key]
+
+    @staticmethod
+    def record(db: Session, url: str, digest: str, size: int):
+        """Make sure a stored object has its StoredObject row (not committed)"""
+        if not db.query(StoredObject.id).filter(StoredObject.url == url).first():
+            ContentStore.add_unique(db, StoredObject, {"url": url, "digest": digest, "size": size, "ref_count": 0})
+
+    @staticmethod
+    def add_unique(db: Session, model, values: dict, update_fields: Sequence[str] = ()):
+        """
+        Insert a row keyed by its unique ``url`` when the session next flushes
+        or commits (not committed).
+
+        Another request can store the same content between our existence
+        check and our commit (a gallery batch keeps its session open while
+        its other files are processed), so the insert is idempotent: a row
+        that exists by then is kept, with ``update_fields`` overwritten. It
+        is deferred rather than executed now so the session doesn't hold the
+        database write lock while uploads are still being processed.
+        """
+        db.info.setdefault("pending_unique_rows", []).append((model, values, tuple(update_fields)))
+
+    @staticmethod
+    def reference_deltas(session: Session) -> Counter:
+        """Net change in references per upload URL among the session's pending changes"""
+        deltas = Counter()
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            for field in _REFERENCE_FIELDS.get(type(obj), ()):
+                if obj in session.new:
+                    added, removed = [getattr(obj, field)], []
+                elif obj in session.deleted:
+                    added, removed = [], [getattr(obj, field)]
+                else:
+                    history = inspect(obj).attrs[field].history
+                    added, removed = history.added, history.deleted
+                for url in added:
+                    if url and url.startswith("/uploads/"):
+                        deltas[url] += 1
+                for url in removed:
+                    if url and url.startswith("/uploads/"):
+                        deltas[url] -= 1
+        return deltas
+
+
+def _track_previous_url(target, value, oldvalue, initiator):
+    """
+    No-op; registering it with ``active_history`` makes SQLAlchemy load the
+    old URL before it is replaced, so the flush listener sees what was dropped
+    even when the attribute had been expired.
+    """
+
+
+_REFERENCE_FIELDS: Dict[type, List[str]] = {}
+for _model, _field in IMAGE_URL_FIELDS:
+    _REFERENCE_FIELDS.setdefault(_model, []).append(_field)
+    event.listen(getattr(_model, _field), "set", _track_previous_url, active_history=True)
+
+
+# Dialects with INSERT ... ON CONFLICT; others fall back to a savepoint
+_UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+
+def _insert_unique_row(connection, model, values: dict, update_fields: Sequence[str]):
+    upsert_insert = _UPSERT_INSERTS.get(connection.dialect.name)
+    if upsert_insert is not None:
+        statement = upsert_insert(model.__table__).values(**values)
+        if update_fields:
+            statement = statement.on_conflict_do_update(
+                index_elements=["url"],
+                set_={field: statement.excluded[field] for field in update_fields}
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=["url"])
+        connection.execute(statement)
+        return
+
+    try:
+        with connection.begin_nested():
+            connection.execute(insert(model.__table__).values(**values))
+    except IntegrityError:
+        if update_fields:
+            connection.execute(
+                update(model.__table__)
+                .where(model.__table__.c.url == values["url"])
+                .values({field: values[field] for field in update_fields})
+            )
+
+
+def _insert_unique_rows(session):
+    pending = session.info.pop("pending_unique_rows", None)
+    if not pending:
+        return
+    connection = session.connection()
+    for model, values, update_fields in pending:
+        _insert_unique_row(connection, model, values, update_fields)
+
+
+@event.listens_for(Session, "before_commit")
+def _insert_unique_rows_before_commit(session):
+    # A commit with no other pending changes doesn't flush
+    _insert_unique_rows(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_unique_rows(session):
+    session.info.pop("pending_unique_rows", None)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_reference_deltas(session, flush_context, instances):
+    # Rows first, so the reference counts applied after the flush find them
+    _insert_unique_rows(session)
+    with session.no_autoflush:
+        session.info["upload_reference_deltas"] = ContentStore.reference_deltas(session)
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_reference_deltas(session, flush_context):
+    deltas = session.info.pop("upload_reference_deltas", None)
+    if not deltas:
+        return
+    table = StoredObject.__table__
+    connection = session.connection()
+    for url, delta in deltas.items():
+        if delta:
+            connection.execute(
+                update(table)
+                .where(table.c.url == url)
+                .values(ref_count=table.c.ref_count + delta)
+            )
@@ -4,8 +4,8 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.image import MIMEImage
 from typing import Optional
 import asyncio
-import os
 from config import settings
+from services.qr_service import QRCodeService
 
 
 class EmailService:
@@ -186,13 +186,12 @@ class EmailService:
             mime_type = 'html' if is_html else 'plain'
             msg.attach(MIMEText(body, mime_type))
             
-            # Add QR code attachment
-            if os.path.exists(attachment_path):
-                with open(attachment_path, 'rb') as f:
-                    img_data = f.read()
-                    img = MIMEImage(img_data)
-                    img.add_header('Content-Disposition', f'attachment; filename="{attachment_name}"')
-                    msg.attach(img)
+            # Add QR code attachment (read from the configured storage backend)
+            img_data = QRCodeService.read_qr_code(attachment_path)
+            if img_data:
+                img = MIMEImage(img_data)
+                img.add_header('Content-Disposition', f'attachment; filename="{attachment_name}"')
+                msg.attach(img)
             
             # Connect to Gmail SMTP
             server = smtplib.SMTP(settings.smtp_host, settings.smtp_port)
@@ -0,0 +1,206 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from services.export_service import ExportService, ExportSpec
+
+
+class ExportJob:
+    """State of a single background export"""
+
+    TERMINAL_STATES = ("completed", "failed", "expired")
+
+    def __init__(self, spec: ExportSpec, dataset: str, export_format: str, filters: Dict[str, Any], created_by: int):
+        self.id = uuid.uuid4().hex
+        self.spec = spec
+        self.dataset = dataset
+        self.format = export_format
+        self.filters = filters
+        self.created_by = created_by
+        self.status = "queued"
+        self.rows = 0
+        self.error: Optional[str] = None
+        self.file_path: Optional[str] = None
+        self.file_size: Optional[int] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.expires_at: Optional[float] = None
+        # Bumped on every state change so subscribers can wait for updates cheaply
+        self.version = 0
+
+    @property
+    def filename(self) -> str:
+        timestamp = datetime.fromtimestamp(self.created_at).strftime("%Y%m%d_%H%M%S")
+        return f"{self.spec.name}_{timestamp}.{self.format}"
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in self.TERMINAL_STATES
+
+    def to_dict(self) -> Dict[str, Any]:
+        def iso(ts: Optional[float]) -> Optional[str]:
+            return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+        return {
+            "id": self.id,
+            "dataset": self.dataset,
+            "format": self.format,
+            "filters": {key: value for key, value in self.filters.items() if value is not None},
+            "status": self.status,
+            "rows": self.rows,
+            "error": self.error,
+            "filename": self.filename if self.status == "completed" else None,
+            "file_size": self.file_size,
+            "created_at": iso(self.created_at),
+            "started_at": iso(self.started_at),
+            "finished_at": iso(self.finished_at),
+            "expires_at": iso(self.expires_at),
+            "download_url": f"/api/exports/jobs/{self.id}/download" if self.status == "completed" else None,
+        }
+
+
+class ExportJobManager:
+    """
+    Runs exports in a dedicated, size-limited thread pool.
+
+    Exports never use the request threadpool, so a burst of large exports
+    queues up here instead of starving public endpoints. Finished files are
+    deleted once they are older than the configured TTL.
+    """
+
+    def __init__(self, export_dir: str, max_workers: int, max_pending: int, ttl_seconds: int):
+        self.export_dir = export_dir
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: Dict[str, ExportJob] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="export-job"
+            )
+        return self._executor
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status in ("queued", "running"))
+
+    def submit(self, spec: ExportSpec, dataset: str, export_format: str, filters: Dict[str, Any], created_by: int) -> ExportJob:
+        """Queue a new export job; raises RuntimeError when the queue is full"""
+        self.cleanup_expired()
+        if self.pending_count() >= self.max_pending:
+            raise RuntimeError("Too many export jobs in progress. Try again later.")
+
+        job = ExportJob(spec, dataset, export_format, filters, created_by)
+        with self._lock:
+            self._jobs[job.id] = job
+        self.executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self, created_by: Optional[int] = None) -> List[ExportJob]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        if created_by is not None:
+            jobs = [job for job in jobs if job.created_by == created_by]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def _touch(self, job: ExportJob, **changes):
+        for key, value in changes.items():
+            setattr(job, key, value)
+        job.version += 1
+
+    def _run(self, job: ExportJob):
+        os.makedirs(self.export_dir, exist_ok=True)
+        final_path = os.path.join(self.export_dir, f"{job.id}.{job.format}")
+        temp_path = f"{final_path}.part"
+        self._touch(job, status="running", started_at=time.time())
+
+        try:
+            rows = ExportService.write_file(
+                job.spec,
+                job.format,
+                temp_path,
+                job.filters,
+                progress=lambda count: self._touch(job, rows=count)
+            )
+            os.replace(temp_path, final_path)
+            finished_at = time.time()
+            self._touch(
+                job,
+                status="completed",
+                rows=rows,
+                file_path=final_path,
+                file_size=os.path.getsize(final_path),
+                finished_at=finished_at,
+                expires_at=finished_at + self.ttl_seconds
+            )
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            finished_at = time.time()
+            self._touch(
+                job,
+                status="failed",
+                error=str(e),
+                finished_at=finished_at,
+                expires_at=finished_at + self.ttl_seconds
+            )
+            print(f"Export job {job.id} failed: {e}")
+
+    def cleanup_expired(self) -> int:
+        """Delete expired export files and forget their jobs; returns how many were removed"""
+        now = time.time()
+        with self._lock:
+            expired = [job for job in self._jobs.values() if job.expires_at and job.expires_at <= now]
+            for job in expired:
+                del self._jobs[job.id]
+
+        for job in expired:
+            if job.file_path and os.path.exists(job.file_path):
+                os.remove(job.file_path)
+            self._touch(job, status="expired", file_path=None)
+        return len(expired)
+
+    async def run_cleanup_loop(self, interval_seconds: int = 60):
+        """Periodically expire old jobs; meant to run as a background task"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                self.cleanup_expired()
+            except Exception as e:
+                print(f"Export job cleanup failed: {e}")
+
+    async def wait_for_change(self, job: ExportJob, version: int, timeout: float = 15.0, poll_interval: float = 0.5):
+        """Wait until the job changes past ``version`` or ``timeout`` elapses"""
+        deadline = time.monotonic() + timeout
+        while job.version == version and time.monotonic() < deadline:
+            await asyncio.sleep(poll_interval)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+export_jobs = ExportJobManager(
+    export_dir=settings.export_dir,
+    max_workers=settings.export_job_workers,
+    max_pending=settings.export_job_max_pending,
+    ttl_seconds=settings.export_job_ttl_seconds
+)
@@ -0,0 +1,477 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, date
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from sqlalchemy import select, Integer, Float, Boolean, DateTime
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Columnar exports are only offered when pyarrow is installed
+    pa = None
+    pq = None
+
+from database import (
+    SessionLocal,
+    EventRegistration,
+    Event,
+    ContactMessage,
+    User,
+    Order,
+    Product
+)
+from services.query_filters import (
+    filter_registrations,
+    filter_contact_messages,
+    filter_users,
+    filter_orders,
+    filter_products
+)
+
+
+class _ChunkSink:
+    """Write-only file object that hands buffered bytes back to a generator"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ExportSpec:
+    """Describes how one admin table is exported: columns, joins, filters and ordering"""
+
+    def __init__(
+        self,
+        name: str,
+        select_from,
+        columns: Sequence[Tuple[str, Any]],
+        filter_func: Callable,
+        filter_params: Sequence[str],
+        order_by,
+        joins: Sequence[Tuple[Any, Any]] = (),
+        categorical: Sequence[str] = ()
+    ):
+        self.name = name
+        self.select_from = select_from
+        self.columns = list(columns)
+        self.filter_func = filter_func
+        self.filter_params = tuple(filter_params)
+        self.order_by = order_by
+        self.joins = list(joins)
+        # Low-cardinality columns stored as dictionaries in columnar exports
+        self.categorical = set(categorical)
+
+    @property
+    def headers(self) -> List[str]:
+        return [key for key, _ in self.columns]
+
+    def arrow_schema(self):
+        """Map the export columns to typed Arrow fields"""
+        fields = []
+        for key, column in self.columns:
+            column_type = column.type
+            if key in self.categorical:
+                arrow_type = pa.dictionary(pa.int32(), pa.string())
+            elif isinstance(column_type, Boolean):
+                arrow_type = pa.bool_()
+            elif isinstance(column_type, Integer):
+                arrow_type = pa.int64()
+            elif isinstance(column_type, Float):
+                arrow_type = pa.float64()
+            elif isinstance(column_type, DateTime):
+                arrow_type = pa.timestamp("us", tz="UTC" if column_type.timezone else None)
+            else:
+                arrow_type = pa.string()
+            fields.append(pa.field(key, arrow_type))
+        return pa.schema(fields)
+
+    def build_statement(self, filters: Optional[Dict[str, Any]] = None):
+        """Build a Core select for this export with the list-endpoint filters applied"""
+        stmt = select(*[column.label(key) for key, column in self.columns]).select_from(self.select_from)
+        for target, onclause in self.joins:
+            stmt = stmt.outerjoin(target, onclause)
+
+        params = {key: value for key, value in (filters or {}).items() if key in self.filter_params}
+        stmt = self.filter_func(stmt, **params)
+        return stmt.order_by(self.order_by)
+
+
+EXPORT_SPECS: Dict[str, ExportSpec] = {
+    "registrations": ExportSpec(
+        name="event_registrations",
+        select_from=EventRegistration,
+        columns=[
+            ("id", EventRegistration.id),
+            ("event_id", EventRegistration.event_id),
+            ("event_title", Event.title),
+            ("name", EventRegistration.name),
+            ("email", EventRegistration.email),
+            ("phone", EventRegistration.phone),
+            ("organization", EventRegistration.organization),
+            ("experience_level", EventRegistration.experience_level),
+            ("interests", EventRegistration.interests),
+            ("dietary_restrictions", EventRegistration.dietary_restrictions),
+            ("special_requirements", EventRegistration.special_requirements),
+            ("registration_status", EventRegistration.registration_status),
+            ("created_at", EventRegistration.created_at),
+        ],
+        joins=[(Event, EventRegistration.event_id == Event.id)],
+        filter_func=filter_registrations,
+        filter_params=("event_id", "status", "search"),
+        order_by=EventRegistration.created_at.desc(),
+        categorical=("event_title", "experience_level", "registration_status")
+    ),
+    "contact-messages": ExportSpec(
+        name="contact_messages",
+        select_from=ContactMessage,
+        columns=[
+            ("id", ContactMessage.id),
+            ("name", ContactMessage.name),
+            ("email", ContactMessage.email),
+            ("phone", ContactMessage.phone),
+            ("company", ContactMessage.company),
+            ("subject", ContactMessage.subject),
+            ("message", ContactMessage.message),
+            ("priority", ContactMessage.priority),
+            ("is_read", ContactMessage.is_read),
+            ("status", ContactMessage.status),
+            ("created_at", ContactMessage.created_at),
+        ],
+        filter_func=filter_contact_messages,
+        filter_params=("status", "search"),
+        order_by=ContactMessage.created_at.desc(),
+        categorical=("priority", "status")
+    ),
+    "users": ExportSpec(
+        name="users",
+        select_from=User,
+        columns=[
+            ("id", User.id),
+            ("username", User.username),
+            ("email", User.email),
+            ("full_name", User.full_name),
+            ("role", User.role),
+            ("is_active", User.is_active),
+            ("is_verified", User.is_verified),
+            ("created_at", User.created_at),
+        ],
+        filter_func=filter_users,
+        filter_params=("search", "role"),
+        order_by=User.id.asc(),
+        categorical=("role",)
+    ),
+    "orders": ExportSpec(
+        name="orders",
+        select_from=Order,
+        columns=[
+            ("id", Order.id),
+            ("order_number", Order.order_number),
+            ("user_id", Order.user_id),
+            ("total_amount", Order.total_amount),
+            ("status", Order.status),
+            ("shipping_address", Order.shipping_address),
+            ("contact_info", Order.contact_info),
+            ("created_at", Order.created_at),
+        ],
+        filter_func=filter_orders,
+        filter_params=("status", "user_id"),
+        order_by=Order.created_at.desc(),
+        categorical=("status",)
+    ),
+    "products": ExportSpec(
+        name="products",
+        select_from=Product,
+        columns=[
+            ("id", Product.id),
+            ("name", Product.name),
+            ("category", Product.category),
+            ("price", Product.price),
+            ("stock_quantity", Product.stock_quantity),
+            ("is_available", Product.is_available),
+            ("featured", Product.featured),
+            ("created_at", Product.created_at),
+        ],
+        filter_func=filter_products,
+        filter_params=("category", "featured", "available", "search"),
+        order_by=Product.created_at.desc(),
+        categorical=("category",)
+    ),
+}
+
+
+class ExportService:
+    CHUNK_SIZE = 1000
+    FORMATS = {
+        "csv": "text/csv",
+        "ndjson": "application/x-ndjson",
+    }
+    COLUMNAR_FORMATS = {
+        "arrow": "application/vnd.apache.arrow.stream",
+        "parquet": "application/vnd.apache.parquet",
+    }
+    STREAM_FORMATS = {**FORMATS, **COLUMNAR_FORMATS}
+    FILE_FORMATS = {
+        **STREAM_FORMATS,
+        "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    }
+
+    @staticmethod
+    def columnar_available() -> bool:
+        """Whether pyarrow is installed, which Arrow/Parquet exports need"""
+        return pa is not None
+
+    @staticmethod
+    def get_spec(dataset: str) -> Optional[ExportSpec]:
+        """Look up the export spec for a dataset name"""
+        return EXPORT_SPECS.get(dataset)
+
+    @staticmethod
+    def iter_row_chunks(
+        spec: ExportSpec,
+        filters: Optional[Dict[str, Any]] = None,
+        chunk_size: Optional[int] = None
+    ) -> Iterator[list]:
+        """
+        Yield result rows in chunks straight from a streaming cursor.
+
+        The session is owned by the generator so the export can outlive the
+        request-scoped session; memory use is bounded by ``chunk_size``.
+        """
+        chunk_size = chunk_size or ExportService.CHUNK_SIZE
+        db = SessionLocal()
+        try:
+            result = db.execute(
+                spec.build_statement(filters).execution_options(yield_per=chunk_size)
+            )
+            for partition in result.partitions():
+                yield partition
+        finally:
+            db.close()
+
+    @staticmethod
+    def _json_default(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return str(value)
+
+    @staticmethod
+    def _csv_value(value):
+        if value is None:
+            return ""
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def _xlsx_value(value):
+        # Excel cannot store timezone-aware datetimes
+        if isinstance(value, datetime) and value.tzinfo is not None:
+            return value.replace(tzinfo=None)
+        return value
+
+    @staticmethod
+    def iter_csv(
+        spec: ExportSpec,
+        filters: Optional[Dict[str, Any]] = None,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> Iterator[bytes]:
+        """Stream an export as UTF-8 CSV, one chunk of rows at a time"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        # Send the header before the query runs so the client sees bytes immediately
+        writer.writerow(spec.headers)
+        yield buffer.getvalue().encode("utf-8")
+
+        rows_written = 0
+        for rows in ExportService.iter_row_chunks(spec, filters):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([ExportService._csv_value(value) for value in row] for row in rows)
+            rows_written += len(rows)
+            if progress:
+                progress(rows_written)
+            yield buffer.getvalue().encode("utf-8")
+
+    @staticmethod
+    def iter_ndjson(
+        spec: ExportSpec,
+        filters: Optional[Dict[str, Any]] = None,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> Iterator[bytes]:
+        """Stream an export as newline-delimited JSON, one object per row"""
+        headers = spec.headers
+        rows_written = 0
+        for rows in ExportService.iter_row_chunks(spec, filters):
+            lines = [
+                json.dumps(dict(zip(headers, row)), default=ExportService._json_default)
+                for row in rows
+            ]
+            rows_written += len(rows)
+            if progress:
+                progress(rows_written)
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+    @staticmethod
+    def iter_export(
+        spec: ExportSpec,
+        export_format: str,
+        filters: Optional[Dict[str, Any]] = None,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> Iterator[bytes]:
+        """Stream an export in the requested format"""
+        if export_format in ExportService.COLUMNAR_FORMATS:
+            return ExportService.iter_columnar(spec, export_format, filters, progress)
+        if export_format == "ndjson":
+            return ExportService.iter_ndjson(spec, filters, progress)
+        return ExportService.iter_csv(spec, filters, progress)
+
+    @staticmethod
+    def record_batch(schema, rows):
+        """Build a typed Arrow record batch from a chunk of result rows"""
+        columns = list(zip(*rows)) if rows else [[] for _ in schema]
+        arrays = []
+        for field, values in zip(schema, columns):
+            if pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    @staticmethod
+    def iter_columnar(
+        spec: ExportSpec,
+        export_format: str,
+        filters: Optional[Dict[str, Any]] = None,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> Iterator[bytes]:
+        """
+        Stream an export as an Arrow IPC stream or a Parquet file.
+
+        Each cursor chunk becomes one record batch (Arrow) or row group
+        (Parquet), and the encoded bytes are yielded as soon as they are written.
+        """
+        schema = spec.arrow_schema()
+        sink = _ChunkSink()
+        if export_format == "parquet":
+            writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        else:
+            writer = pa.ipc.new_stream(sink, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+
+        rows_written = 0
+        for rows in ExportService.iter_row_chunks(spec, filters):
+            batch = ExportService.record_batch(schema, rows)
+            if export_format == "parquet":
+                writer.write_batch(batch, row_group_size=len(rows))
+            else:
+                writer.write_batch(batch)
+            rows_written += len(rows)
+            if progress:
+                progress(rows_written)
+            data = sink.drain()
+            if data:
+                yield data
+
+        writer.close()
+        yield sink.drain()
+
+    @staticmethod
+    def gzip_stream(chunks: Iterator[bytes], level: int = 6) -> Iterator[bytes]:
+        """Gzip a byte stream on the fly, flushing after every chunk"""
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush(zlib.Z_FINISH)
+
+    @staticmethod
+    def write_file(
+        spec: ExportSpec,
+        export_format: str,
+        path: str,
+        filters: Optional[Dict[str, Any]] = None,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> int:
+        """
+        Write an export to ``path`` and return the number of rows written.
+
+        ``progress`` is called with the running row count after every chunk.
+        """
+        if export_format == "xlsx":
+            return ExportService._write_xlsx(spec, path, filters, progress)
+
+        rows_written = 0
+
+        def count_rows(count: int):
+            nonlocal rows_written
+            rows_written = count
+            if progress:
+                progress(count)
+
+        with open(path, "wb") as output:
+            for chunk in ExportService.iter_export(spec, export_format, filters, count_rows):
+                output.write(chunk)
+        return rows_written
+
+    @staticmethod
+    def _write_xlsx(
+        spec: ExportSpec,
+        path: str,
+        filters: Optional[Dict[str, Any]] = None,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> int:
+        """Write an export as xlsx using openpyxl's write-only (streaming) mode"""
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(title=spec.name[:31])
+
+        header_font = Font(bold=True, color="FFFFFF")
+        header_fill = PatternFill(start_color="2E348A", end_color="2E348A", fill_type="solid")
+        header_row = []
+        for header in spec.headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = header_font
+            cell.fill = header_fill
+            header_row.append(cell)
+        ws.append(header_row)
+
+        rows_written = 0
+        for rows in ExportService.iter_row_chunks(spec, filters):
+            for row in rows:
+                ws.append([ExportService._xlsx_value(value) for value in row])
+            rows_written += len(rows)
+            if progress:
+                progress(rows_written)
+
+        wb.save(path)
+        return rows_written
@@ -0,0 +1,169 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from typing import Dict, Optional
+
+from starlette.responses import FileResponse, Response
+
+try:
+    import brotli
+except ImportError:  # gzip only without the brotli package
+    brotli = None
+
+# Text formats worth compressing; images and fonts are compressed already
+COMPRESSIBLE_EXTENSIONS = {
+    ".js", ".mjs", ".css", ".html", ".json", ".map", ".svg", ".txt", ".xml", ".webmanifest", ".ico", ".wasm"
+}
+
+# Vite names build output like index-DAvS_IAO.js; the hash changes with the content
+HASHED_NAME = re.compile(r"[-.][A-Za-z0-9_]{8,}\.[a-z0-9]+$")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+SHORT_LIVED = "public, max-age=3600"
+
+
+class BundleFile:
+    """One file of the bundle with its precomputed encodings"""
+
+    def __init__(self, path: str, content: Optional[bytes], media_type: str, etag: str, cache_control: str):
+        self.path = path
+        self.media_type = media_type
+        self.etag = etag
+        self.cache_control = cache_control
+        # Encoding ("identity", "br", "gzip") -> bytes; empty for files served from disk
+        self.encodings: Dict[str, bytes] = {"identity": content} if content is not None else {}
+
+
+class FrontendBundle:
+    """
+    The built frontend (``dist/``) indexed in memory at startup.
+
+    Every file is read once; text assets get Brotli and gzip variants
+    computed once (or taken from ``.br``/``.gz`` files the build already
+    produced) and the best one is picked per request from
+    ``Accept-Encoding``. Content-hashed assets are cached forever by
+    browsers; ``index.html`` and other unhashed files carry an ETag so a
+    revalidation costs a 304.
+    """
+
+    MIN_COMPRESS_SIZE = 1024
+    # Bigger files are served from disk instead of being held in memory
+    MAX_MEMORY_FILE_SIZE = 8 * 1024 * 1024
+
+    def __init__(self, root: str):
+        self.root = root
+        self.files: Dict[str, BundleFile] = {}
+
+    @property
+    def loaded(self) -> bool:
+        return "index.html" in self.files
+
+    @property
+    def index(self) -> Optional[BundleFile]:
+        return self.files.get("index.html")
+
+    def load(self):
+        files = {}
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if name.endswith((".br", ".gz")) and os.path.exists(path[:-len(os.path.splitext(name)[1])]):
+                    continue  # Precompressed sibling, picked up with its original
+                files[relative] = self._load_file(path, relative)
+        self.files = files
+
+        compressed = sum(1 for file in files.values() if len(file.encodings) > 1)
+        print(f"[STARTUP] Indexed {len(files)} frontend files from {self.root} ({compressed} precompressed"
+              f"{'' if brotli else ', gzip only'})")
+
+    def _load_file(self, path: str, relative: str) -> BundleFile:
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if media_type in ("application/javascript", "application/json", "image/svg+xml"):
+            # Starlette only adds the charset to text/* types itself
+            media_type += "; charset=utf-8"
+        if relative.startswith("assets/") and HASHED_NAME.search(relative):
+            cache_control = IMMUTABLE
+        elif relative == "index.html":
+            cache_control = REVALIDATE
+        else:
+            cache_control = SHORT_LIVED
+
+        if os.path.getsize(path) > self.MAX_MEMORY_FILE_SIZE:
+            stat = os.stat(path)
+            etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+            return BundleFile(path, None, media_type, etag, cache_control)
+
+        with open(path, "rb") as source:
+            content = source.read()
+        file = BundleFile(path, content, media_type, f'"{hashlib.sha256(content).hexdigest()[:32]}"', cache_control)
+
+        extension = os.path.splitext(path)[1].lower()
+        if extension in COMPRESSIBLE_EXTENSIONS and len(content) >= self.MIN_COMPRESS_SIZE:
+            encoders = {"gzip": (".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))}
+            if brotli:
+                encoders["br"] = (".br", lambda data: brotli.compress(data, quality=11))
+            for encoding, (suffix, compress) in encoders.items():
+                if os.path.exists(path + suffix):
+                    with open(path + suffix, "rb") as source:
+                        encoded = source.read()
+                else:
+                    encoded = compress(content)
+                # Tiny gains aren't worth the extra Vary-dependent variant
+                if len(encoded) < len(content) * 0.95:
+                    file.encodings[encoding] = encoded
+        return file
+
+    def get(self, path: str) -> Optional[BundleFile]:
+        return self.files.get(path)
+
+    @staticmethod
+    def accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+        accepted = {}
+        for part in accept_encoding.split(","):
+            token, _, params = part.strip().partition(";")
+            quality = 1.0
+            match = re.search(r"q=([0-9.]+)", params)
+            if match:
+                try:
+                    quality = float(match.group(1))
+                except ValueError:
+                    quality = 0.0
+            if token:
+                accepted[token.lower()] = quality
+        return accepted
+
+    @staticmethod
+    def encoding_etag(file: BundleFile, encoding: str) -> str:
+        """Each encoding is a different representation, so it gets its own validator"""
+        return file.etag if encoding == "identity" else f'{file.etag[:-1]}-{encoding}"'
+
+    def response(self, file: BundleFile, request_headers) -> Response:
+        encoding = "identity"
+        if len(file.encodings) > 1:
+            accepted = self.accepted_encodings(request_headers.get("accept-encoding", ""))
+            for candidate in ("br", "gzip"):
+                if candidate in file.encodings and accepted.get(candidate, accepted.get("*", 0)) > 0:
+                    encoding = candidate
+                    break
+
+        headers = {"ETag": self.encoding_etag(file, encoding), "Cache-Control": file.cache_control}
+        if len(file.encodings) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and (
+            if_none_match.strip() == "*"
+            or headers["ETag"] in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        ):
+            headers.pop("Content-Encoding", None)
+            return Response(status_code=304, headers=headers)
+
+        if not file.encodings:
+            return FileResponse(file.path, media_type=file.media_type, headers=headers)
+        return Response(file.encodings[encoding], media_type=file.media_type, headers=headers)
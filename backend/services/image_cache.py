@@ -0,0 +1,122 @@
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+
+class DiskLRUCache:
+    """
+    Size-capped on-disk cache with least-recently-used eviction.
+
+    The recency index lives in memory and is rebuilt from file access times
+    on first use, so the cache survives restarts. Concurrent requests for the
+    same missing key share one build instead of each doing the work.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0  # Misses that waited for another request's build
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def path_for(self, key: str) -> str:
+        # Two-level fan-out keeps directories small
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _load_index(self):
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if name.endswith(".tmp"):
+                        continue
+                    stat = os.stat(os.path.join(root, name))
+                    entries.append((stat.st_atime, name, stat.st_size))
+
+        self._index = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self.total_bytes = sum(self._index.values())
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached file path and mark it as recently used"""
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+            if key not in self._index:
+                return None
+            self._index.move_to_end(key)
+
+        path = self.path_for(key)
+        try:
+            # Persist recency for the next index rebuild
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.total_bytes -= self._index.pop(key, 0)
+            return None
+        return path
+
+    def put(self, key: str, source_path: str) -> str:
+        """Move a finished file into the cache and evict old entries if over budget"""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source_path, path)
+        size = os.path.getsize(path)
+
+        evicted = []
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+            self.total_bytes += size - self._index.pop(key, 0)
+            self._index[key] = size
+            while self.total_bytes > self.max_bytes and len(self._index) > 1:
+                old_key, old_size = self._index.popitem(last=False)
+                self.total_bytes -= old_size
+                evicted.append(old_key)
+
+        for old_key in evicted:
+            try:
+                os.remove(self.path_for(old_key))
+            except FileNotFoundError:
+                pass
+        return path
+
+    async def get_or_create(self, key: str, build: Callable[[str], Awaitable[None]]) -> str:
+        """
+        Return the cached path for ``key``, building it with ``build(temp_path)``
+        on a miss. Identical concurrent misses wait for the first build.
+        """
+        path = self.get(key)
+        if path:
+            self.hits += 1
+            return path
+
+        inflight = self._inflight.get(key)
+        if inflight:
+            self.waits += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        temp_path = f"{self.path_for(key)}.{id(future)}.tmp"
+        try:
+            os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+            await build(temp_path)
+            path = self.put(key, temp_path)
+            future.set_result(path)
+            return path
+        except BaseException as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
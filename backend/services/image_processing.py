@@ -0,0 +1,221 @@
+"""
+CPU-bound image work that runs inside the image process pool.
+
+Everything here is plain Pillow with no database or app state, so it can be
+pickled to worker processes cheaply.
+"""
+
+import base64
+import io
+import os
+import warnings
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+# Formats Pillow can write that we keep as the "original" format
+SAVE_FORMATS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "GIF": ".gif"}
+
+# File extensions each format may be uploaded with
+FORMAT_EXTENSIONS = {"JPEG": {".jpg", ".jpeg"}, "PNG": {".png"}, "WEBP": {".webp"}, "GIF": {".gif"}}
+
+# Longest side of the inline LQIP placeholder, in pixels
+PLACEHOLDER_SIZE = 16
+
+
+def limit_decoding(max_pixels: int):
+    """
+    Make Pillow refuse to decode images over ``max_pixels`` in this process
+    (the process pool initializer). Pillow only warns up to twice its limit,
+    so the warning is turned into an error.
+    """
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    warnings.simplefilter("error", Image.DecompressionBombWarning)
+
+
+def probe_header(path: str) -> dict:
+    """
+    Format and dimensions read from the image header, without decoding any
+    pixels. Only the decoders for SAVE_FORMATS are tried, so no other image
+    parser ever sees an upload.
+    """
+    with warnings.catch_warnings():
+        # The caller checks the pixel budget itself
+        warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+        with Image.open(path, formats=list(SAVE_FORMATS)) as opened:
+            return {"format": opened.format, "width": opened.width, "height": opened.height}
+
+
+def avif_supported() -> bool:
+    """AVIF needs either Pillow with libavif or the pillow-avif-plugin package"""
+    try:
+        import pillow_avif  # noqa: F401
+    except ImportError:
+        pass
+    return "AVIF" in Image.SAVE
+
+
+def _save(img: Image.Image, path: str, image_format: str):
+    """Save without metadata (no EXIF/ICC text chunks are passed through)"""
+    options = {}
+    if image_format == "JPEG":
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        options = {"quality": 85, "optimize": True, "progressive": True}
+    elif image_format == "PNG":
+        options = {"optimize": True}
+    elif image_format == "WEBP":
+        options = {"quality": 80, "method": 4}
+    elif image_format == "AVIF":
+        options = {"quality": 60}
+
+    temp_path = f"{path}.tmp"
+    img.save(temp_path, format=image_format, **options)
+    os.replace(temp_path, path)
+
+
+def dominant_color(img: Image.Image) -> str:
+    """Most common color of a coarse palette, as ``#rrggbb``"""
+    small = img.convert("RGB")
+    small.thumbnail((64, 64))
+    palette_img = small.quantize(colors=5, method=Image.Quantize.MEDIANCUT)
+    palette = palette_img.getpalette()
+    _, index = max(palette_img.getcolors())
+    red, green, blue = palette[index * 3:index * 3 + 3]
+    return f"#{red:02x}{green:02x}{blue:02x}"
+
+
+def placeholder_data_uri(img: Image.Image) -> str:
+    """Tiny blurred-up preview (LQIP) inlined as a WebP data URI"""
+    small = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buffer = io.BytesIO()
+    small.save(buffer, format="WEBP", quality=40)
+    return "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def describe_pixels(img: Image.Image, path: str, image_format: str) -> dict:
+    """Metadata stored for every indexed image"""
+    return {
+        "width": img.width,
+        "height": img.height,
+        "format": image_format.lower(),
+        "file_size": os.path.getsize(path),
+        "dominant_color": dominant_color(img),
+        "placeholder": placeholder_data_uri(img),
+    }
+
+
+def probe_metadata(path: str) -> dict:
+    """Compute metadata for an existing file without rewriting it (used for backfills)"""
+    with Image.open(path, formats=list(SAVE_FORMATS)) as opened:
+        image_format = opened.format if opened.format in SAVE_FORMATS else "JPEG"
+        img = ImageOps.exif_transpose(opened)
+        img.load()
+    return describe_pixels(img, path, image_format)
+
+
+def variant_filename(stem: str, width: Optional[int], extension: str) -> str:
+    suffix = f"_{width}w" if width else ""
+    return f"{stem}{suffix}{extension}"
+
+
+def generate_variants(
+    source_path: str,
+    widths: List[int],
+    max_size: Optional[Tuple[int, int]] = None
+) -> dict:
+    """
+    Normalize an uploaded image and write its responsive variants next to it.
+
+    The original is rotated according to its EXIF orientation, capped to
+    ``max_size`` and re-saved without metadata. Every width in ``widths``
+    smaller than the normalized image gets a copy in the original format
+    plus WebP (and AVIF when available); the full-size image also gets
+    WebP/AVIF copies. Returns the image metadata (see ``describe_pixels``)
+    and the variant list.
+    """
+    directory, filename = os.path.split(source_path)
+    stem, _ = os.path.splitext(filename)
+    make_avif = avif_supported()
+
+    with Image.open(source_path, formats=list(SAVE_FORMATS)) as opened:
+        image_format = opened.format if opened.format in SAVE_FORMATS else "JPEG"
+
+        if getattr(opened, "is_animated", False):
+            # Re-encoding animations frame by frame isn't worth it; keep the file as-is
+            opened.load()
+            return {**describe_pixels(opened, source_path, image_format), "variants": []}
+
+        if max_size:
+            # JPEGs can decode at 1/2, 1/4 or 1/8 scale, which is far cheaper
+            opened.draft(None, (max(max_size),) * 2)
+        img = ImageOps.exif_transpose(opened)
+        img.load()
+
+    if max_size and (img.width > max_size[0] or img.height > max_size[1]):
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+    _save(img, source_path, image_format)
+
+    variants = []
+    sizes = [width for width in sorted(set(widths)) if width < img.width] + [None]
+    for width in sizes:
+        if width:
+            height = max(1, round(img.height * width / img.width))
+            resized = img.resize((width, height), Image.Resampling.LANCZOS)
+        else:
+            resized = img
+            width, height = img.width, img.height
+
+        targets = {}
+        if resized is not img:
+            targets[SAVE_FORMATS[image_format]] = image_format
+        targets.setdefault(".webp", "WEBP")
+        if make_avif:
+            targets[".avif"] = "AVIF"
+
+        for extension, target_format in targets.items():
+            name = variant_filename(stem, width if resized is not img else None, extension)
+            if name == filename:
+                continue
+            _save(resized, os.path.join(directory, name), target_format)
+            variants.append({
+                "width": width,
+                "height": height,
+                "format": target_format.lower(),
+                "filename": name,
+            })
+
+    return {**describe_pixels(img, source_path, image_format), "variants": variants}
+
+
+def resize_to_fit(
+    source_path: str,
+    dest_path: str,
+    width: int,
+    height: int,
+    image_format: Optional[str] = None
+) -> str:
+    """
+    Write a copy of ``source_path`` that fits in ``width`` x ``height``.
+
+    A zero dimension means "unconstrained". Images are never upscaled.
+    Returns the format the copy was written in.
+    """
+    with Image.open(source_path, formats=list(SAVE_FORMATS)) as opened:
+        source_format = opened.format if opened.format in SAVE_FORMATS else "JPEG"
+        if width or height:
+            opened.draft(None, (max(width, height),) * 2)
+        img = ImageOps.exif_transpose(opened)
+        img.load()
+
+    box = (width or img.width, height or img.height)
+    if img.width > box[0] or img.height > box[1]:
+        img.thumbnail(box, Image.Resampling.LANCZOS)
+
+    target_format = (image_format or source_format).upper()
+    if target_format == "GIF":
+        # Resized frames lose animation anyway; PNG keeps transparency
+        target_format = "PNG"
+    _save(img, dest_path, target_format)
+    return target_format.lower()
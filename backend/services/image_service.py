@@ -0,0 +1,307 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from fastapi import HTTPException, UploadFile
+from PIL import Image, UnidentifiedImageError
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import ImageAsset, StoredObject
+from services.content_store import ContentStore
+from services.upload_service import UploadService
+from services.storage import upload_storage
+from services.image_processing import generate_variants, limit_decoding, probe_header, FORMAT_EXTENSIONS
+
+# ImageAsset columns filled from the metadata computed in the process pool
+METADATA_FIELDS = ("width", "height", "format", "file_size", "dominant_color", "placeholder")
+
+
+class ImageService:
+    _executor: Optional[ProcessPoolExecutor] = None
+
+    @staticmethod
+    def executor() -> ProcessPoolExecutor:
+        """Process pool for CPU-heavy image work, kept off the event loop and the GIL"""
+        if ImageService._executor is None:
+            ImageService._executor = ProcessPoolExecutor(
+                max_workers=settings.image_workers,
+                initializer=limit_decoding,
+                initargs=(settings.image_max_pixels,)
+            )
+        return ImageService._executor
+
+    @staticmethod
+    def shutdown():
+        if ImageService._executor is not None:
+            ImageService._executor.shutdown(wait=False, cancel_futures=True)
+            ImageService._executor = None
+
+    @staticmethod
+    async def run_in_pool(func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(ImageService.executor(), func, *args)
+
+    @staticmethod
+    async def validate_image(file_path: str) -> dict:
+        """
+        Check an upload from its header alone, before anything decodes it.
+
+        Rejects files that aren't a supported image, whose real format
+        doesn't match their extension, or that have more pixels than
+        ``image_max_pixels`` (decompression bombs are tiny files with huge
+        dimensions). Returns the header info.
+        """
+        too_large = f"Image is too large; the limit is {settings.image_max_pixels} pixels"
+        try:
+            header = await asyncio.to_thread(probe_header, file_path)
+        except Image.DecompressionBombError:
+            # Pillow's own check, for dimensions far past its default limit
+            raise HTTPException(status_code=400, detail=too_large)
+        except (UnidentifiedImageError, OSError):
+            raise HTTPException(status_code=400, detail="File is not a valid image")
+        
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension not in FORMAT_EXTENSIONS[header["format"]]:
+            raise HTTPException(
+                status_code=400,
+                detail=f"File is a {header['format']} image, which doesn't match its {extension} extension"
+            )
+        if header["width"] * header["height"] > settings.image_max_pixels:
+            raise HTTPException(status_code=400, detail=too_large)
+        return header
+
+    @staticmethod
+    async def process_upload(
+        db: Session,
+        file_path: str,
+        url: str,
+        max_size: Optional[Tuple[int, int]] = None
+    ) -> ImageAsset:
+        """
+        Normalize an uploaded image and build its responsive variants in the
+        process pool, then record them as an ImageAsset (not committed).
+
+        ``file_path`` is the local working copy of ``url``, already checked
+        with ``validate_image``; the variants are published to storage here,
+        the original is left to the caller.
+        """
+        try:
+            info = await ImageService.run_in_pool(
+                generate_variants, file_path, settings.image_variant_widths, max_size
+            )
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+            raise HTTPException(status_code=400, detail="File is not a valid image")
+
+        base_url = url.rsplit("/", 1)[0]
+        variants = [
+            {
+                "width": variant["width"],
+                "height": variant["height"],
+                "format": variant["format"],
+                "url": f"{base_url}/{variant['filename']}",
+            }
+            for variant in info["variants"]
+        ]
+        for variant in variants:
+            await asyncio.to_thread(upload_storage.publish, upload_storage.key_for_url(variant["url"]))
+        return ImageService.record_metadata(db, url, info, variants)
+
+    @staticmethod
+    async def store_image(
+        db: Session,
+        source,
+        kind: str,
+        extension: str,
+        max_size: Optional[Tuple[int, int]] = None,
+        suffix: str = "",
+        digest: Optional[str] = None
+    ) -> Tuple[dict, ImageAsset]:
+        """
+        Store an image in the content store and process it if it is new.
+
+        A duplicate of an earlier upload reuses the stored file and its
+        ImageAsset without decoding anything. Returns the stored object info
+        and the ImageAsset (not committed).
+        """
+        created = {}
+
+        async def process(path: str, url: str):
+            created["asset"] = await ImageService.process_upload(db, path, url, max_size)
+
+        def is_processed(url: str) -> bool:
+            # Also covers objects stored before their metadata was recorded
+            return db.query(ImageAsset.id).filter(ImageAsset.url == url).first() is not None
+
+        stored = await ContentStore.save(
+            db, source, kind, extension, suffix, on_create=process, is_processed=is_processed, digest=digest,
+            validate=ImageService.validate_image
+        )
+        asset = created.get("asset") or db.query(ImageAsset).filter(ImageAsset.url == stored["url"]).first()
+        return stored, asset
+
+    @staticmethod
+    async def store_images(
+        db: Session,
+        files: List[UploadFile],
+        kind: str,
+        max_size: Optional[Tuple[int, int]] = None
+    ) -> List[Union[Tuple[dict, ImageAsset], HTTPException]]:
+        """
+        Store many uploaded images at once, like ``store_image``.
+
+        Files are staged and hashed first, so identical files in the batch
+        are processed once. New images are then processed concurrently; the
+        process pool bounds the CPU work and a semaphore bounds how many
+        files are in flight. Returns ``(stored, asset)`` or the error for
+        each file, in order (nothing is committed).
+        """
+        in_flight = asyncio.Semaphore(settings.image_workers * 2)
+
+        async def stage(file: UploadFile) -> Tuple[str, str, str]:
+            async with in_flight:
+                extension = os.path.splitext(file.filename or "")[1].lower()
+                staged = ContentStore.staging_path(extension)
+                hasher = hashlib.sha256()
+                await UploadService.save_upload(file, staged, hasher=hasher)
+                return staged, extension, hasher.hexdigest()
+
+        async def store(staged: str, extension: str, digest: str) -> Tuple[dict, ImageAsset]:
+            async with in_flight:
+                return await ImageService.store_image(db, staged, kind, extension, max_size, digest=digest)
+
+        def as_error(error: BaseException) -> HTTPException:
+            if isinstance(error, HTTPException):
+                return error
+            return HTTPException(status_code=500, detail=f"Failed to upload image: {error}")
+
+        staged_files = await asyncio.gather(*(stage(file) for file in files), return_exceptions=True)
+
+        # The first file with each content is stored; its duplicates share the result
+        groups: Dict[Tuple[str, str], List[int]] = {}
+        for index, staged in enumerate(staged_files):
+            if not isinstance(staged, BaseException):
+                groups.setdefault((staged[2], staged[1]), []).append(index)
+        for indexes in groups.values():
+            for index in indexes[1:]:
+                os.remove(staged_files[index][0])
+
+        stored = await asyncio.gather(
+            *(store(*staged_files[indexes[0]]) for indexes in groups.values()),
+            return_exceptions=True
+        )
+
+        results = [as_error(staged) if isinstance(staged, BaseException) else None for staged in staged_files]
+        for indexes, result in zip(groups.values(), stored):
+            for index in indexes:
+                results[index] = as_error(result) if isinstance(result, BaseException) else result
+        return results
+
+    @staticmethod
+    def record_metadata(db: Session, url: str, info: dict, variants: Optional[List[dict]] = None) -> ImageAsset:
+        """
+        Create or update the ImageAsset for ``url`` (not committed).
+
+        ``variants`` of ``None`` keeps whatever variants are already recorded.
+        A new asset is returned detached; its row is inserted at commit.
+        """
+        asset = db.query(ImageAsset).filter(ImageAsset.url == url).first()
+        if asset:
+            for field in METADATA_FIELDS:
+                setattr(asset, field, info.get(field))
+            if variants is not None:
+                asset.variants = json.dumps(variants)
+            return asset
+
+        # Another request may record the same image first; the row is upserted on commit
+        values = {field: info.get(field) for field in METADATA_FIELDS}
+        values["variants"] = json.dumps(variants) if variants is not None else None
+        update_fields = list(values) if variants is not None else list(METADATA_FIELDS)
+        ContentStore.add_unique(db, ImageAsset, dict(values, url=url), update_fields)
+        return ImageAsset(url=url, **values)
+
+    @staticmethod
+    def srcset(asset: ImageAsset, image_format: Optional[str] = None) -> str:
+        """
+        Build a ``srcset`` string for one format.
+
+        ``None`` means the original format, whose largest candidate is the
+        original file itself.
+        """
+        variants = json.loads(asset.variants or "[]")
+        image_format = image_format or asset.format
+        candidates = [
+            (variant["width"], variant["url"])
+            for variant in variants
+            if variant["format"] == image_format
+        ]
+        if image_format == asset.format and asset.width:
+            candidates.append((asset.width, asset.url))
+        return ", ".join(f"{url} {width}w" for width, url in sorted(candidates))
+
+    @staticmethod
+    def describe(asset: ImageAsset) -> dict:
+        """Image details returned alongside an ``image_url`` in API responses"""
+        formats = {variant["format"] for variant in json.loads(asset.variants or "[]")}
+        info = {field: getattr(asset, field) for field in METADATA_FIELDS}
+        info["srcset"] = ImageService.srcset(asset)
+        for image_format in ("webp", "avif"):
+            if image_format in formats and image_format != asset.format:
+                info[f"{image_format}_srcset"] = ImageService.srcset(asset, image_format)
+        return info
+
+    @staticmethod
+    def describe_urls(db: Session, urls: Iterable[Optional[str]]) -> Dict[str, dict]:
+        """Look up image details for many URLs with a single query"""
+        urls = {url for url in urls if url}
+        if not urls:
+            return {}
+        assets = db.query(ImageAsset).filter(ImageAsset.url.in_(urls)).all()
+        return {asset.url: ImageService.describe(asset) for asset in assets}
+
+    @staticmethod
+    def attach(db: Session, items: List[dict], url_field: str = "image_url", target_field: str = "image") -> List[dict]:
+        """Add image details to serialized items under ``target_field``"""
+        described = ImageService.describe_urls(db, (item.get(url_field) for item in items))
+        for item in items:
+            item[target_field] = described.get(item.get(url_field))
+        return items
+
+    @staticmethod
+    async def delete_image(db: Session, url: str):
+        """
+        Remove an uploaded image, its variants and its ImageAsset row (not committed).
+
+        Content-addressed files can be shared, so they are kept while any row
+        still references them; flush the change that dropped the reference
+        before calling this. The object's lock is held while checking, and an
+        object an upload reused within the GC grace period is left for the
+        sweeper, so a concurrent identical upload never ends up pointing at
+        a deleted file.
+        """
+        key = upload_storage.key_for_url(url)
+        if not key:
+            return
+        async with ContentStore.locked(key):
+            if ContentStore.claimed_since(key, time.time() - settings.storage_gc_grace_seconds):
+                return
+            stored = db.query(StoredObject.id, StoredObject.ref_count).filter(StoredObject.url == url).first()
+            if stored:
+                if stored.ref_count > 0:
+                    return
+                db.query(StoredObject).filter(StoredObject.id == stored.id).delete()
+
+            asset = db.query(ImageAsset).filter(ImageAsset.url == url).first()
+            urls = [url]
+            if asset:
+                urls += [variant["url"] for variant in json.loads(asset.variants or "[]")]
+                db.delete(asset)
+
+            for file_url in urls:
+                file_key = upload_storage.key_for_url(file_url)
+                if file_key:
+                    await asyncio.to_thread(upload_storage.delete, file_key)
@@ -0,0 +1,64 @@
+"""
+Eager-loading policy for list and export endpoints.
+
+Every endpoint that returns many rows declares here how its query loads
+related objects, so serializing a page never lazy-loads one relationship per
+row (the N+1 pattern), plus the most SQL statements a 100-item page may
+issue: the count, the page itself and, for items with images, one batched
+image lookup. Routers apply the options with ``apply_policy``;
+``benchmarks/statement_budget.py`` requests a 100-item page of each and fails if
+any of them goes over its budget.
+
+Endpoints that serialize no relationships use ``raiseload("*")``: a
+relationship touched without a loader declared here raises instead of
+silently issuing a query per row.
+"""
+
+from typing import Dict, Sequence
+
+from sqlalchemy.orm import contains_eager, joinedload, raiseload
+
+from database import Event, EventRegistration
+
+# The columns of an event that registration listings show
+_REGISTRATION_EVENT_COLUMNS = (Event.id, Event.title, Event.start_date, Event.location)
+
+
+class LoadingPolicy:
+    def __init__(self, path: str, options: Sequence, max_statements: int):
+        self.path = path  # Request the budget check sends (a 100-item page)
+        self.options = tuple(options)
+        self.max_statements = max_statements
+
+
+LOADING_POLICIES: Dict[str, LoadingPolicy] = {
+    "event_registrations.list": LoadingPolicy(
+        "/api/event-registrations/registrations?size=100",
+        [joinedload(EventRegistration.event).load_only(*_REGISTRATION_EVENT_COLUMNS), raiseload("*")],
+        max_statements=2
+    ),
+    # The export query joins Event itself (inner join), so reuse that join
+    "event_registrations.export": LoadingPolicy(
+        "/api/event-registrations/registrations/export",
+        [contains_eager(EventRegistration.event).load_only(Event.id, Event.title), raiseload("*")],
+        max_statements=1
+    ),
+    "events.registrations": LoadingPolicy(
+        "/api/events/registrations?size=100",
+        [raiseload("*")],
+        max_statements=2
+    ),
+    "events.list": LoadingPolicy("/api/events?size=100", [raiseload("*")], max_statements=3),
+    "projects.list": LoadingPolicy("/api/projects?size=100", [raiseload("*")], max_statements=3),
+    "communities.list": LoadingPolicy("/api/communities?size=100", [raiseload("*")], max_statements=3),
+    "blog.list": LoadingPolicy("/api/blog?size=100", [raiseload("*")], max_statements=3),
+    "store.products": LoadingPolicy("/api/store/products?size=100", [raiseload("*")], max_statements=3),
+    "store.my_orders": LoadingPolicy("/api/store/orders/my?size=100", [raiseload("*")], max_statements=2),
+    "gallery.list": LoadingPolicy("/api/gallery?size=100", [raiseload("*")], max_statements=3),
+    "users.list": LoadingPolicy("/api/users?size=100", [raiseload("*")], max_statements=2),
+}
+
+
+def apply_policy(query, name: str):
+    """Add the loader options declared for endpoint ``name`` to ``query``"""
+    return query.options(*LOADING_POLICIES[name].options)
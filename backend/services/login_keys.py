@@ -0,0 +1,102 @@
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, event, inspect, insert
+from sqlalchemy.orm import Session
+
+from database import User, UserLoginKey
+
+
+class LoginKeys:
+    """
+    Normalized login identifiers.
+
+    Every user has a ``user_login_keys`` row for their lower-cased username
+    and one for their lower-cased email, so "username or email" is a single
+    primary-key seek instead of an OR across two indexes, and both are
+    matched case-insensitively. The rows are kept in sync by a session flush
+    listener; routers just create, rename or delete users.
+    """
+
+    @staticmethod
+    def normalize(identifier: str) -> str:
+        return identifier.strip().lower()
+
+    @staticmethod
+    def keys_for(username: Optional[str], email: Optional[str]) -> List[str]:
+        keys = []
+        for identifier in (username, email):
+            if identifier:
+                key = LoginKeys.normalize(identifier)
+                if key not in keys:
+                    keys.append(key)
+        return keys
+
+    @staticmethod
+    def find_user(db: Session, identifier: str) -> Optional[User]:
+        """The user whose username or email is ``identifier``, in any case"""
+        return db.query(User).join(UserLoginKey, UserLoginKey.user_id == User.id).filter(
+            UserLoginKey.key == LoginKeys.normalize(identifier)
+        ).first()
+
+    @staticmethod
+    def taken(db: Session, *identifiers: str) -> bool:
+        """Whether any of ``identifiers`` is already some user's username or email"""
+        keys = {LoginKeys.normalize(identifier) for identifier in identifiers if identifier}
+        return db.query(UserLoginKey.key).filter(UserLoginKey.key.in_(keys)).first() is not None
+
+    @staticmethod
+    def backfill(db: Session) -> int:
+        """
+        Add the keys of users that have none (users created before the table
+        existed). When two existing users share an identifier in different
+        cases, the older account keeps it. Returns the number of keys added.
+        """
+        users = db.query(User.id, User.username, User.email).filter(
+            ~User.id.in_(db.query(UserLoginKey.user_id))
+        ).order_by(User.id).all()
+        if not users:
+            return 0
+
+        existing = {key for key, in db.query(UserLoginKey.key)}
+        rows = []
+        for user in users:
+            for key in LoginKeys.keys_for(user.username, user.email):
+                if key in existing:
+                    print(f"⚠️ Login identifier '{key}' of user {user.id} is already used by another account")
+                    continue
+                existing.add(key)
+                rows.append({"key": key, "user_id": user.id})
+        if rows:
+            db.execute(insert(UserLoginKey.__table__), rows)
+        db.commit()
+        return len(rows)
+
+
+def _changed_users(session) -> Iterable[User]:
+    for user in session.dirty:
+        if isinstance(user, User):
+            state = inspect(user)
+            if state.attrs.username.history.has_changes() or state.attrs.email.history.has_changes():
+                yield user
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_login_keys(session, flush_context):
+    table = UserLoginKey.__table__
+    stale = [user.id for user in session.deleted if isinstance(user, User)]
+    changed = list(_changed_users(session))
+    stale += [user.id for user in changed]
+    rows = [
+        {"key": key, "user_id": user.id}
+        for user in [user for user in session.new if isinstance(user, User)] + changed
+        for key in LoginKeys.keys_for(user.username, user.email)
+    ]
+    if not stale and not rows:
+        return
+
+    connection = session.connection()
+    if stale:
+        connection.execute(delete(table).where(table.c.user_id.in_(stale)))
+    if rows:
+        # A key another user already has fails the flush (IntegrityError)
+        connection.execute(insert(table), rows)
@@ -0,0 +1,172 @@
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from config import settings
+
+
+class _KeyState:
+    __slots__ = ("attempts", "failures", "last_failure", "locked_until")
+
+    def __init__(self):
+        self.attempts: Deque[float] = deque()
+        self.failures = 0
+        self.last_failure = 0.0
+        self.locked_until = 0.0
+
+
+class LoginThrottle:
+    """
+    In-memory sliding-window limiter for login attempts.
+
+    Attempts are counted per username and per client IP over the last
+    ``window_seconds``; a request over either budget is refused with a 429
+    before the user lookup or bcrypt run. After ``free_failures`` wrong
+    passwords in a row for a username from one IP, that pair is also locked
+    out for a delay that doubles with every further failure, up to
+    ``max_backoff_seconds`` (keying backoff on the pair keeps one user's typos
+    from locking out everyone behind the same NAT). A successful login, or a
+    window without failures, ends the streak.
+
+    State is per process and bounded to ``max_keys`` keys, least recently
+    used first out; every operation is O(1) amortized.
+    """
+
+    def __init__(
+        self,
+        window_seconds: int,
+        max_per_username: int,
+        max_per_ip: int,
+        free_failures: int,
+        base_backoff_seconds: float,
+        max_backoff_seconds: float,
+        max_keys: int
+    ):
+        self.window_seconds = window_seconds
+        self.max_per_username = max_per_username
+        self.max_per_ip = max_per_ip
+        self.free_failures = free_failures
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.max_keys = max_keys
+        self._keys: "OrderedDict[Tuple[str, str], _KeyState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.throttled_window = 0
+        self.throttled_backoff = 0
+        self.failures = 0
+        self.successes = 0
+
+    @staticmethod
+    def client_ip(request: Request) -> str:
+        """Client address, taken from the proxy's X-Forwarded-For entry when configured to trust it"""
+        if settings.login_throttle_trust_forwarded_for:
+            forwarded = request.headers.get("x-forwarded-for")
+            if forwarded:
+                # The last entry is the one our proxy appended; earlier ones are client-supplied
+                return forwarded.rsplit(",", 1)[-1].strip()
+        return request.client.host if request.client else "unknown"
+
+    def _state(self, key: Tuple[str, str], create: bool) -> Optional[_KeyState]:
+        state = self._keys.get(key)
+        if state is None:
+            if not create:
+                return None
+            state = self._keys[key] = _KeyState()
+            if len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+        else:
+            self._keys.move_to_end(key)
+        return state
+
+    def _retry_after(self, state: _KeyState, limit: int, now: float) -> Tuple[float, bool]:
+        """Seconds until ``state`` may try again (0 when it may now), and whether backoff is the cause"""
+        cutoff = now - self.window_seconds
+        attempts = state.attempts
+        while attempts and attempts[0] <= cutoff:
+            attempts.popleft()
+        window_wait = attempts[len(attempts) - limit] - cutoff if len(attempts) >= limit else 0.0
+        backoff_wait = state.locked_until - now
+        if backoff_wait > window_wait:
+            return backoff_wait, True
+        return window_wait, False
+
+    @staticmethod
+    def _pair_key(username: str, ip: str) -> Tuple[str, str]:
+        return ("pair", f"{username}\n{ip}")
+
+    def check(self, username: str, ip: str):
+        """Count a login attempt, or raise a 429 if it is over budget"""
+        now = time.monotonic()
+        username = username.strip().lower()
+        keys = ((("user", username), self.max_per_username), (("ip", ip), self.max_per_ip))
+        with self._lock:
+            states = [(self._state(key, create=True), limit) for key, limit in keys]
+            wait, backoff = max(self._retry_after(state, limit, now) for state, limit in states)
+            pair = self._state(self._pair_key(username, ip), create=False)
+            if pair is not None and pair.locked_until - now > wait:
+                wait, backoff = pair.locked_until - now, True
+            if wait > 0:
+                if backoff:
+                    self.throttled_backoff += 1
+                else:
+                    self.throttled_window += 1
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many login attempts, please try again later",
+                    headers={"Retry-After": str(max(1, math.ceil(wait)))}
+                )
+            for state, _ in states:
+                state.attempts.append(now)
+            self.allowed += 1
+
+    def record_failure(self, username: str, ip: str):
+        now = time.monotonic()
+        with self._lock:
+            self.failures += 1
+            state = self._state(self._pair_key(username.strip().lower(), ip), create=True)
+            if now - state.last_failure > self.window_seconds:
+                # A streak ends after a quiet window
+                state.failures = 0
+            state.failures += 1
+            state.last_failure = now
+            excess = state.failures - self.free_failures
+            if excess > 0:
+                delay = min(self.max_backoff_seconds, self.base_backoff_seconds * 2 ** (excess - 1))
+                state.locked_until = now + delay
+
+    def record_success(self, username: str, ip: str):
+        with self._lock:
+            self.successes += 1
+            self._keys.pop(self._pair_key(username.strip().lower(), ip), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "window_seconds": self.window_seconds,
+                "max_per_username": self.max_per_username,
+                "max_per_ip": self.max_per_ip,
+                "allowed": self.allowed,
+                "throttled_window": self.throttled_window,
+                "throttled_backoff": self.throttled_backoff,
+                "failures": self.failures,
+                "successes": self.successes,
+                "tracked_keys": len(self._keys),
+                "locked_keys": sum(1 for state in self._keys.values() if state.locked_until > now),
+            }
+
+
+login_throttle = LoginThrottle(
+    window_seconds=settings.login_throttle_window_seconds,
+    max_per_username=settings.login_throttle_max_per_username,
+    max_per_ip=settings.login_throttle_max_per_ip,
+    free_failures=settings.login_throttle_free_failures,
+    base_backoff_seconds=settings.login_throttle_base_backoff_seconds,
+    max_backoff_seconds=settings.login_throttle_max_backoff_seconds,
+    max_keys=settings.login_throttle_max_keys
+)
@@ -0,0 +1,215 @@
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_route_paths: Dict[object, str] = {}
+
+
+def route_template(scope) -> str:
+    """Path template of the route that handled the request (e.g. ``/api/events/{event_id}``), once routing has run"""
+    if not _route_paths and "app" in scope:
+        _route_paths.update({
+            route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")
+        })
+    return _route_paths.get(scope.get("endpoint"), "(other)")
+
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_label_value(value)}"' for name, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _RouteMetrics:
+    __slots__ = ("buckets", "count", "sum", "statuses")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # Last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.statuses: Dict[str, int] = {}
+
+    def observe(self, seconds: float, status_class: str):
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.statuses[status_class] = self.statuses.get(status_class, 0) + 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate from the buckets, interpolating linearly inside one (as Prometheus' histogram_quantile does)"""
+        rank = q * self.count
+        seen = 0
+        for index, in_bucket in enumerate(self.buckets):
+            if in_bucket and seen + in_bucket >= rank:
+                if index == len(LATENCY_BUCKETS):
+                    return LATENCY_BUCKETS[-1]
+                lower = LATENCY_BUCKETS[index - 1] if index else 0.0
+                return lower + (LATENCY_BUCKETS[index] - lower) * (rank - seen) / in_bucket
+            seen += in_bucket
+        return 0.0
+
+
+class Metrics:
+    """
+    Request metrics in the Prometheus text format.
+
+    The middleware records per-route request counts by status class and a
+    latency histogram, plus the number of requests in flight. It runs on
+    the event loop thread, as does rendering ``/metrics``, so recording
+    needs no lock: one bisect and a few integer increments per request.
+    Only the database pool checkout counter, which is updated from worker
+    threads, takes a lock.
+
+    Queue depths and cache counters are read when ``/metrics`` is scraped
+    through callbacks registered with ``add_gauge`` and ``add_cache``, so
+    the components they come from don't know about metrics.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.pool_checkouts = 0
+        self._pool = None
+        self._routes: Dict[Tuple[str, str], _RouteMetrics] = {}
+        self._gauges: List[Tuple[str, str, Callable[[], float]]] = []
+        self._caches: Dict[str, object] = {}
+        self._pool_lock = threading.Lock()
+        self.started_at = time.time()
+
+    def observe(self, method: str, route: str, status: int, seconds: float):
+        key = (method, route)
+        metrics = self._routes.get(key)
+        if metrics is None:
+            metrics = self._routes[key] = _RouteMetrics()
+        metrics.observe(seconds, f"{status // 100}xx")
+
+    def watch_pool(self, engine):
+        """Count connection checkouts of the engine's pool and report how many are checked out"""
+        self._pool = engine.pool
+        event.listen(engine, "checkout", self._on_checkout)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._pool_lock:
+            self.pool_checkouts += 1
+
+    def add_gauge(self, name: str, help_text: str, read: Callable[[], float]):
+        self._gauges.append((name, help_text, read))
+
+    def add_cache(self, name: str, cache):
+        """Report the ``hits`` and ``misses`` counters of ``cache``, and ``waits`` if it has one"""
+        self._caches[name] = cache
+
+    def render(self) -> str:
+        lines = []
+
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        routes = sorted(self._routes.items())
+        family("http_requests_total", "counter", "Requests handled, by route and status class")
+        for (method, route), metrics in routes:
+            for status, count in sorted(metrics.statuses.items()):
+                lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+        family("http_request_duration_seconds", "histogram", "Request latency, from receiving the request to the last response byte")
+        for (method, route), metrics in routes:
+            cumulative = 0
+            for bound, in_bucket in zip(LATENCY_BUCKETS + (math.inf,), metrics.buckets):
+                cumulative += in_bucket
+                labels = _labels(method=method, route=route, le=_number(bound))
+                lines.append(f"http_request_duration_seconds_bucket{labels} {cumulative}")
+            labels = _labels(method=method, route=route)
+            lines.append(f"http_request_duration_seconds_sum{labels} {_number(metrics.sum)}")
+            lines.append(f"http_request_duration_seconds_count{labels} {metrics.count}")
+
+        family("http_request_duration_quantile_seconds", "gauge", "p50/p95/p99 latency estimated from the histogram")
+        for (method, route), metrics in routes:
+            for q in QUANTILES:
+                labels = _labels(method=method, route=route, quantile=q)
+                lines.append(f"http_request_duration_quantile_seconds{labels} {_number(round(metrics.quantile(q), 6))}")
+
+        family("http_requests_in_flight", "gauge", "Requests being handled right now")
+        lines.append(f"http_requests_in_flight {self.in_flight}")
+
+        if self._pool is not None:
+            family("db_pool_checkouts_total", "counter", "Database connections checked out of the pool")
+            lines.append(f"db_pool_checkouts_total {self.pool_checkouts}")
+            checked_out = getattr(self._pool, "checkedout", None)
+            if checked_out is not None:
+                family("db_pool_checked_out", "gauge", "Database connections in use right now")
+                lines.append(f"db_pool_checked_out {checked_out()}")
+
+        for name, help_text, read in self._gauges:
+            family(name, "gauge", help_text)
+            lines.append(f"{name} {_number(read())}")
+
+        if self._caches:
+            family("cache_hits_total", "counter", "Cache lookups answered from the cache")
+            for name, cache in self._caches.items():
+                lines.append(f"cache_hits_total{_labels(cache=name)} {cache.hits}")
+            family("cache_misses_total", "counter", "Cache lookups that missed")
+            for name, cache in self._caches.items():
+                lines.append(f"cache_misses_total{_labels(cache=name)} {cache.misses}")
+            waiting = {name: cache.waits for name, cache in self._caches.items() if hasattr(cache, "waits")}
+            if waiting:
+                family("cache_waits_total", "counter", "Cache misses that waited for a concurrent lookup to fill the entry")
+                for name, waits in waiting.items():
+                    lines.append(f"cache_waits_total{_labels(cache=name)} {waits}")
+            family("cache_hit_ratio", "gauge", "Share of lookups answered from the cache since startup")
+            for name, cache in self._caches.items():
+                lookups = cache.hits + cache.misses + waiting.get(name, 0)
+                lines.append(f"cache_hit_ratio{_labels(cache=name)} {_number(round(cache.hits / lookups, 4) if lookups else 0.0)}")
+
+        family("process_uptime_seconds", "gauge", "Seconds since the process started")
+        lines.append(f"process_uptime_seconds {_number(round(time.time() - self.started_at, 1))}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Records the latency and status of every HTTP request in ``metrics``"""
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        status: Optional[int] = None
+
+        async def status_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, status_send)
+        finally:
+            metrics.in_flight -= 1
+            # No response started means the app raised; ServerErrorMiddleware answers 500
+            metrics.observe(scope["method"], route_template(scope), status or 500, time.perf_counter() - started)
+
+
+metrics = Metrics()
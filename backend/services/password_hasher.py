@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification in a small thread pool.
+
+    bcrypt costs hundreds of milliseconds of CPU per call and releases the
+    GIL while it works, so running it off the event loop keeps every other
+    request responsive during a login burst. At most ``max_workers`` hashes
+    run at once; once ``max_queue`` more are waiting, new ones are refused
+    with a 503 instead of piling up behind the burst.
+    """
+
+    def __init__(self, context: CryptContext, max_workers: int, max_queue: int):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def _timed(self, submitted_at: float, func, *args):
+        started_at = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            wait = started_at - submitted_at
+            self.total_wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.total_run_seconds += time.perf_counter() - started_at
+
+    async def _run(self, func, *args):
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Too many sign-in requests, please try again shortly",
+                    headers={"Retry-After": "1"}
+                )
+            self.queued += 1
+        try:
+            job = self._get_executor().submit(self._timed, time.perf_counter(), func, *args)
+        except RuntimeError:
+            # The executor is shutting down
+            with self._lock:
+                self.queued -= 1
+            raise
+        job.add_done_callback(self._forget_cancelled)
+        return await asyncio.wrap_future(job)
+
+    def _forget_cancelled(self, job):
+        # A job cancelled before it started (its caller went away) never reaches _timed
+        if job.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, password, hashed_password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify ``password`` and, when ``hashed_password`` was made with other
+        settings (e.g. an older cost factor), also return a fresh hash to
+        store in its place. The rehash runs in the same pool job.
+        """
+        verified, new_hash = await self._run(self.context.verify_and_update, password, hashed_password)
+        if new_hash:
+            with self._lock:
+                self.rehashed += 1
+        return verified, new_hash
+
+    def stats(self) -> dict:
+        with self._lock:
+            completed = self.completed
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "avg_wait_ms": round(self.total_wait_seconds / completed * 1000, 2) if completed else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 2),
+                "avg_run_ms": round(self.total_run_seconds / completed * 1000, 2) if completed else 0.0,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
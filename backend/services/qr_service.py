@@ -3,9 +3,11 @@ import json
 import os
 from io import BytesIO
 import base64
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from datetime import datetime
 
+from services.storage import qr_storage
+
 class QRCodeService:
     @staticmethod
     def generate_qr_code(registration_data: Dict[str, Any], file_path: str = None) -> str:
@@ -14,10 +16,11 @@ class QRCodeService:
         
         Args:
             registration_data: Dictionary containing registration information
-            file_path: Optional file path to save QR code. If None, returns base64 string
+            file_path: Optional QR code path (see get_qr_file_path) to store the
+                image under. If None, returns base64 string
             
         Returns:
-            File path if saved to file, or base64 encoded string if no file path
+            File path if stored, or base64 encoded string if no file path
         """
         # Create QR code data structure
         qr_data = {
@@ -48,26 +51,38 @@ class QRCodeService:
         # Create image
         img = qr.make_image(fill_color="black", back_color="white")
         
+        buffer = BytesIO()
+        img.save(buffer, format='PNG')
+        
         if file_path:
-            # Save to file
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            img.save(file_path)
+            # Save to the configured storage backend
+            qr_storage.write_bytes(QRCodeService.storage_key(file_path), buffer.getvalue())
             return file_path
         else:
             # Return base64 encoded string
-            buffer = BytesIO()
-            img.save(buffer, format='PNG')
-            buffer.seek(0)
-            img_base64 = base64.b64encode(buffer.read()).decode()
+            img_base64 = base64.b64encode(buffer.getvalue()).decode()
             return img_base64
     
     @staticmethod
     def get_qr_file_path(registration_id: int, event_id: int) -> str:
         """Generate a standardized file path for QR codes"""
         qr_dir = "static/qr_codes"
-        os.makedirs(qr_dir, exist_ok=True)
         return f"{qr_dir}/event_{event_id}_registration_{registration_id}.png"
     
+    @staticmethod
+    def storage_key(file_path: str) -> str:
+        """Key in qr_storage for a path stored in EventRegistration.qr_code_path"""
+        return os.path.basename(file_path)
+    
+    @staticmethod
+    def read_qr_code(file_path: str) -> Optional[bytes]:
+        """Load a stored QR code image, or None if it doesn't exist"""
+        return qr_storage.read_bytes(QRCodeService.storage_key(file_path))
+    
+    @staticmethod
+    def delete_qr_code(file_path: str):
+        qr_storage.delete(QRCodeService.storage_key(file_path))
+    
     @staticmethod
     def verify_qr_data(qr_data_string: str) -> Dict[str, Any]:
         """
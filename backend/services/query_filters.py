@@ -0,0 +1,108 @@
+"""
+Shared filters for admin list endpoints.
+
+Each function takes a SQLAlchemy ``Query`` or ``Select`` (both support
+``.filter``) and applies the same filtering the list endpoints use, so
+exports and paginated lists always agree on what a filter means.
+"""
+
+from typing import Optional
+
+from database import EventRegistration, ContactMessage, User, Order, Product
+
+
+def filter_registrations(
+    query,
+    event_id: Optional[int] = None,
+    status: Optional[str] = None,
+    search: Optional[str] = None
+):
+    """Filter event registrations by event, status and free-text search"""
+    if event_id:
+        query = query.filter(EventRegistration.event_id == event_id)
+
+    if status:
+        query = query.filter(EventRegistration.registration_status == status)
+
+    if search:
+        query = query.filter(
+            (EventRegistration.name.contains(search)) |
+            (EventRegistration.email.contains(search)) |
+            (EventRegistration.organization.contains(search))
+        )
+    return query
+
+
+def filter_contact_messages(
+    query,
+    status: Optional[str] = None,
+    search: Optional[str] = None
+):
+    """Filter contact messages by status and free-text search"""
+    if status:
+        query = query.filter(ContactMessage.status == status)
+
+    if search:
+        query = query.filter(
+            (ContactMessage.name.contains(search)) |
+            (ContactMessage.email.contains(search)) |
+            (ContactMessage.subject.contains(search))
+        )
+    return query
+
+
+def filter_users(
+    query,
+    search: Optional[str] = None,
+    role: Optional[str] = None
+):
+    """Filter users by free-text search and role"""
+    if search:
+        query = query.filter(
+            (User.full_name.contains(search)) |
+            (User.username.contains(search)) |
+            (User.email.contains(search))
+        )
+
+    if role:
+        query = query.filter(User.role == role)
+    return query
+
+
+def filter_orders(
+    query,
+    status: Optional[str] = None,
+    user_id: Optional[int] = None
+):
+    """Filter orders by status and owner"""
+    if status:
+        query = query.filter(Order.status == status)
+
+    if user_id:
+        query = query.filter(Order.user_id == user_id)
+    return query
+
+
+def filter_products(
+    query,
+    category: Optional[str] = None,
+    featured: Optional[bool] = None,
+    available: Optional[bool] = None,
+    search: Optional[str] = None
+):
+    """Filter products by category, flags and free-text search"""
+    if category:
+        query = query.filter(Product.category == category)
+
+    if featured is not None:
+        query = query.filter(Product.featured == featured)
+
+    if available is not None:
+        query = query.filter(Product.is_available == available)
+
+    if search:
+        query = query.filter(
+            (Product.name.contains(search)) |
+            (Product.description.contains(search))
+        )
+    return query
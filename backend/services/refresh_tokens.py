@@ -0,0 +1,246 @@
+import asyncio
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal, RefreshTokenFamily
+
+
+class RefreshTokenRejected(HTTPException):
+    def __init__(self, detail: str = "Could not validate credentials"):
+        super().__init__(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+class _Family:
+    __slots__ = ("user_id", "current_jti", "previous_jti", "rotated_at", "expires_at", "checked_at")
+
+    def __init__(self, row: RefreshTokenFamily):
+        self.user_id = row.user_id
+        self.current_jti = row.current_jti
+        self.previous_jti = row.previous_jti
+        self.rotated_at = row.rotated_at or 0
+        self.expires_at = row.expires_at
+        self.checked_at = time.time()  # When the row was last read or written
+
+
+class RefreshTokenStore:
+    """
+    Refresh-token families with rotation, reuse detection and revocation.
+
+    Each login starts a family; every refresh replaces its one valid token
+    (``current_jti``). Presenting an older token means it was stolen or
+    replayed, so the whole family is revoked. Access tokens carry the family
+    id, so revoking a family also ends its access tokens.
+
+    Active families are mirrored in an in-memory index loaded once from the
+    ``refresh_token_families`` table, so checking a token costs a dict
+    lookup; the table is read again on a miss, and for an entry last read
+    more than ``recheck_seconds`` ago, so a revocation or rotation made by
+    another worker process takes effect here within that time. Revoked and
+    expired families leave the index, and expired rows are purged in the
+    background, so memory and the table stay proportional to live sessions.
+    """
+
+    def __init__(self, ttl_seconds: int, reuse_grace_seconds: int, recheck_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.reuse_grace_seconds = reuse_grace_seconds
+        self.recheck_seconds = recheck_seconds
+        self._families: Dict[str, _Family] = {}
+        self._families_by_user: Dict[int, Set[str]] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.rotations = 0
+        self.reuse_detected = 0
+        self.revoked = 0
+
+    def _ensure_loaded(self, db: Session):
+        if self._loaded:
+            return
+        rows = db.query(RefreshTokenFamily).filter(
+            RefreshTokenFamily.revoked_at.is_(None),
+            RefreshTokenFamily.expires_at > int(time.time())
+        ).all()
+        with self._lock:
+            if not self._loaded:
+                for row in rows:
+                    self._index(row.id, _Family(row))
+                self._loaded = True
+
+    def _index(self, family_id: str, family: _Family):
+        self._families[family_id] = family
+        self._families_by_user.setdefault(family.user_id, set()).add(family_id)
+
+    def _unindex(self, family_id: str):
+        family = self._families.pop(family_id, None)
+        if family is not None:
+            ids = self._families_by_user.get(family.user_id)
+            if ids is not None:
+                ids.discard(family_id)
+                if not ids:
+                    del self._families_by_user[family.user_id]
+
+    def _indexed(self, family_id: str) -> Optional[_Family]:
+        """Index entry that is unexpired and recent enough to trust without reading the table"""
+        family = self._families.get(family_id)
+        now = time.time()
+        if family is not None and family.expires_at > now and now - family.checked_at < self.recheck_seconds:
+            return family
+        return None
+
+    def _lookup(self, db: Session, family_id: str) -> Optional[_Family]:
+        """Active family from the index, or from the table if another process created or changed it"""
+        self._ensure_loaded(db)
+        family = self._indexed(family_id)
+        if family is not None:
+            return family
+        now = int(time.time())
+        row = db.query(RefreshTokenFamily).filter(
+            RefreshTokenFamily.id == family_id
+        ).populate_existing().first()
+        with self._lock:
+            if row is None or row.revoked_at is not None or row.expires_at <= now:
+                self._unindex(family_id)
+                return None
+            family = _Family(row)
+            self._index(family_id, family)
+            return family
+
+    def issue(self, db: Session, user_id: int) -> Tuple[str, str, int]:
+        """Start a family for a new login; returns (family id, token id, expiry)"""
+        self._ensure_loaded(db)
+        row = RefreshTokenFamily(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            current_jti=uuid.uuid4().hex,
+            expires_at=int(time.time()) + self.ttl_seconds
+        )
+        db.add(row)
+        db.commit()
+        with self._lock:
+            self._index(row.id, _Family(row))
+        return row.id, row.current_jti, row.expires_at
+
+    def rotate(self, db: Session, family_id: str, jti: str) -> Tuple[str, int]:
+        """
+        Swap the presented refresh token for a new one; returns (token id,
+        expiry). The previous token is still answered with the current one
+        for ``reuse_grace_seconds``, so concurrent refreshes from one client
+        don't look like theft.
+        """
+        family = self._lookup(db, family_id) if family_id else None
+        if family is None:
+            raise RefreshTokenRejected()
+
+        now = int(time.time())
+        if jti and jti == family.previous_jti and now - family.rotated_at <= self.reuse_grace_seconds:
+            return family.current_jti, family.expires_at
+        if not jti or jti != family.current_jti:
+            self.reuse_detected += 1
+            self.revoke_family(db, family_id)
+            print(f"⚠️ Refresh token reuse detected for user {family.user_id}; session revoked")
+            raise RefreshTokenRejected("Refresh token was already used; please log in again")
+
+        new_jti = uuid.uuid4().hex
+        expires_at = now + self.ttl_seconds
+        # Conditional on the token still being current, so two processes can't both rotate it
+        updated = db.query(RefreshTokenFamily).filter(
+            RefreshTokenFamily.id == family_id,
+            RefreshTokenFamily.current_jti == jti,
+            RefreshTokenFamily.revoked_at.is_(None)
+        ).update({
+            RefreshTokenFamily.current_jti: new_jti,
+            RefreshTokenFamily.previous_jti: jti,
+            RefreshTokenFamily.rotated_at: now,
+            RefreshTokenFamily.expires_at: expires_at
+        }, synchronize_session=False)
+        db.commit()
+        if not updated:
+            # Rotated or revoked elsewhere since the index was read; decide again from the table
+            with self._lock:
+                self._unindex(family_id)
+            if self._lookup(db, family_id) is None:
+                raise RefreshTokenRejected()
+            return self.rotate(db, family_id, jti)
+
+        with self._lock:
+            family.previous_jti, family.current_jti = jti, new_jti
+            family.rotated_at, family.expires_at = now, expires_at
+            family.checked_at = time.time()
+        self.rotations += 1
+        return new_jti, expires_at
+
+    def is_active(self, db: Session, family_id: str) -> bool:
+        """Whether tokens of this family are still honoured (checked on every authenticated request)"""
+        return self._lookup(db, family_id) is not None
+
+    def revoke_family(self, db: Session, family_id: str):
+        db.query(RefreshTokenFamily).filter(
+            RefreshTokenFamily.id == family_id,
+            RefreshTokenFamily.revoked_at.is_(None)
+        ).update({RefreshTokenFamily.revoked_at: int(time.time())}, synchronize_session=False)
+        db.commit()
+        with self._lock:
+            self._unindex(family_id)
+        self.revoked += 1
+
+    def revoke_user(self, db: Session, user_id: int) -> int:
+        """Revoke every session of a user; returns how many were active"""
+        count = db.query(RefreshTokenFamily).filter(
+            RefreshTokenFamily.user_id == user_id,
+            RefreshTokenFamily.revoked_at.is_(None),
+            RefreshTokenFamily.expires_at > int(time.time())
+        ).update({RefreshTokenFamily.revoked_at: int(time.time())}, synchronize_session=False)
+        db.commit()
+        with self._lock:
+            for family_id in list(self._families_by_user.get(user_id, ())):
+                self._unindex(family_id)
+        self.revoked += count
+        return count
+
+    def purge_expired(self) -> int:
+        now = int(time.time())
+        db = SessionLocal()
+        try:
+            deleted = db.query(RefreshTokenFamily).filter(
+                RefreshTokenFamily.expires_at <= now
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        with self._lock:
+            for family_id in [key for key, family in self._families.items() if family.expires_at <= now]:
+                self._unindex(family_id)
+        return deleted
+
+    async def run_cleanup_loop(self, interval_seconds: int = 3600):
+        """Periodically delete expired families; meant to run as a background task"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                purged = await asyncio.to_thread(self.purge_expired)
+                if purged:
+                    print(f"🧹 Purged {purged} expired refresh token families")
+            except Exception as e:
+                print(f"Refresh token cleanup failed: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active_families": len(self._families),
+                "users_with_sessions": len(self._families_by_user),
+                "rotations": self.rotations,
+                "reuse_detected": self.reuse_detected,
+                "revoked": self.revoked,
+            }
+
+
+refresh_tokens = RefreshTokenStore(
+    ttl_seconds=settings.refresh_token_expire_days * 86400,
+    reuse_grace_seconds=settings.refresh_token_reuse_grace_seconds,
+    recheck_seconds=settings.refresh_token_recheck_seconds
+)
@@ -0,0 +1,195 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import event
+
+from config import settings
+from services.sql_instrumentation import statement_shape
+
+# "SCAN events" reads the whole table; "SCAN events USING INDEX ..." walks an index instead
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(?!CONSTANT ROW)(\S+)(?!.*USING)")
+
+
+def redact_parameters(parameters) -> list:
+    """Bound values with text and blobs reduced to their type and length"""
+    if isinstance(parameters, dict):
+        parameters = list(parameters.values())
+    redacted = []
+    for value in parameters or ():
+        if isinstance(value, (str, bytes)):
+            redacted.append(f"<{type(value).__name__}:{len(value)}>")
+        elif value is None or isinstance(value, (bool, int, float)):
+            redacted.append(value)
+        else:
+            redacted.append(f"<{type(value).__name__}>")
+    return redacted
+
+
+class SlowQueryLog:
+    """
+    Log of statements slower than a threshold, with their query plan.
+
+    For a sampled share of slow statements, the engine hook writes one JSON
+    line with the normalized SQL, redacted parameters, duration and the
+    ``EXPLAIN QUERY PLAN`` output (SQLite only). The plan is explained on
+    the raw connection, so it bypasses the engine hooks. Full table scans
+    and temporary sort b-trees are listed separately; they are where
+    indexes are missing. The file is rotated at ``max_bytes`` and keeps
+    ``backups`` older files.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        path: str,
+        threshold_ms: float,
+        sample_rate: float,
+        max_bytes: int,
+        backups: int
+    ):
+        self.enabled = enabled
+        self.path = path
+        self.threshold_seconds = threshold_ms / 1000
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.logged = 0
+        self.skipped = 0  # Slow statements left out by sampling
+        self._lock = threading.Lock()
+
+    def install(self, engine):
+        if not self.enabled:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._slow_query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_slow_query_started", None)
+        if started is None:
+            return
+        seconds = time.perf_counter() - started
+        if seconds < self.threshold_seconds:
+            return
+        if random.random() >= self.sample_rate:
+            self.skipped += 1
+            return
+
+        plan = None
+        if conn.dialect.name == "sqlite" and not executemany:
+            plan = self._explain(conn, statement, parameters)
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "duration_ms": round(seconds * 1000, 2),
+            "statement": statement_shape(statement),
+            "parameters": redact_parameters(parameters[0] if executemany and parameters else parameters),
+            "executemany": executemany,
+            "plan": plan,
+            "full_scans": [match.group(1) for match in (_FULL_SCAN.match(step.strip()) for step in plan or ()) if match],
+            "temp_sort": any("USE TEMP B-TREE" in step for step in plan or ()),
+        }
+        try:
+            self._write(json.dumps(entry, default=str))
+        except OSError as e:
+            print(f"Slow query log write failed: {e}")
+
+    @staticmethod
+    def _explain(conn, statement: str, parameters) -> Optional[List[str]]:
+        try:
+            cursor = conn.connection.dbapi_connection.cursor()
+            try:
+                rows = cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+            finally:
+                cursor.close()
+        except Exception as e:
+            return [f"(plan unavailable: {e})"]
+        # Rows are (id, parent, notused, detail); indent children under their parent
+        depth = {0: -1}
+        plan = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, -1) + 1
+            plan.append("  " * depth[node_id] + detail)
+        return plan
+
+    def _write(self, line: str):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as log:
+                log.write(line + "\n")
+                size = log.tell()
+            self.logged += 1
+            if size >= self.max_bytes:
+                self._rotate()
+
+    def _rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def recent(self, limit: int = 100) -> List[dict]:
+        """The newest ``limit`` entries, newest first, from the current and rotated files"""
+        entries = []
+        for path in [self.path] + [f"{self.path}.{index}" for index in range(1, self.backups + 1)]:
+            if len(entries) >= limit:
+                break
+            try:
+                with open(path, encoding="utf-8") as log:
+                    lines = log.readlines()
+            except FileNotFoundError:
+                continue
+            for line in reversed(lines):
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue  # Partly written line
+                if len(entries) >= limit:
+                    break
+        return entries
+
+    def stats(self, limit: int = 100) -> dict:
+        entries = self.recent(limit)
+        statements = {}
+        for entry in entries:
+            summary = statements.setdefault(entry["statement"], {
+                "statement": entry["statement"],
+                "count": 0,
+                "max_ms": 0.0,
+                "full_scans": entry.get("full_scans") or [],
+                "temp_sort": entry.get("temp_sort", False),
+                "plan": entry.get("plan"),
+            })
+            summary["count"] += 1
+            summary["max_ms"] = max(summary["max_ms"], entry["duration_ms"])
+        return {
+            "enabled": self.enabled,
+            "threshold_ms": self.threshold_seconds * 1000,
+            "sample_rate": self.sample_rate,
+            "logged": self.logged,
+            "skipped_by_sampling": self.skipped,
+            "statements": sorted(statements.values(), key=lambda item: item["max_ms"], reverse=True),
+            "entries": entries,
+        }
+
+
+slow_query_log = SlowQueryLog(
+    enabled=settings.slow_query_log_enabled,
+    path=settings.slow_query_log_path,
+    threshold_ms=settings.slow_query_threshold_ms,
+    sample_rate=settings.slow_query_sample_rate,
+    max_bytes=settings.slow_query_log_max_bytes,
+    backups=settings.slow_query_log_backups
+)
@@ -0,0 +1,212 @@
+import re
+import threading
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+from config import settings
+from services.metrics import route_template
+
+_PLACEHOLDERS = re.compile(r"%\(\w+\)s|:\w+|\?")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_VALUE_LISTS = re.compile(r"\(\?(?:\s*,\s*\?)+\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(statement: str) -> str:
+    """``statement`` with literals, placeholders and IN lists collapsed, so repeats of one query compare equal"""
+    shape = _LITERALS.sub("?", _PLACEHOLDERS.sub("?", statement))
+    return _VALUE_LISTS.sub("(?)", _WHITESPACE.sub(" ", shape)).strip()
+
+
+class RequestQueryStats:
+    """Statements one request issued, filled in by the engine hooks"""
+
+    __slots__ = ("count", "seconds", "slowest_seconds", "slowest_statement", "shapes")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.shapes: Dict[str, int] = {}
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+        shape = statement_shape(statement)
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statement shapes issued at least ``threshold`` times, most frequent first"""
+        found = [(shape, count) for shape, count in self.shapes.items() if count >= threshold]
+        return sorted(found, key=lambda item: item[1], reverse=True)
+
+    def server_timing(self, threshold: int) -> str:
+        metrics = [
+            f'db;dur={self.seconds * 1000:.2f};desc="{self.count} statement{"" if self.count == 1 else "s"}"',
+            f"db-slowest;dur={self.slowest_seconds * 1000:.2f}",
+        ]
+        repeated = self.repeated(threshold)
+        if repeated:
+            metrics.append(f'db-n-plus-one;desc="{repeated[0][1]}x one statement"')
+        return ", ".join(metrics)
+
+
+class _RouteStats:
+    __slots__ = (
+        "requests", "statements", "seconds", "max_statements",
+        "slowest_seconds", "slowest_statement", "n_plus_one_requests", "n_plus_one"
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.statements = 0
+        self.seconds = 0.0
+        self.max_statements = 0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.n_plus_one_requests = 0
+        self.n_plus_one: Optional[dict] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "statements": self.statements,
+            "avg_statements": round(self.statements / self.requests, 2) if self.requests else 0,
+            "max_statements": self.max_statements,
+            "db_ms": round(self.seconds * 1000, 2),
+            "avg_db_ms": round(self.seconds * 1000 / self.requests, 3) if self.requests else 0,
+            "slowest_ms": round(self.slowest_seconds * 1000, 3),
+            "slowest_statement": self.slowest_statement,
+            "n_plus_one_requests": self.n_plus_one_requests,
+            "n_plus_one": self.n_plus_one,
+        }
+
+
+_current_request: ContextVar[Optional[RequestQueryStats]] = ContextVar("sql_request_stats", default=None)
+
+
+class SQLInstrumentation:
+    """
+    Per-request SQL statement counts and timings.
+
+    Engine hooks add every statement executed while a request is being
+    handled to that request's ``RequestQueryStats`` (found through a context
+    variable, which also reaches endpoints run in the thread pool). The
+    middleware reports the totals in a ``Server-Timing`` header and folds
+    them into per-route stats. A statement shape repeated at least
+    ``n_plus_one_threshold`` times in one request is flagged as a likely
+    N+1 and logged once per route.
+
+    When disabled neither the hooks nor the middleware are installed, so
+    there is no per-statement or per-request cost at all.
+    """
+
+    MAX_STATEMENT_LENGTH = 500  # Statement text kept in the stats
+
+    def __init__(self, enabled: bool, n_plus_one_threshold: int):
+        self.enabled = enabled
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._routes: Dict[str, _RouteStats] = {}
+        self._warned = set()
+        self._lock = threading.Lock()
+
+    def install(self, engine):
+        if not self.enabled:
+            return
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current_request.get() is not None:
+            context._instrumentation_started = time.perf_counter()
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _current_request.get()
+        started = getattr(context, "_instrumentation_started", None)
+        if stats is not None and started is not None:
+            stats.record(statement, time.perf_counter() - started)
+
+    def record_request(self, scope, stats: RequestQueryStats):
+        if not stats.count:
+            return
+        key = f"{scope['method']} {route_template(scope)}"
+        repeated = stats.repeated(self.n_plus_one_threshold)
+        with self._lock:
+            route = self._routes.get(key)
+            if route is None:
+                route = self._routes[key] = _RouteStats()
+            route.requests += 1
+            route.statements += stats.count
+            route.seconds += stats.seconds
+            route.max_statements = max(route.max_statements, stats.count)
+            if stats.slowest_seconds > route.slowest_seconds:
+                route.slowest_seconds = stats.slowest_seconds
+                route.slowest_statement = stats.slowest_statement[:self.MAX_STATEMENT_LENGTH]
+            if repeated:
+                shape, count = repeated[0]
+                route.n_plus_one_requests += 1
+                route.n_plus_one = {"statement": shape[:self.MAX_STATEMENT_LENGTH], "count": count}
+                first_warning = (key, shape) not in self._warned
+                self._warned.add((key, shape))
+        if repeated and first_warning:
+            print(f"⚠️ Likely N+1 in {key}: the same statement ran {count} times in one request: {shape[:200]}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            routes = {key: route.as_dict() for key, route in self._routes.items()}
+        return {
+            "enabled": self.enabled,
+            "n_plus_one_threshold": self.n_plus_one_threshold,
+            "routes": dict(sorted(routes.items(), key=lambda item: item[1]["db_ms"], reverse=True)),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self._warned.clear()
+
+
+class SQLInstrumentationMiddleware:
+    """Collects the SQL statements of each request and adds a ``Server-Timing`` header"""
+
+    def __init__(self, app, instrumentation: SQLInstrumentation):
+        self.app = app
+        self.instrumentation = instrumentation
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        token = _current_request.set(stats)
+
+        async def timing_send(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", stats.server_timing(self.instrumentation.n_plus_one_threshold))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timing_send)
+        finally:
+            _current_request.reset(token)
+            self.instrumentation.record_request(scope, stats)
+
+
+sql_instrumentation = SQLInstrumentation(
+    enabled=settings.sql_instrumentation_enabled,
+    n_plus_one_threshold=settings.sql_n_plus_one_threshold
+)
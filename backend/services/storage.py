@@ -0,0 +1,515 @@
+"""
+File storage backends for uploads and generated files (QR codes).
+
+Files are addressed by a storage key such as ``images/ab/<digest>.jpg``.
+LocalStorage keeps them in a directory on disk; S3Storage keeps them in an
+S3-compatible bucket (AWS S3, MinIO, LocalStack, ...), so several instances
+can share files and redeploys don't lose them. ``settings.storage_backend``
+picks one for the whole app.
+
+Image processing needs real files, so files are built at ``local_path(key)``
+and then handed over with ``publish(key)``. For LocalStorage that path is
+the stored file itself and publishing does nothing.
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import mimetypes
+import os
+import tempfile
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import AsyncIterator, Iterator, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+import aiofiles
+
+from config import settings
+
+try:
+    import boto3
+    from botocore.config import Config
+    from botocore.exceptions import ClientError
+except ImportError:  # Only needed for the S3 backend
+    boto3 = None
+    Config = None
+    ClientError = Exception
+
+CHUNK_SIZE = 64 * 1024
+
+
+class StorageBackend(ABC):
+    """Interface shared by the storage backends"""
+
+    def __init__(self, public_prefix: Optional[str] = None, cache_control: Optional[str] = None):
+        self.public_prefix = public_prefix
+        self.cache_control = cache_control
+
+    @staticmethod
+    def check_key(key: str) -> str:
+        """Reject keys that could escape the storage root"""
+        parts = key.split("/")
+        if not key or key.startswith("/") or "\\" in key or any(part in ("", ".", "..") for part in parts):
+            raise ValueError(f"Invalid storage key: {key!r}")
+        return key
+
+    @staticmethod
+    def content_type(key: str) -> str:
+        return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+    def url_for(self, key: str) -> str:
+        """URL stored in the database and handed to clients, e.g. ``/uploads/<key>``"""
+        return f"{self.public_prefix}/{key}"
+
+    def key_for_url(self, url: Optional[str]) -> Optional[str]:
+        if not url or not self.public_prefix or not url.startswith(f"{self.public_prefix}/"):
+            return None
+        return url[len(self.public_prefix) + 1:]
+
+    def staging_path(self, extension: str = "") -> str:
+        """Scratch file on the same filesystem as ``local_path``, for atomic renames"""
+        return self.local_path(f".staging/{uuid.uuid4().hex}{extension}")
+
+    # Backend-specific operations
+
+    @abstractmethod
+    def local_path(self, key: str) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def publish(self, key: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def fetch(self, key: str) -> str:
+        """Make the stored file available at ``local_path(key)`` and return that path"""
+        raise NotImplementedError
+
+    @abstractmethod
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        """A local file with the object's content, valid inside the ``with`` block"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def stat(self, key: str) -> Optional[Tuple[int, float]]:
+        """``(size, modified timestamp)`` or ``None`` if the object doesn't exist"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def move(self, key: str, new_key: str):
+        """Rename an object; its modified time becomes now"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_objects(self, prefix: str = "", start_after: str = "") -> Iterator[Tuple[str, int, float]]:
+        """
+        ``(key, size, modified timestamp)`` of every object whose key starts
+        with ``prefix`` (empty, or ending in ``/``), in key order, beginning
+        after the key ``start_after``.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def write_bytes(self, key: str, data: bytes):
+        raise NotImplementedError
+
+    @abstractmethod
+    def read_bytes(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_bytes(self, key: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def write_stream(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def download_url(self, key: str) -> str:
+        """URL a client can fetch the object from without going through this app"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def upload_target(self, key: str, size: int, sha256: str) -> dict:
+        """
+        Presigned-style target for uploading ``key`` directly: ``url``,
+        ``method``, ``headers`` and ``expires_at``. The content must match
+        ``sha256`` (hex) and ``size``.
+        """
+        raise NotImplementedError
+
+
+class LocalStorage(StorageBackend):
+    """Files in a directory on local disk"""
+
+    def __init__(self, root: str, public_prefix: Optional[str] = None, cache_control: Optional[str] = None,
+                 direct_upload_path: Optional[str] = None):
+        super().__init__(public_prefix, cache_control)
+        self.root = root
+        self.direct_upload_path = direct_upload_path
+
+    def local_path(self, key: str) -> str:
+        return os.path.join(self.root, *self.check_key(key).split("/"))
+
+    def publish(self, key: str):
+        pass
+
+    def fetch(self, key: str) -> str:
+        return self.local_path(key)
+
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        yield self.local_path(key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.local_path(key))
+
+    def stat(self, key: str) -> Optional[Tuple[int, float]]:
+        try:
+            result = os.stat(self.local_path(key))
+        except FileNotFoundError:
+            return None
+        return result.st_size, result.st_mtime
+
+    def delete(self, key: str):
+        path = self.local_path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def move(self, key: str, new_key: str):
+        path = self.local_path(new_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self.local_path(key), path)
+        os.utime(path)
+
+    def iter_objects(self, prefix: str = "", start_after: str = "") -> Iterator[Tuple[str, int, float]]:
+        directory = self.local_path(prefix.rstrip("/")) if prefix else self.root
+        yield from self._walk(directory, prefix, start_after)
+
+    def _walk(self, directory: str, prefix: str, start_after: str) -> Iterator[Tuple[str, int, float]]:
+        try:
+            entries = list(os.scandir(directory))
+        except (FileNotFoundError, NotADirectoryError):
+            return
+        # Sorting directories as "name/" makes the walk follow full key order
+        names = {(entry.name + "/" if entry.is_dir(follow_symlinks=False) else entry.name): entry for entry in entries}
+        for name in sorted(names):
+            key = prefix + name
+            if name.endswith("/"):
+                # Skip directories whose keys all sort before the cursor
+                if key > start_after or start_after.startswith(key):
+                    yield from self._walk(names[name].path, key, start_after)
+            elif key > start_after:
+                try:
+                    stat = names[name].stat()
+                except FileNotFoundError:
+                    continue
+                yield key, stat.st_size, stat.st_mtime
+
+    def write_bytes(self, key: str, data: bytes):
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.part"
+        with open(temp_path, "wb") as target:
+            target.write(data)
+        os.replace(temp_path, path)
+
+    def read_bytes(self, key: str) -> Optional[bytes]:
+        path = self.local_path(key)
+        if not os.path.isfile(path):
+            return None
+        with open(path, "rb") as source:
+            return source.read()
+
+    def iter_bytes(self, key: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        with open(self.local_path(key), "rb") as source:
+            while chunk := source.read(chunk_size):
+                yield chunk
+
+    async def write_stream(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.part"
+        size = 0
+        try:
+            async with aiofiles.open(temp_path, "wb") as target:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    await target.write(chunk)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return size
+
+    def download_url(self, key: str) -> str:
+        return self.url_for(self.check_key(key))
+
+    # Direct uploads are signed like presigned URLs and received by the upload router
+
+    @staticmethod
+    def upload_signature(key: str, size: int, sha256: str, expires: int) -> str:
+        message = f"{key}:{size}:{sha256}:{expires}".encode()
+        return hmac.new(settings.secret_key.encode(), message, hashlib.sha256).hexdigest()
+
+    @staticmethod
+    def verify_upload_signature(key: str, size: int, sha256: str, expires: int, signature: str) -> bool:
+        expected = LocalStorage.upload_signature(key, size, sha256, expires)
+        return expires >= time.time() and hmac.compare_digest(expected, signature)
+
+    def upload_target(self, key: str, size: int, sha256: str) -> dict:
+        expires = int(time.time()) + settings.presigned_url_ttl_seconds
+        query = urlencode({
+            "size": size,
+            "sha256": sha256,
+            "expires": expires,
+            "signature": self.upload_signature(self.check_key(key), size, sha256, expires),
+        })
+        return {
+            "url": f"{self.direct_upload_path}/{quote(key)}?{query}",
+            "method": "PUT",
+            "headers": {"Content-Type": self.content_type(key)},
+            "expires_at": expires,
+        }
+
+
+class S3Storage(StorageBackend):
+    """Objects in an S3-compatible bucket under ``prefix``"""
+
+    # S3 requires every multipart part except the last to be at least 5 MiB
+    PART_SIZE = 8 * 1024 * 1024
+
+    def __init__(self, bucket: str, prefix: str = "", client=None, public_prefix: Optional[str] = None,
+                 cache_control: Optional[str] = None, public_base_url: Optional[str] = None,
+                 scratch_dir: Optional[str] = None):
+        super().__init__(public_prefix, cache_control)
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("The S3 storage backend requires boto3 to be installed")
+            client = boto3.client(
+                "s3",
+                endpoint_url=settings.s3_endpoint_url,
+                region_name=settings.s3_region,
+                aws_access_key_id=settings.s3_access_key_id,
+                aws_secret_access_key=settings.s3_secret_access_key,
+                # SigV4 signs the checksum header of presigned uploads
+                config=Config(signature_version="s3v4"),
+            )
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.public_base_url = public_base_url.rstrip("/") if public_base_url else None
+        self.scratch_dir = os.path.join(scratch_dir or settings.storage_scratch_dir, prefix.strip("/") or "root")
+
+    def object_key(self, key: str) -> str:
+        return f"{self.prefix}{self.check_key(key)}"
+
+    def _put_args(self, key: str) -> dict:
+        args = {"ContentType": self.content_type(key)}
+        if self.cache_control:
+            args["CacheControl"] = self.cache_control
+        return args
+
+    @staticmethod
+    def _is_missing(error: Exception) -> bool:
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def local_path(self, key: str) -> str:
+        return os.path.join(self.scratch_dir, *self.check_key(key).split("/"))
+
+    def publish(self, key: str):
+        path = self.local_path(key)
+        # upload_file streams from disk and switches to multipart for large files
+        self.client.upload_file(path, self.bucket, self.object_key(key), ExtraArgs=self._put_args(key))
+        os.remove(path)
+
+    def fetch(self, key: str) -> str:
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.client.download_file(self.bucket, self.object_key(key), path)
+        return path
+
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        os.makedirs(self.scratch_dir, exist_ok=True)
+        handle, path = tempfile.mkstemp(dir=self.scratch_dir, suffix=os.path.splitext(key)[1])
+        os.close(handle)
+        try:
+            self.client.download_file(self.bucket, self.object_key(key), path)
+            yield path
+        finally:
+            os.remove(path)
+
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+    def stat(self, key: str) -> Optional[Tuple[int, float]]:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+        except ClientError as e:
+            if self._is_missing(e):
+                return None
+            raise
+        return head["ContentLength"], head["LastModified"].timestamp()
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+    def move(self, key: str, new_key: str):
+        # Single-request copies go up to 5 GB, far above max_file_size
+        self.client.copy_object(
+            Bucket=self.bucket,
+            Key=self.object_key(new_key),
+            CopySource={"Bucket": self.bucket, "Key": self.object_key(key)},
+        )
+        self.delete(key)
+
+    def iter_objects(self, prefix: str = "", start_after: str = "") -> Iterator[Tuple[str, int, float]]:
+        params = {"Bucket": self.bucket, "Prefix": self.prefix + prefix}
+        if start_after:
+            params["StartAfter"] = self.prefix + start_after
+        for page in self.client.get_paginator("list_objects_v2").paginate(**params):
+            for item in page.get("Contents", []):
+                yield item["Key"][len(self.prefix):], item["Size"], item["LastModified"].timestamp()
+
+    def write_bytes(self, key: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=self.object_key(key), Body=data, **self._put_args(key))
+
+    def read_bytes(self, key: str) -> Optional[bytes]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.object_key(key))
+        except ClientError as e:
+            if self._is_missing(e):
+                return None
+            raise
+        return response["Body"].read()
+
+    def iter_bytes(self, key: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        response = self.client.get_object(Bucket=self.bucket, Key=self.object_key(key))
+        yield from response["Body"].iter_chunks(chunk_size)
+
+    async def write_stream(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        """Multipart upload, holding at most one part in memory"""
+        object_key = self.object_key(key)
+        buffer = bytearray()
+        size = 0
+        upload_id = None
+        parts = []
+
+        async def flush_part():
+            nonlocal upload_id
+            if upload_id is None:
+                created = await asyncio.to_thread(
+                    self.client.create_multipart_upload, Bucket=self.bucket, Key=object_key, **self._put_args(key)
+                )
+                upload_id = created["UploadId"]
+            number = len(parts) + 1
+            result = await asyncio.to_thread(
+                self.client.upload_part, Bucket=self.bucket, Key=object_key,
+                UploadId=upload_id, PartNumber=number, Body=bytes(buffer)
+            )
+            parts.append({"PartNumber": number, "ETag": result["ETag"]})
+            buffer.clear()
+
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                buffer.extend(chunk)
+                if len(buffer) >= self.PART_SIZE:
+                    await flush_part()
+
+            if upload_id is None:
+                # Small enough for a single request
+                await asyncio.to_thread(self.write_bytes, key, bytes(buffer))
+                return size
+
+            if buffer:
+                await flush_part()
+            await asyncio.to_thread(
+                self.client.complete_multipart_upload, Bucket=self.bucket, Key=object_key,
+                UploadId=upload_id, MultipartUpload={"Parts": parts}
+            )
+        except BaseException:
+            if upload_id is not None:
+                await asyncio.to_thread(
+                    self.client.abort_multipart_upload, Bucket=self.bucket, Key=object_key, UploadId=upload_id
+                )
+            raise
+        return size
+
+    def download_url(self, key: str) -> str:
+        if self.public_base_url:
+            return f"{self.public_base_url}/{quote(self.object_key(key))}"
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self.object_key(key)},
+            ExpiresIn=settings.presigned_url_ttl_seconds,
+        )
+
+    def upload_target(self, key: str, size: int, sha256: str) -> dict:
+        # S3 rejects the PUT unless the body matches this checksum
+        checksum = base64.b64encode(bytes.fromhex(sha256)).decode("ascii")
+        params = {
+            "Bucket": self.bucket,
+            "Key": self.object_key(key),
+            "ContentLength": size,
+            "ChecksumSHA256": checksum,
+            **self._put_args(key),
+        }
+        url = self.client.generate_presigned_url(
+            "put_object", Params=params, ExpiresIn=settings.presigned_url_ttl_seconds
+        )
+        headers = {"Content-Type": params["ContentType"], "x-amz-checksum-sha256": checksum}
+        if self.cache_control:
+            headers["Cache-Control"] = self.cache_control
+        return {
+            "url": url,
+            "method": "PUT",
+            "headers": headers,
+            "expires_at": int(time.time()) + settings.presigned_url_ttl_seconds,
+        }
+
+
+def create_storage(area: str, local_root: str, public_prefix: Optional[str] = None,
+                   cache_control: Optional[str] = None, direct_upload_path: Optional[str] = None) -> StorageBackend:
+    """Build the configured backend for one storage area (its own directory or key prefix)"""
+    if settings.storage_backend == "s3":
+        return S3Storage(
+            settings.s3_bucket,
+            prefix=f"{area}/",
+            public_prefix=public_prefix,
+            cache_control=cache_control,
+            public_base_url=settings.s3_public_base_url,
+        )
+    if settings.storage_backend != "local":
+        raise RuntimeError(f"Unknown storage backend: {settings.storage_backend}")
+    return LocalStorage(local_root, public_prefix, cache_control, direct_upload_path)
+
+
+# Uploaded files are content addressed, so their URLs never change meaning
+upload_storage = create_storage(
+    "uploads",
+    settings.upload_dir,
+    public_prefix="/uploads",
+    cache_control="public, max-age=31536000, immutable",
+    direct_upload_path="/api/upload/direct",
+)
+
+# QR codes are private: they are only ever attached to emails
+qr_storage = create_storage("qr_codes", os.path.join("static", "qr_codes"))
@@ -0,0 +1,260 @@
+import asyncio
+import json
+import re
+import time
+from datetime import datetime, timezone
+from itertools import islice
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import String, or_, select
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal, Base, EventRegistration, ImageAsset, StoredObject
+from services.content_store import ContentStore
+from services.qr_service import QRCodeService
+from services.storage import StorageBackend, upload_storage, qr_storage
+
+# Upload keys in stored URLs, including /img resize URLs and URLs inside rich text
+UPLOAD_KEY_PATTERN = re.compile(r"/(?:uploads|img/\d+x\d+)/([^\s\"'<>()?#]+)")
+
+# Tables that index stored files rather than reference them
+INDEX_TABLES = {StoredObject.__tablename__, ImageAsset.__tablename__}
+
+QUARANTINE_PREFIX = ".quarantine/"
+
+
+def referenced_upload_keys(db: Session) -> Set[str]:
+    """
+    Keys of every upload referenced from the database, in one pass over the
+    tables: any text column mentioning ``/uploads/`` counts, so documents
+    linked from descriptions or blog content are kept too. Variants of
+    referenced images are included.
+    """
+    keys = set()
+    for table in Base.metadata.sorted_tables:
+        if table.name in INDEX_TABLES:
+            continue
+        columns = [column for column in table.columns if isinstance(column.type, String)]
+        if not columns:
+            continue
+        statement = select(*columns).where(or_(*[column.like("%/uploads/%") for column in columns]))
+        for row in db.execute(statement):
+            for value in row:
+                if value:
+                    keys.update(UPLOAD_KEY_PATTERN.findall(value))
+
+    for url, variants in db.query(ImageAsset.url, ImageAsset.variants).filter(ImageAsset.variants.isnot(None)):
+        if upload_storage.key_for_url(url) in keys:
+            keys.update(
+                upload_storage.key_for_url(variant["url"]) for variant in json.loads(variants)
+            )
+    keys.discard(None)
+    return keys
+
+
+def referenced_qr_keys(db: Session) -> Set[str]:
+    return {
+        QRCodeService.storage_key(path)
+        for (path,) in db.query(EventRegistration.qr_code_path).filter(EventRegistration.qr_code_path.isnot(None))
+    }
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    if value is None:
+        return 0
+    if value.tzinfo is None:  # SQLite returns naive UTC
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class StorageSweeper:
+    """
+    Background garbage collector for upload and QR code files.
+
+    Each sweep builds the set of referenced keys once, then walks storage in
+    key order a batch at a time. Files that nothing references and that are
+    older than the grace period (so uploads whose form hasn't been saved yet
+    survive) are moved under ``.quarantine/`` or deleted, depending on
+    ``mode``. Quarantined files are deleted once they have sat there for
+    ``quarantine_seconds``.
+
+    Upload candidates are checked again under the content store lock just
+    before removal, so an upload that reuses the same content wins.
+    """
+
+    def __init__(self, mode: str, grace_seconds: int, quarantine_seconds: int, batch_size: int):
+        if mode not in ("quarantine", "delete"):
+            raise ValueError(f"Unknown storage GC mode: {mode}")
+        self.mode = mode
+        self.grace_seconds = grace_seconds
+        self.quarantine_seconds = quarantine_seconds
+        self.batch_size = batch_size
+        self.last_report: Optional[dict] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def areas(self, db: Session) -> List[Tuple[str, StorageBackend, Set[str]]]:
+        return [
+            ("uploads", upload_storage, referenced_upload_keys(db)),
+            ("qr_codes", qr_storage, referenced_qr_keys(db)),
+        ]
+
+    async def sweep(self, dry_run: bool = False) -> dict:
+        """Run one full sweep (waits for a running one to finish first) and return its report"""
+        async with self._lock:
+            report = {
+                "started_at": datetime.utcnow().isoformat(),
+                "mode": self.mode,
+                "dry_run": dry_run,
+                "areas": {}
+            }
+            db = SessionLocal()
+            try:
+                started = time.time()
+                for name, storage, referenced in await asyncio.to_thread(self.areas, db):
+                    stats = report["areas"][name] = {
+                        "scanned": 0,
+                        "orphaned": 0,
+                        "orphaned_bytes": 0,
+                        "quarantined": 0,
+                        "deleted": 0,
+                        "reclaimed_bytes": 0,
+                        "errors": 0
+                    }
+                    await self._sweep_area(db, storage, referenced, started, stats, dry_run)
+                    if self.mode == "quarantine" and not dry_run:
+                        await self._purge_quarantine(storage, started, stats)
+            finally:
+                db.close()
+
+            ContentStore.forget_claims(before=started - self.grace_seconds)
+            report["finished_at"] = datetime.utcnow().isoformat()
+            report["reclaimed_bytes"] = sum(stats["reclaimed_bytes"] for stats in report["areas"].values())
+            self.last_report = report
+
+        print(
+            f"🧹 Storage sweep{' (dry run)' if dry_run else ''}: "
+            + ", ".join(
+                f"{name} {stats['orphaned']} orphaned/{stats['scanned']} files"
+                for name, stats in report["areas"].items()
+            )
+            + f", {report['reclaimed_bytes']} bytes reclaimed"
+        )
+        return report
+
+    async def _batches(self, storage: StorageBackend, prefix: str = "") -> AsyncIterator[List[Tuple[str, int, float]]]:
+        """Pages of ``iter_objects``, listed in a worker thread"""
+        objects = storage.iter_objects(prefix)
+        while True:
+            batch = await asyncio.to_thread(lambda: list(islice(objects, self.batch_size)))
+            if not batch:
+                return
+            yield batch
+
+    async def _sweep_area(self, db: Session, storage: StorageBackend, referenced: Set[str],
+                          started: float, stats: dict, dry_run: bool):
+        cutoff = started - self.grace_seconds
+        is_uploads = storage is upload_storage
+        async for batch in self._batches(storage):
+            # Hidden areas (.staging, .quarantine) are managed separately
+            batch = [item for item in batch if not item[0].startswith(".")]
+            stats["scanned"] += len(batch)
+            candidates = {
+                key: size for key, size, modified in batch
+                if key not in referenced and modified < cutoff
+            }
+            if is_uploads and candidates:
+                candidates = await asyncio.to_thread(self._unreferenced_objects, db, candidates, cutoff)
+            if dry_run:
+                stats["orphaned"] += len(candidates)
+                stats["orphaned_bytes"] += sum(candidates.values())
+                continue
+
+            removed = []
+            for key, size in candidates.items():
+                try:
+                    if is_uploads:
+                        async with ContentStore.locked(key):
+                            # Reused since the batch was checked?
+                            if ContentStore.claimed_since(key, cutoff) or not await asyncio.to_thread(
+                                self._unreferenced_objects, db, {key: size}, cutoff
+                            ):
+                                continue
+                            await self._remove(storage, key, size, stats)
+                        removed.append(storage.url_for(key))
+                    else:
+                        await self._remove(storage, key, size, stats)
+                except Exception as e:
+                    stats["errors"] += 1
+                    print(f"❌ Failed to remove orphaned file {key}: {e}")
+
+            if is_uploads and removed:
+                await asyncio.to_thread(self._forget_objects, db, removed)
+
+    @staticmethod
+    def _unreferenced_objects(db: Session, candidates: Dict[str, int], cutoff: float) -> Dict[str, int]:
+        """Drop candidates whose StoredObject is referenced or was created or reused recently"""
+        urls = {upload_storage.url_for(key): key for key in candidates}
+        rows = db.query(
+            StoredObject.url, StoredObject.ref_count, StoredObject.created_at, StoredObject.updated_at
+        ).filter(StoredObject.url.in_(list(urls)))
+        for row in rows:
+            if row.ref_count > 0 or max(_timestamp(row.created_at), _timestamp(row.updated_at)) >= cutoff:
+                candidates.pop(urls[row.url])
+        db.rollback()  # End the read transaction so the next batch sees new references
+        return candidates
+
+    @staticmethod
+    def _forget_objects(db: Session, urls: List[str]):
+        """Objects that are gone need no metadata or reference rows"""
+        db.query(StoredObject).filter(StoredObject.url.in_(urls), StoredObject.ref_count <= 0).delete(
+            synchronize_session=False
+        )
+        db.query(ImageAsset).filter(ImageAsset.url.in_(urls)).delete(synchronize_session=False)
+        db.commit()
+
+    async def _remove(self, storage: StorageBackend, key: str, size: int, stats: dict):
+        stats["orphaned"] += 1
+        stats["orphaned_bytes"] += size
+        if self.mode == "quarantine":
+            await asyncio.to_thread(storage.move, key, QUARANTINE_PREFIX + key)
+            stats["quarantined"] += 1
+        else:
+            await asyncio.to_thread(storage.delete, key)
+            stats["deleted"] += 1
+            stats["reclaimed_bytes"] += size
+
+    async def _purge_quarantine(self, storage: StorageBackend, started: float, stats: dict):
+        cutoff = started - self.quarantine_seconds
+        async for batch in self._batches(storage, QUARANTINE_PREFIX):
+            for key, size, modified in batch:
+                if modified >= cutoff:
+                    continue
+                try:
+                    await asyncio.to_thread(storage.delete, key)
+                    stats["deleted"] += 1
+                    stats["reclaimed_bytes"] += size
+                except Exception as e:
+                    stats["errors"] += 1
+                    print(f"❌ Failed to purge quarantined file {key}: {e}")
+
+    async def run_loop(self, interval_seconds: int):
+        """Sweep periodically; meant to run as a background task"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Storage sweep failed: {e}")
+
+
+storage_sweeper = StorageSweeper(
+    mode=settings.storage_gc_mode,
+    grace_seconds=settings.storage_gc_grace_seconds,
+    quarantine_seconds=settings.storage_gc_quarantine_seconds,
+    batch_size=settings.storage_gc_batch_size
+)
@@ -0,0 +1,65 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from config import settings
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of recently verified JWTs, keyed by the SHA-256 of the token.
+
+    A hit skips the HMAC check and claim parsing. Entries are only served
+    until the token's ``exp``, so an expired token is never accepted; tokens
+    without ``exp`` are not cached. The returned claims are shared between
+    requests and must not be modified.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            if time.time() >= payload["exp"]:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, token: str, payload: dict):
+        if self.max_entries <= 0 or not isinstance(payload.get("exp"), (int, float)):
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def size(self) -> int:
+        return len(self._entries)
+
+
+token_cache = VerifiedTokenCache(max_entries=settings.jwt_cache_max_entries)
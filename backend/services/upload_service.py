@@ -0,0 +1,276 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import AsyncIterator, Dict, Iterable, Optional
+
+import aiofiles
+from fastapi import HTTPException, UploadFile
+from starlette.responses import JSONResponse
+
+from config import settings
+
+
+class FileTooLarge(HTTPException):
+    def __init__(self, max_size: Optional[int] = None):
+        super().__init__(
+            status_code=413,
+            detail=f"File too large. Maximum size is {max_size or settings.max_file_size} bytes"
+        )
+
+
+class UploadService:
+    CHUNK_SIZE = 64 * 1024
+
+    @staticmethod
+    async def save_upload(file: UploadFile, file_path: str, max_size: Optional[int] = None, hasher=None) -> int:
+        """
+        Stream an upload to ``file_path`` in fixed-size chunks.
+
+        Data is written to a temporary file next to the destination and only
+        renamed into place once it is complete, so readers never see a
+        partial file. Raises 413 as soon as ``max_size`` is exceeded.
+        Each chunk is also fed to ``hasher`` (a hashlib object) if given.
+        Returns the number of bytes written.
+        """
+        max_size = max_size or settings.max_file_size
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        temp_path = f"{file_path}.{uuid.uuid4().hex}.part"
+
+        size = 0
+        try:
+            async with aiofiles.open(temp_path, "wb") as buffer:
+                while True:
+                    chunk = await file.read(UploadService.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_size:
+                        raise FileTooLarge(max_size)
+                    if hasher:
+                        hasher.update(chunk)
+                    await buffer.write(chunk)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return size
+
+
+class ResumableUploadService:
+    """
+    Resumable uploads: create a session, append chunks at explicit offsets, finalize.
+
+    Partial data lives in ``settings.upload_session_dir`` (outside the public
+    uploads directory) as ``<id>.part`` with a ``<id>.json`` sidecar. The
+    current offset is always the size of the part file, so a session survives
+    dropped connections and server restarts. Sessions untouched for longer
+    than ``upload_session_ttl_seconds`` are removed.
+    """
+
+    _locks: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def _paths(session_id: str):
+        base = os.path.join(settings.upload_session_dir, session_id)
+        return f"{base}.json", f"{base}.part"
+
+    @staticmethod
+    def _lock(session_id: str) -> asyncio.Lock:
+        return ResumableUploadService._locks.setdefault(session_id, asyncio.Lock())
+
+    @staticmethod
+    def create_session(user_id: int, filename: str, size: int, category: str) -> dict:
+        ResumableUploadService.cleanup_stale()
+        os.makedirs(settings.upload_session_dir, exist_ok=True)
+
+        session = {
+            "id": uuid.uuid4().hex,
+            "user_id": user_id,
+            "filename": filename,
+            "category": category,
+            "size": size,
+            "created_at": time.time(),
+        }
+        meta_path, part_path = ResumableUploadService._paths(session["id"])
+        with open(part_path, "wb"):
+            pass
+        with open(meta_path, "w") as meta:
+            json.dump(session, meta)
+        return ResumableUploadService._with_offset(session)
+
+    @staticmethod
+    def _with_offset(session: dict) -> dict:
+        _, part_path = ResumableUploadService._paths(session["id"])
+        session["offset"] = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        session["expires_at"] = (
+            (os.path.getmtime(part_path) if os.path.exists(part_path) else time.time())
+            + settings.upload_session_ttl_seconds
+        )
+        return session
+
+    @staticmethod
+    def get_session(session_id: str) -> Optional[dict]:
+        if not session_id.isalnum():
+            return None
+        meta_path, _ = ResumableUploadService._paths(session_id)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as meta:
+            return ResumableUploadService._with_offset(json.load(meta))
+
+    @staticmethod
+    async def append_chunk(session: dict, offset: int, body: AsyncIterator[bytes]) -> int:
+        """
+        Append a chunk that starts at ``offset`` and return the new offset.
+
+        Raises 409 when ``offset`` does not match what the server has, so the
+        client can resume from the reported offset instead of re-sending data.
+        """
+        _, part_path = ResumableUploadService._paths(session["id"])
+        async with ResumableUploadService._lock(session["id"]):
+            current = os.path.getsize(part_path)
+            if offset != current:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Offset mismatch. Upload must resume at offset {current}",
+                    headers={"Upload-Offset": str(current)}
+                )
+
+            written = current
+            async with aiofiles.open(part_path, "ab") as part:
+                async for chunk in body:
+                    if not chunk:
+                        continue
+                    written += len(chunk)
+                    if written > session["size"]:
+                        # Drop the over-long tail; the client can retry from the last good offset
+                        await part.truncate(current)
+                        raise HTTPException(status_code=413, detail="Chunk exceeds the declared upload size")
+                    await part.write(chunk)
+            return written
+
+    @staticmethod
+    async def finalize(session: dict, file_path: str):
+        """Move a fully received upload to ``file_path`` and discard the session"""
+        meta_path, part_path = ResumableUploadService._paths(session["id"])
+        async with ResumableUploadService._lock(session["id"]):
+            received = os.path.getsize(part_path)
+            if received != session["size"]:
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Upload incomplete: received {received} of {session['size']} bytes",
+                    headers={"Upload-Offset": str(received)}
+                )
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            os.replace(part_path, file_path)
+            os.remove(meta_path)
+        ResumableUploadService._locks.pop(session["id"], None)
+
+    @staticmethod
+    def delete_session(session_id: str):
+        for path in ResumableUploadService._paths(session_id):
+            if os.path.exists(path):
+                os.remove(path)
+        ResumableUploadService._locks.pop(session_id, None)
+
+    @staticmethod
+    def cleanup_stale() -> int:
+        """Remove sessions that have not received data within the TTL"""
+        if not os.path.isdir(settings.upload_session_dir):
+            return 0
+
+        cutoff = time.time() - settings.upload_session_ttl_seconds
+        removed = 0
+        for name in os.listdir(settings.upload_session_dir):
+            session_id, extension = os.path.splitext(name)
+            if extension != ".json":
+                continue
+            _, part_path = ResumableUploadService._paths(session_id)
+            last_activity = os.path.getmtime(part_path if os.path.exists(part_path) else os.path.join(settings.upload_session_dir, name))
+            lock = ResumableUploadService._locks.get(session_id)
+            if last_activity < cutoff and not (lock and lock.locked()):
+                ResumableUploadService.delete_session(session_id)
+                removed += 1
+        return removed
+
+    @staticmethod
+    async def run_cleanup_loop(interval_seconds: int = 3600):
+        """Periodically remove stale sessions; meant to run as a background task"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                ResumableUploadService.cleanup_stale()
+            except Exception as e:
+                print(f"Upload session cleanup failed: {e}")
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject upload requests whose body exceeds the limit while it is received.
+
+    FastAPI parses multipart bodies before the endpoint runs, so without this
+    an oversized upload is read to the end before any handler can refuse it.
+    Requests with a larger Content-Length are refused up front; chunked
+    requests are cut off as soon as the running byte count crosses the limit.
+    """
+
+    # Allowance for multipart boundaries and form fields around the file
+    MULTIPART_OVERHEAD = 64 * 1024
+
+    def __init__(self, app, path_prefixes: Iterable[str], max_body_size: Optional[int] = None):
+        self.app = app
+        self.path_prefixes = tuple(path_prefixes)
+        self.max_body_size = max_body_size or settings.max_file_size + self.MULTIPART_OVERHEAD
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("POST", "PUT", "PATCH")
+            or not scope["path"].startswith(self.path_prefixes)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.max_body_size
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                await self._reject(scope, receive, send)
+                return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise FileTooLarge()
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except FileTooLarge:
+            # Only reached when the body is read outside FastAPI's exception handling
+            if response_started:
+                raise
+            await self._reject(scope, receive, send)
+
+    async def _reject(self, scope, receive, send):
+        error = FileTooLarge()
+        response = JSONResponse(
+            {"detail": error.detail},
+            status_code=error.status_code,
+            headers={"Connection": "close"}
+        )
+        await response(scope, receive, send)
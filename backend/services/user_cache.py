@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from config import settings
+
+CacheKey = Tuple[str, Optional[int]]
+
+
+class AuthenticatedUser:
+    """
+    The fields of a user that authentication and authorization decisions
+    need. Dependencies hand this out instead of a ``User`` row; endpoints
+    that need the full profile load it with ``get_current_user_record``.
+    """
+
+    __slots__ = ("id", "username", "role", "is_active")
+
+    def __init__(self, id: int, username: str, role: str, is_active: bool):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.is_active = is_active
+
+
+class AuthenticatedUserCache:
+    """
+    Short-lived, size-bounded LRU of authenticated users keyed by token
+    subject and issue time.
+
+    Entries expire after ``ttl_seconds``, which also bounds how stale another
+    worker process can be; in this process, changes to a user's role, status
+    or existence evict their entries immediately through ``invalidate``.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[CacheKey, Tuple[float, AuthenticatedUser]]" = OrderedDict()
+        # Username -> cached keys, so one user's tokens can be dropped together
+        self._keys_by_username: Dict[str, Set[CacheKey]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, username: str, issued_at: Optional[int]) -> Optional[AuthenticatedUser]:
+        key = (username, issued_at)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, issued_at: Optional[int], user: AuthenticatedUser):
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        key = (user.username, issued_at)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, user)
+            self._entries.move_to_end(key)
+            self._keys_by_username.setdefault(user.username, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, username: str):
+        """Forget every cached token of ``username``"""
+        with self._lock:
+            for key in list(self._keys_by_username.get(username, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_username.clear()
+
+    def _remove(self, key: CacheKey):
+        self._entries.pop(key, None)
+        keys = self._keys_by_username.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_username[key[0]]
+
+    @property
+    def size(self) -> int:
+        return len(self._entries)
+
+
+user_cache = AuthenticatedUserCache(
+    ttl_seconds=settings.auth_user_cache_ttl_seconds,
+    max_entries=settings.auth_user_cache_max_entries
+)
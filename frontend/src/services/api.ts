@@ -158,6 +158,12 @@ class AuthManager {
 
   private constructor() {
     this.loadTokensFromStorage();
+    // Another tab logging in, refreshing or logging out changes the shared tokens
+    window.addEventListener('storage', (event) => {
+      if (event.key === null || event.key === 'access_token' || event.key === 'refresh_token') {
+        this.loadTokensFromStorage();
+      }
+    });
   }
 
   static getInstance(): AuthManager {
@@ -184,9 +190,17 @@ class AuthManager {
   }
 
   getRefreshToken(): string | null {
+    // Re-read, another tab may have rotated it since this one last looked
+    this.loadTokensFromStorage();
     return this.refreshToken;
   }
 
+  // Adopt tokens another tab stored after rotating usedToken
+  adoptRotatedTokens(usedToken: string): boolean {
+    this.loadTokensFromStorage();
+    return !!this.refreshToken && this.refreshToken !== usedToken;
+  }
+
   clearTokens(): void {
     this.accessToken = null;
     this.refreshToken = null;
@@ -195,6 +209,14 @@ class AuthManager {
   }
 
   logout(): void {
+    // End the session server-side too, so the refresh token can't be reused
+    if (this.refreshToken) {
+      fetch(`${API_BASE_URL}/auth/logout`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ refresh_token: this.refreshToken }),
+      }).catch(() => undefined);
+    }
     this.clearTokens();
   }
 
@@ -284,6 +306,10 @@ class ApiClient {
         authManager.setTokens(tokens);
         return true;
       }
+      // Another tab rotated the token while this request was in flight
+      if (response.status === 401 && authManager.adoptRotatedTokens(refreshToken)) {
+        return true;
+      }
     } catch (error) {
       console.error('Token refresh failed:', error);
     }
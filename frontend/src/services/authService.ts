@@ -1,4 +1,4 @@
-import { apiClient, AuthTokens, LoginCredentials, RegisterData, User, ApiResponse } from './api';
+import { apiClient, authManager, AuthTokens, LoginCredentials, RegisterData, User, ApiResponse } from './api';
 
 export class AuthService {
   static async login(credentials: LoginCredentials): Promise<AuthTokens> {
@@ -64,8 +64,7 @@ export class AuthService {
   }
 
   static async logout(): Promise<void> {
-    // Clear tokens from local storage
-    localStorage.removeItem('access_token');
-    localStorage.removeItem('refresh_token');
+    // Revokes the session and clears tokens from local storage
+    authManager.logout();
   }
 }
\ No newline at end of file
@@ -54,6 +54,19 @@ export class GalleryService {
     return apiClient.uploadFile<ApiResponse>('/gallery/upload', formData);
   }
 
+  static async uploadImages(
+    files: File[],
+    description?: string,
+    category?: string
+  ): Promise<ApiResponse> {
+    const formData = new FormData();
+    files.forEach((file) => formData.append('files', file));
+    if (description) formData.append('description', description);
+    if (category) formData.append('category', category);
+
+    return apiClient.uploadFile<ApiResponse>('/gallery/batch', formData);
+  }
+
   static async getCategories(): Promise<string[]> {
     return apiClient.get<string[]>('/gallery/categories');
   }